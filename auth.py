@@ -15,12 +15,15 @@ def create_access_token(data: dict):
     return encoded_jwt
 
 def verify_access_token(token: str):
+    return decode_access_token(token)["sub"]
+
+# Verify the token and return its claims; sub and exp are guaranteed to be present
+def decode_access_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
+        if payload.get("sub") is None or payload.get("exp") is None:
             raise JWTError
-        return user_id  # user_id should be a UUID
+        return payload
     except JWTError:
         raise JWTError("Invalid token")
     
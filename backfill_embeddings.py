@@ -0,0 +1,66 @@
+# backfill_embeddings.py
+#
+# Copies legacy float[] embeddings into the compact embedding_blob column in
+# keyset-ordered batches, committing after each batch so it can be stopped and
+# restarted safely. Run migrations.py first.
+#
+#   EMBEDDING_STORAGE=f16 python backfill_embeddings.py
+#   python backfill_embeddings.py --storage i8 --batch-size 5000 --drop-array
+import argparse
+import logging
+import time
+from sqlalchemy import text
+from database import SessionLocal
+from embedding_codec import EMBEDDING_STORAGE, FORMATS, encode_embedding
+
+logger = logging.getLogger(__name__)
+
+
+def backfill(db, storage: str, batch_size: int, drop_array: bool) -> int:
+    select_query = text("""
+        SELECT text_item_id, embeddings FROM TextItem
+        WHERE embedding_blob IS NULL AND embeddings IS NOT NULL AND text_item_id > :after
+        ORDER BY text_item_id
+        LIMIT :limit
+    """)
+    set_array = ", embeddings = NULL" if drop_array else ""
+    update_query = text(f"UPDATE TextItem SET embedding_blob = :blob{set_array} WHERE text_item_id = :text_item_id")
+
+    after = "00000000-0000-0000-0000-000000000000"
+    total = 0
+    while True:
+        start = time.perf_counter()
+        rows = db.execute(select_query, {"after": after, "limit": batch_size}).fetchall()
+        if not rows:
+            break
+        db.execute(update_query, [
+            {"text_item_id": text_item_id, "blob": encode_embedding(embeddings, storage)}
+            for text_item_id, embeddings in rows
+        ])
+        db.commit()
+        after = str(rows[-1][0])
+        total += len(rows)
+        logger.info(f"Backfilled {len(rows)} rows in {time.perf_counter() - start:.3f}s ({total} total)")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill TextItem.embedding_blob from the float[] column")
+    parser.add_argument("--storage", default=EMBEDDING_STORAGE if EMBEDDING_STORAGE in FORMATS else "f16",
+                        choices=sorted(FORMATS))
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--drop-array", action="store_true",
+                        help="Clear the float[] value of each row once its blob is written")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        total = backfill(db, args.storage, args.batch_size, args.drop_array)
+    finally:
+        db.close()
+    logger.info(f"Backfill finished: {total} rows stored as {args.storage}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+# benchmarks/corpus.py
+#
+# Synthetic post text shaped like our feeds: mostly short posts and replies with a
+# long tail of articles and transcripts. Shared by the benchmarks.
+import random
+
+WORDS = (
+    "the a to of and in is it you that for on this with was be are not have at but "
+    "just so like what about people new today time great really love think good "
+    "update launch customer service delivery price quality issue thanks support "
+    "announcement weekend community results market election weather traffic"
+).split()
+EXTRAS = ["#news", "@support", "https://t.co/xYz123", "🙂", "naïve", "café", "U.S.", "3.5%", "!!!", "co-op"]
+
+# Word-count distribution per row: (share of rows, min words, max words)
+DISTRIBUTION = [
+    (0.70, 3, 45),       # tweets and short replies
+    (0.22, 45, 220),     # longer posts and reviews
+    (0.07, 220, 900),    # articles
+    (0.01, 900, 4000),   # transcripts
+]
+
+# Alternative shapes for stressing one end of the pipeline
+DISTRIBUTIONS = {
+    "feed": DISTRIBUTION,
+    "short": [(1.0, 3, 45)],
+    "long": [(0.5, 220, 900), (0.5, 900, 4000)],
+}
+
+
+def make_rows(count, seed=0, distribution=DISTRIBUTION):
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        pick = rng.random()
+        for share, low, high in distribution:
+            if pick < share:
+                break
+            pick -= share
+        words = [rng.choice(EXTRAS) if rng.random() < 0.05 else rng.choice(WORDS) for _ in range(rng.randint(low, high))]
+        rows.append(" ".join(words).capitalize() + ".")
+    return rows
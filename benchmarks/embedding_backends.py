@@ -0,0 +1,67 @@
+# benchmarks/embedding_backends.py
+#
+# Validates the optimized embedding backends against the PyTorch reference: cosine
+# agreement per text and single-core throughput on the same corpus.
+#
+#   python -m benchmarks.embedding_backends --texts 2000
+#   python -m benchmarks.embedding_backends --corpus segments.txt --threads 1
+import argparse
+import json
+import time
+import numpy as np
+from embedding_backends import BACKENDS, load_backend
+from embedding_model import MODEL_NAME, EMBEDDING_BATCH_SIZE
+from benchmarks.corpus import make_rows
+
+
+def load_corpus(path, limit):
+    with open(path, encoding="utf-8") as corpus:
+        texts = [line.strip() for line in corpus if line.strip()]
+    return texts[:limit]
+
+
+def measure(backend, texts, batch_size):
+    backend.encode(texts[:batch_size], batch_size)  # warm-up, not timed
+    start = time.perf_counter()
+    vectors = backend.encode(texts, batch_size)
+    return vectors, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding backends against PyTorch")
+    parser.add_argument("--corpus", help="Text file with one sample per line (default: synthetic rows)")
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=1, help="Inference threads per backend")
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    args = parser.parse_args()
+
+    texts = load_corpus(args.corpus, args.texts) if args.corpus else make_rows(args.texts)
+    reference = None
+    report = {"model": MODEL_NAME, "texts": len(texts), "threads": args.threads, "backends": {}}
+    names = ["torch"] + [name for name in args.backends.split(",") if name != "torch"]
+    for name in names:
+        backend = load_backend(MODEL_NAME, name, args.threads)
+        vectors, seconds = measure(backend, texts, args.batch_size)
+        result = {
+            "seconds": round(seconds, 3),
+            "texts_per_second": round(len(texts) / seconds, 1),
+        }
+        if reference is None:
+            reference = (vectors, seconds)
+        else:
+            cosine = np.sum(vectors * reference[0], axis=1) / (
+                np.linalg.norm(vectors, axis=1) * np.linalg.norm(reference[0], axis=1)
+            )
+            result.update({
+                "speedup_vs_torch": round(reference[1] / seconds, 2),
+                "cosine_mean": round(float(cosine.mean()), 5),
+                "cosine_p1": round(float(np.percentile(cosine, 1)), 5),
+                "cosine_min": round(float(cosine.min()), 5),
+            })
+        report["backends"][name] = result
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# benchmarks/embedding_storage.py
+#
+# Compares the TextItem embedding storage formats: bytes per vector, encode and
+# decode throughput, and how closely each format reproduces the float32 vectors.
+# Uses random unit vectors by default, or a .npy matrix of real embeddings.
+#
+#   python -m benchmarks.embedding_storage --vectors 20000
+#   python -m benchmarks.embedding_storage --matrix vectors.npy
+import argparse
+import json
+import time
+import numpy as np
+from embedding_codec import FORMATS, encode_embedding, decode_many
+
+
+def unit_vectors(count, dimension, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def array_literal(vector):
+    # Size of the legacy float[] value as sent in a COPY/INSERT literal
+    return "{" + ",".join(repr(float(v)) for v in vector) + "}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding storage formats")
+    parser.add_argument("--matrix", help=".npy file of float32 embeddings (default: random unit vectors)")
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dimension", type=int, default=384)
+    args = parser.parse_args()
+
+    vectors = np.load(args.matrix).astype(np.float32) if args.matrix else unit_vectors(args.vectors, args.dimension)
+    report = {"vectors": len(vectors), "dimension": int(vectors.shape[1]), "formats": {}}
+
+    start = time.perf_counter()
+    literals = [array_literal(vector) for vector in vectors]
+    report["formats"]["array"] = {
+        # float4[] on disk: 4 bytes per value plus a 24-byte array header
+        "bytes_per_vector": 24 + 4 * vectors.shape[1],
+        "literal_bytes_per_vector": round(sum(map(len, literals)) / len(literals), 1),
+        "encode_vectors_per_second": round(len(vectors) / (time.perf_counter() - start), 1),
+    }
+
+    for storage in FORMATS:
+        start = time.perf_counter()
+        blobs = [encode_embedding(vector, storage) for vector in vectors]
+        encode_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        decoded = decode_many(blobs)
+        decode_seconds = time.perf_counter() - start
+        cosine = np.sum(decoded * vectors, axis=1) / (
+            np.linalg.norm(decoded, axis=1) * np.linalg.norm(vectors, axis=1)
+        )
+        report["formats"][storage] = {
+            "bytes_per_vector": len(blobs[0]),
+            "encode_vectors_per_second": round(len(vectors) / encode_seconds, 1),
+            "decode_vectors_per_second": round(len(vectors) / decode_seconds, 1),
+            "cosine_mean": round(float(cosine.mean()), 6),
+            "cosine_min": round(float(cosine.min()), 6),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+# benchmarks/ingestion.py
+#
+# End-to-end benchmark of the upload pipeline (read, validate, segment, encode,
+# insert) on a generated spreadsheet. It runs against a local SQLite file by default
+# or any database URL (e.g. a local Postgres), and uses a deterministic stub encoder
+# unless --real-model is given, so runs are comparable between commits.
+#
+#   python -m benchmarks.ingestion --rows 20000 --format xlsx --output results/ingest.json
+#   python -m benchmarks.ingestion --rows 5000 --distribution long --real-model
+#   python -m benchmarks.ingestion --database-url postgresql+psycopg2://localhost/textset_bench
+import argparse
+import csv
+import hashlib
+import json
+import os
+import random
+import resource
+import subprocess
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+import uploadfile
+from bulk_writer import TEXT_ITEM_FLUSH_SIZE
+from embedding_cache import EmbeddingCache
+from benchmarks.corpus import DISTRIBUTIONS, make_rows
+
+STUB_DIMENSION = 384
+
+SQLITE_TEXT_ITEM = """
+    CREATE TABLE IF NOT EXISTS TextItem (
+        text_item_id TEXT PRIMARY KEY, text_set_id TEXT, creator_id TEXT, creator_name TEXT,
+        text_content TEXT, post_date TIMESTAMP, external_item_id TEXT, parent_external_item_id TEXT,
+        embeddings BLOB, embedding_blob BLOB, content_hash BLOB, thread_root_id TEXT, token_count INTEGER,
+        segment_index INTEGER
+    )
+"""
+
+
+class StubEncoder:
+    """Deterministic unit vectors seeded from each text's hash; no model is loaded."""
+    dimension = STUB_DIMENSION
+
+    def encode(self, texts) -> np.ndarray:
+        vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for i, text_value in enumerate(texts):
+            seed = int.from_bytes(hashlib.blake2b(text_value.encode("utf-8"), digest_size=8).digest(), "little")
+            vectors[i] = np.random.default_rng(seed).standard_normal(self.dimension)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class StageTimer:
+    def __init__(self):
+        self.seconds = {}
+        self.calls = {}
+
+    def add(self, stage, seconds):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    def wrap(self, stage, fn):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+        return timed
+
+    def wrap_iterator(self, stage, fn):
+        def timed(*args, **kwargs):
+            iterator = fn(*args, **kwargs)
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    self.add(stage, time.perf_counter() - start)
+                    return
+                self.add(stage, time.perf_counter() - start)
+                yield item
+        return timed
+
+
+def write_input(path, rows, file_format, seed):
+    rng = random.Random(seed)
+    start_date = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    header = list(uploadfile.mandatory_columns)
+    records = []
+    for i, content in enumerate(rows):
+        creator = rng.randrange(max(1, len(rows) // 20))
+        parent = f"post-{rng.randrange(i)}" if i and rng.random() < 0.4 else None
+        posted = (start_date + timedelta(minutes=i)).isoformat()
+        records.append([f"user-{creator}", f"User {creator}", content, posted, f"post-{i}", parent])
+
+    if file_format == "csv":
+        with open(path, "w", newline="", encoding="utf-8") as output:
+            writer = csv.writer(output)
+            writer.writerow(header)
+            writer.writerows(records)
+    else:
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(header)
+        for record in records:
+            sheet.append(record)
+        workbook.save(path)
+
+
+def instrument(timer, storage):
+    """Wrap each pipeline stage of uploadfile with the timer."""
+    uploadfile.iter_row_chunks = timer.wrap_iterator("read", uploadfile.iter_row_chunks)
+    uploadfile.validate_chunk = timer.wrap("validate", uploadfile.validate_chunk)
+    uploadfile.segment_texts = timer.wrap("segment", uploadfile.segment_texts)
+    uploadfile.encode_segments = timer.wrap("encode", uploadfile.encode_segments)
+    # A fresh cache per run, so repeated runs do not measure cache hits
+    uploadfile.embedding_cache = EmbeddingCache(path=None)
+
+    base_writer = uploadfile.TextItemWriter
+
+    class TimedWriter(base_writer):
+        def __init__(self, db, flush_size=TEXT_ITEM_FLUSH_SIZE):
+            super().__init__(db, flush_size, storage)
+
+        def flush(self):
+            start = time.perf_counter()
+            try:
+                super().flush()
+            finally:
+                timer.add("insert", time.perf_counter() - start)
+
+    uploadfile.TextItemWriter = TimedWriter
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the upload ingestion pipeline end to end")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--format", choices=["xlsx", "csv"], default="xlsx")
+    parser.add_argument("--distribution", choices=sorted(DISTRIBUTIONS), default="feed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--database-url", help="Target database (default: a temporary SQLite file)")
+    parser.add_argument("--storage", default="f32",
+                        help="Embedding storage; SQLite needs a blob format, Postgres needs migrations.py for one")
+    parser.add_argument("--real-model", action="store_true", help="Encode with the configured model instead of the stub")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ingest-bench-")
+    input_path = os.path.join(workdir, f"input.{args.format}")
+    start = time.perf_counter()
+    write_input(input_path, make_rows(args.rows, args.seed, DISTRIBUTIONS[args.distribution]), args.format, args.seed)
+    generate_seconds = time.perf_counter() - start
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.sqlite')}"
+    engine = create_engine(database_url)
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as connection:
+            connection.execute(text(SQLITE_TEXT_ITEM))
+
+    if not args.real_model:
+        stub = StubEncoder()
+        uploadfile.get_encoder = lambda: stub
+    timer = StageTimer()
+    instrument(timer, args.storage)
+
+    text_set_id = str(uuid.uuid4())
+    db = sessionmaker(bind=engine)()
+    start = time.perf_counter()
+    try:
+        segments = uploadfile.ingest_file(db, text_set_id, input_path)
+        commit_start = time.perf_counter()
+        db.commit()
+        timer.add("commit", time.perf_counter() - commit_start)
+    finally:
+        db.close()
+    total_seconds = time.perf_counter() - start
+
+    report = {
+        "revision": git_revision(),
+        "rows": args.rows,
+        "format": args.format,
+        "distribution": args.distribution,
+        "database": engine.dialect.name,
+        "encoder": "model" if args.real_model else "stub",
+        "storage": args.storage,
+        "input_bytes": os.path.getsize(input_path),
+        "generate_seconds": round(generate_seconds, 3),
+        "total_seconds": round(total_seconds, 3),
+        "segments": segments,
+        "rows_per_second": round(args.rows / total_seconds, 1),
+        "segments_per_second": round(segments / total_seconds, 1),
+        "stages": {
+            stage: {"seconds": round(seconds, 3), "calls": timer.calls[stage], "share": round(seconds / total_seconds, 3)}
+            for stage, seconds in timer.seconds.items()
+        },
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    if args.database_url:
+        with engine.begin() as connection:
+            connection.execute(text("DELETE FROM TextItem WHERE text_set_id = :id"), {"id": text_set_id})
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as report_file:
+            report_file.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
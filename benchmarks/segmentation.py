@@ -0,0 +1,48 @@
+# benchmarks/segmentation.py
+#
+# Compares the per-row segment_text with the batched segment_texts on synthetic
+# rows shaped like our feeds: mostly short posts and replies with a long tail of
+# articles and transcripts.
+#
+#   python -m benchmarks.segmentation --rows 20000 --chunk-rows 2000
+import argparse
+import json
+import time
+from uploadfile import segment_text, segment_texts
+from benchmarks.corpus import make_rows
+
+
+def run(rows, chunk_rows):
+    start = time.perf_counter()
+    baseline = [segment_text(text) for text in rows]
+    baseline_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = []
+    for offset in range(0, len(rows), chunk_rows):
+        batched.extend(segment_texts(rows[offset:offset + chunk_rows]))
+    batched_seconds = time.perf_counter() - start
+
+    mismatched = sum(1 for old, new in zip(baseline, batched) if len(old) != len(new))
+    return {
+        "rows": len(rows),
+        "chunk_rows": chunk_rows,
+        "segments": sum(len(segments) for segments in batched),
+        "segment_text_seconds": round(baseline_seconds, 3),
+        "segment_texts_seconds": round(batched_seconds, 3),
+        "speedup": round(baseline_seconds / batched_seconds, 2) if batched_seconds else None,
+        "rows_with_different_window_count": mismatched,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark segment_text against segment_texts")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--chunk-rows", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(run(make_rows(args.rows, args.seed), args.chunk_rows), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/startup.py
+#
+# Measures how long a fresh interpreter takes to import the app, which heavy modules
+# that import drags in, and how long the background model warm-up takes.
+#
+#   python -m benchmarks.startup --runs 5
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ["torch", "transformers", "sentence_transformers", "pandas", "openpyxl"]
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+WARMUP_PROBE = """
+import json, time
+import embedding_model
+start = time.perf_counter()
+embedding_model.warm_up()
+print(json.dumps({"seconds": time.perf_counter() - start, **embedding_model.readiness()}))
+embedding_model.close_encoder()
+"""
+
+
+def run_probe(code, env):
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(env, count=10):
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], capture_output=True, text=True, env=env, check=True)
+    timings = []
+    for line in output.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        # Only top-level entries; nested imports are indented
+        if not name.startswith(" ") and "." not in name:
+            timings.append((int(cumulative) / 1e6, name))
+    return [{"module": name, "seconds": round(seconds, 3)} for seconds, name in sorted(timings, reverse=True)[:count]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark app import and model warm-up time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--skip-warmup", action="store_true", help="Do not load the embedding model")
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    imports = [run_probe(IMPORT_PROBE, env) for _ in range(args.runs)]
+    report = {
+        "import_main_seconds": {
+            "median": round(statistics.median(run["seconds"] for run in imports), 3),
+            "min": round(min(run["seconds"] for run in imports), 3),
+            "max": round(max(run["seconds"] for run in imports), 3),
+        },
+        "heavy_modules_loaded_by_import": imports[-1]["loaded"],
+        "slowest_top_level_imports": slowest_imports(env),
+    }
+    if not args.skip_warmup:
+        report["model_warmup"] = run_probe(WARMUP_PROBE, env)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
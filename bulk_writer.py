@@ -0,0 +1,149 @@
+# bulk_writer.py
+import io
+import logging
+import math
+import os
+import time
+from datetime import date, datetime
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from embedding_codec import EMBEDDING_STORAGE, encode_embedding
+from migrations import has_column
+
+logger = logging.getLogger(__name__)
+
+# Number of TextItem rows buffered before they are sent to the database
+TEXT_ITEM_FLUSH_SIZE = int(os.getenv("TEXT_ITEM_FLUSH_SIZE", "1000"))
+
+TEXT_ITEM_COLUMNS = [
+    'creator_id', 'creator_name', 'text_set_id', 'text_item_id', 'text_content',
+    'post_date', 'external_item_id', 'parent_external_item_id', 'embeddings'
+]
+
+# Column list when embeddings are stored as compact blobs (see embedding_codec.py)
+TEXT_ITEM_BLOB_COLUMNS = [column for column in TEXT_ITEM_COLUMNS if column != 'embeddings'] + ['embedding_blob']
+
+# Convert pandas/numpy values into plain Python values (NaN becomes NULL)
+def _to_python(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+# Render one value in PostgreSQL's COPY text format
+def _copy_field(value):
+    value = _to_python(value)
+    if value is None:
+        return "\\N"
+    if isinstance(value, (list, tuple)):
+        return "{" + ",".join(repr(float(v)) for v in value) + "}"
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    if isinstance(value, bytes):
+        value = "\\x" + value.hex()
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+class TextItemWriter:
+    """Buffers TextItem rows and writes them in bulk.
+
+    Rows go through COPY FROM STDIN when the driver's cursor supports it (psycopg2)
+    and through a single executemany INSERT elsewhere. The writer never commits: it runs inside the
+    caller's transaction, so the caller decides between commit and rollback.
+    """
+
+    def __init__(self, db: Session, flush_size: int = TEXT_ITEM_FLUSH_SIZE, storage: str = EMBEDDING_STORAGE):
+        self.db = db
+        self.flush_size = flush_size
+        self.storage = storage
+        self.columns = TEXT_ITEM_COLUMNS if storage == "array" else TEXT_ITEM_BLOB_COLUMNS
+        # Columns added by migrations.py are written once they exist
+        for column in ('content_hash', 'thread_root_id', 'token_count', 'segment_index'):
+            if has_column(db.get_bind(), "TextItem", column):
+                self.columns = self.columns + [column]
+        self.rows = []
+        self.inserted = 0
+        self.use_copy = None
+
+    # COPY needs a DB-API cursor with copy_expert (psycopg2). Checked on the live
+    # connection, and logged, so a driver change cannot silently lose the fast path.
+    def _copy_supported(self) -> bool:
+        cursor = self.db.connection().connection.cursor()
+        try:
+            supported = hasattr(cursor, "copy_expert")
+        finally:
+            cursor.close()
+        dialect = self.db.get_bind().dialect
+        if supported:
+            logger.info(f"Writing TextItem rows with COPY ({dialect.name}+{dialect.driver})")
+        elif dialect.name == "postgresql":
+            logger.warning(
+                f"Driver {dialect.driver} has no copy_expert; writing TextItem rows with executemany INSERT, "
+                f"which is much slower than COPY. Use a postgresql+psycopg2:// URL."
+            )
+        else:
+            logger.info(f"Writing TextItem rows with executemany INSERT ({dialect.name}+{dialect.driver})")
+        return supported
+
+    def add(self, params: dict):
+        if self.storage != "array":
+            params = dict(params)
+            params['embedding_blob'] = encode_embedding(params.pop('embeddings'), self.storage)
+        self.rows.append(params)
+        if len(self.rows) >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        start = time.perf_counter()
+        try:
+            if self.use_copy is None:
+                self.use_copy = self._copy_supported()
+            if self.use_copy:
+                self._copy(self.rows)
+            else:
+                self._executemany(self.rows)
+        except Exception as e:
+            logger.error(f"Error inserting {len(self.rows)} TextItem rows: {e}")
+            raise
+        self.inserted += len(self.rows)
+        logger.debug(
+            f"Inserted {len(self.rows)} TextItem rows in {time.perf_counter() - start:.3f}s "
+            f"({self.inserted} total)"
+        )
+        self.rows = []
+
+    def _copy(self, rows):
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write("\t".join(_copy_field(row.get(column)) for column in self.columns))
+            buffer.write("\n")
+        buffer.seek(0)
+
+        # Use the session's own connection so the COPY joins its transaction
+        cursor = self.db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY TextItem ({', '.join(self.columns)}) FROM STDIN", buffer)
+        finally:
+            cursor.close()
+
+    def _executemany(self, rows):
+        insert_query = text(f"""
+            INSERT INTO TextItem ({', '.join(self.columns)})
+            VALUES ({', '.join(f':{column}' for column in self.columns)})
+        """)
+        self.db.execute(
+            insert_query,
+            [{column: _to_python(row.get(column)) for column in self.columns} for row in rows]
+        )
@@ -103,14 +103,17 @@
 #     textset_service = TextSetService(db)
 #     return textset_service.get_text_set()
 # controller.py
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
-from database import SessionLocal
+from fastapi import APIRouter, HTTPException, Depends, status, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 from service import UserService, TextSetService
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from schemas import RegisteredUserCreate, RegisteredUserResponse, TextSetResponse, CreateTextSet
-from auth import verify_access_token
+from schemas import RegisteredUserCreate, RegisteredUserResponse, TextSetResponse, CreateTextSet, TextSetListItem, BulkCreateTextSets, BulkTextSetResponse
+from auth import decode_access_token
+from token_store import token_hash, verified_tokens, revocations, token_cache_hits, token_cache_misses
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
 import logging
 
 router = APIRouter()
@@ -118,35 +121,44 @@ logger = logging.getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# Dependency to authenticate user by token
-def authenticate_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    service = UserService(db)
-    if service.is_token_blacklisted(token):
+# Dependency to authenticate user by token. Verified tokens are cached until they
+# expire, so only the first request with a token pays for decoding it.
+async def authenticate_user(token: str = Depends(oauth2_scheme)):
+    key = token_hash(token)
+    if revocations.is_revoked(key):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has been logged out")
-    
+
+    user_id = verified_tokens.get(key)
+    if user_id is not None:
+        token_cache_hits.inc()
+        return user_id
+
+    token_cache_misses.inc()
     try:
-        user_id = verify_access_token(token)
-        if not user_id:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+        payload = decode_access_token(token)
     except Exception as e:
         logger.error(f"Token verification failed: {str(e)}")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token verification failed")
-    
-    return user_id
+
+    verified_tokens.put(key, payload["sub"], payload["exp"])
+    return payload["sub"]
+
+# Revoke the caller's token on every worker until it would have expired anyway
+@router.post('/logout', status_code=status.HTTP_204_NO_CONTENT)
+async def logout(token: str = Depends(oauth2_scheme), user_id: str = Depends(authenticate_user)):
+    key = token_hash(token)
+    payload = decode_access_token(token)
+    await run_in_threadpool(revocations.revoke, key, payload["exp"])
+    verified_tokens.discard(key)
+    logger.info(f"User {user_id} logged out")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 @router.post('/signup', response_model=RegisteredUserResponse, status_code=status.HTTP_201_CREATED)
-def register_user(Ruser: RegisteredUserCreate, db: Session = Depends(get_db)):
+async def register_user(Ruser: RegisteredUserCreate, db: AsyncSession = Depends(get_async_db)):
     logger.info(f"Attempting to register new user: {Ruser.user_name}")
     service = UserService(db)
     try:
-        new_user = service.register_user(Ruser)
+        new_user = await service.register_user(Ruser)
         logger.info(f"User {new_user.user_name} registered successfully")
         return new_user
     except IntegrityError:
@@ -157,10 +169,10 @@ def register_user(Ruser: RegisteredUserCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to register user")
 
 @router.post('/login', response_model=dict)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     service = UserService(db)
     try:
-        token = service.login(form_data.username, form_data.password)
+        token = await service.login(form_data.username, form_data.password)
         if not token:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
         return {"access_token": token, "token_type": "bearer"}
@@ -169,11 +181,14 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Login error")
 
 @router.post('/TextSet', response_model=TextSetResponse, status_code=status.HTTP_201_CREATED)
-def create_text_set(text_set: CreateTextSet, db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
-    user_id = authenticate_user(token, db)
+async def create_text_set(
+    text_set: CreateTextSet,
+    db: AsyncSession = Depends(get_async_db),
+    user_id: str = Depends(authenticate_user)
+):
     textset_service = TextSetService(db)
     try:
-        created_text_set = textset_service.create_text_set(text_set, user_id=user_id)
+        created_text_set = await textset_service.create_text_set(text_set, user_id=user_id)
         return created_text_set
     except IntegrityError:
         logger.error("TextSet with this title already exists.")
@@ -182,12 +197,34 @@ def create_text_set(text_set: CreateTextSet, db: Session = Depends(get_db), toke
         logger.error(f"Database error during TextSet creation: {str(e)}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to create TextSet")
 
-@router.get('/TextSet', response_model=list[TextSetResponse], status_code=status.HTTP_200_OK)
-def get_text_set(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
-    user_id = authenticate_user(token, db)
+# Create many TextSets in one statement; each item reports created or conflict
+@router.post('/TextSet/bulk', response_model=BulkTextSetResponse, status_code=status.HTTP_200_OK)
+async def create_text_sets(
+    request: BulkCreateTextSets,
+    db: AsyncSession = Depends(get_async_db),
+    user_id: str = Depends(authenticate_user)
+):
+    textset_service = TextSetService(db)
+    result = await textset_service.create_text_sets(request.items, user_id=user_id)
+    logger.info(f"Bulk TextSet creation: {result.created} created, {result.conflicts} conflicts")
+    return result
+
+@router.get('/TextSet', response_model=list[TextSetListItem], response_model_exclude_unset=True, status_code=status.HTTP_200_OK)
+async def get_text_set(
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    after: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,title"),
+    db: AsyncSession = Depends(get_async_db),
+    user_id: str = Depends(authenticate_user)
+):
     textset_service = TextSetService(db)
+    projection = [field.strip() for field in fields.split(',') if field.strip()] if fields else None
     try:
-        return textset_service.get_text_set()
+        items, next_cursor = await textset_service.get_text_set(user_id, limit=limit, after=after, fields=projection)
     except SQLAlchemyError as e:
         logger.error(f"Database error fetching TextSets: {str(e)}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error fetching TextSets")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [TextSetListItem(**item) for item in items]
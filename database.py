@@ -2,8 +2,11 @@
 #database.py
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from dotenv import load_dotenv #type:ignore
+from metrics import Counter, Gauge
 import os
+import time
 
 # Load environment variables from .env file
 load_dotenv()
@@ -22,14 +25,57 @@ DB_HOST = os.getenv("DB_HOST")
 DB_NAME = os.getenv("DB_NAME")
 DB_PORT = os.getenv("DB_PORT")
 
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
-engine = create_engine(DATABASE_URL)
+# Connection pool settings, shared by the sync and async engines
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Recycle connections before the server or a load balancer drops idle ones
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+POOL_OPTIONS = dict(
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
+
+# Name the driver: the COPY path in bulk_writer.py needs psycopg2, and SQLAlchemy 2.1
+# would pick psycopg (v3) for a bare postgresql:// URL
+DATABASE_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+
+# The sync engine serves background ingestion (COPY through psycopg2), embedding
+# matrix builds and the CLIs; request handlers use the async engine below.
+engine = create_engine(DATABASE_URL, **POOL_OPTIONS)
 Base = declarative_base()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **POOL_OPTIONS)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+pool_checkouts = Counter("db_pool_checkouts_total", "Connections checked out of the request pool")
+pool_wait_seconds = Counter("db_pool_wait_seconds_total", "Time requests spent waiting for a pooled connection")
+
+_request_pool = async_engine.sync_engine.pool
+Gauge("db_pool_checked_out", "Request pool connections currently in use", lambda: _request_pool.checkedout())
+Gauge("db_pool_open", "Request pool connections currently open", lambda: _request_pool.checkedin() + _request_pool.checkedout())
+Gauge("db_ingest_pool_checked_out", "Ingestion pool connections currently in use", lambda: engine.pool.checkedout())
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+# Async session per request. The connection is taken up front so the time spent
+# waiting on the pool is measured.
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        start = time.perf_counter()
+        await db.connection()
+        pool_wait_seconds.inc(time.perf_counter() - start)
+        pool_checkouts.inc()
+        yield db
@@ -0,0 +1,155 @@
+# embedding_backends.py
+#
+# Interchangeable CPU inference backends for the embedding model. Every backend
+# exposes the same interface: encode(texts, batch_size) -> float32 (n, dim) array of
+# unit vectors, plus .dimension and .tokenizer.
+#
+#   torch      stock SentenceTransformer (fp32 PyTorch)
+#   onnx       the transformer exported to ONNX and run with ONNX Runtime
+#   onnx-int8  the ONNX graph with dynamically int8-quantized weights
+import fcntl
+import logging
+import os
+import tempfile
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Backend used by the encoder: torch, onnx or onnx-int8
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+
+# Where exported and quantized ONNX graphs are cached
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR") or os.path.join(tempfile.gettempdir(), "textset-onnx")
+
+BACKENDS = ["torch", "onnx", "onnx-int8"]
+
+
+class TorchBackend:
+    def __init__(self, model_name, threads=None):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.tokenizer = self.model.tokenizer
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts, batch_size) -> np.ndarray:
+        return np.asarray(
+            self.model.encode(list(texts), batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False),
+            dtype=np.float32
+        )
+
+
+class OnnxBackend:
+    """Runs the exported transformer in ONNX Runtime and applies the model's own
+    mean pooling and L2 normalization in NumPy."""
+
+    def __init__(self, model_name, quantized=False, threads=None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        path = export_onnx(model_name, quantized)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [graph_input.name for graph_input in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(_hub_name(model_name))
+        # Match SentenceTransformer's truncation for this model
+        self.max_length = min(self.tokenizer.model_max_length, 256)
+        self.dimension = self.session.get_outputs()[0].shape[-1]
+
+    def encode(self, texts, batch_size) -> np.ndarray:
+        texts = list(texts)
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        # Sort by length so each batch pads to a similar size
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            tokens = self.tokenizer(
+                [texts[i] for i in batch],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np"
+            )
+            feed = {name: tokens[name].astype(np.int64) for name in self.input_names}
+            hidden = self.session.run(None, feed)[0]
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            embeddings[batch] = pooled / np.clip(norms, 1e-12, None)
+        return embeddings
+
+
+def _hub_name(model_name):
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+
+# Export the model's transformer to ONNX (and optionally quantize it) once per host.
+# Replicas starting together wait on a file lock instead of exporting in parallel.
+def export_onnx(model_name, quantized=False) -> str:
+    directory = os.path.join(ONNX_MODEL_DIR, model_name.replace("/", "__"))
+    os.makedirs(directory, exist_ok=True)
+    fp32_path = os.path.join(directory, "model.onnx")
+    int8_path = os.path.join(directory, "model-int8.onnx")
+    target = int8_path if quantized else fp32_path
+    if os.path.exists(target):
+        return target
+
+    with open(os.path.join(directory, "export.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            if not os.path.exists(fp32_path):
+                _export_fp32(model_name, fp32_path)
+            if quantized and not os.path.exists(int8_path):
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+
+                partial = int8_path + ".partial"
+                quantize_dynamic(fp32_path, partial, weight_type=QuantType.QInt8)
+                os.replace(partial, int8_path)
+                logger.info(f"Quantized {model_name} to int8 at {int8_path}")
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return target
+
+
+def _export_fp32(model_name, path):
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(_hub_name(model_name))
+    model = AutoModel.from_pretrained(_hub_name(model_name))
+    model.eval()
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    partial = path + ".partial"
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            partial,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                **{name: {0: "batch", 1: "sequence"} for name in input_names},
+                "last_hidden_state": {0: "batch", 1: "sequence"},
+            },
+            opset_version=14
+        )
+    os.replace(partial, path)
+    logger.info(f"Exported {model_name} to ONNX at {path}")
+
+
+def load_backend(model_name, backend=EMBEDDING_BACKEND, threads=None):
+    if backend == "torch":
+        return TorchBackend(model_name, threads)
+    if backend == "onnx":
+        return OnnxBackend(model_name, quantized=False, threads=threads)
+    if backend == "onnx-int8":
+        return OnnxBackend(model_name, quantized=True, threads=threads)
+    raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {BACKENDS}")
@@ -0,0 +1,104 @@
+# embedding_cache.py
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+from metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of embeddings kept in the in-process LRU tier
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "20000"))
+
+# Optional SQLite file used as a persistent tier shared by all workers on a host
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH") or None
+
+# SQLite limits the number of bound parameters per statement
+_SQLITE_BATCH = 500
+
+cache_hits = Counter("embedding_cache_hits_total", "Segments whose embedding was served from the cache")
+cache_misses = Counter("embedding_cache_misses_total", "Segments that had to be encoded")
+
+# Key an embedding on the encoder and the segment text with whitespace and unicode form normalized
+def cache_key(encoder_id: str, text: str) -> bytes:
+    normalized = " ".join(unicodedata.normalize("NFC", text).split())
+    return hashlib.sha256(f"{encoder_id}\0{normalized}".encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache: a bounded in-process LRU in front of an optional SQLite store."""
+
+    def __init__(self, max_entries: int = EMBEDDING_CACHE_SIZE, path: str = EMBEDDING_CACHE_PATH):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS embedding_cache (key BLOB PRIMARY KEY, vector BLOB NOT NULL)")
+            self._db.commit()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_many(self, keys) -> dict:
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vector
+        memory_hits = len(found)
+
+        missing = list({key for key in keys if key not in found})
+        if self._db is not None and missing:
+            for key, vector in self._load(missing):
+                found[key] = vector
+            self._remember(found.items())
+
+        hits = sum(1 for key in keys if key in found)
+        cache_hits.inc(memory_hits, tier="memory")
+        cache_hits.inc(hits - memory_hits, tier="disk")
+        cache_misses.inc(len(keys) - hits)
+        return found
+
+    def put_many(self, items):
+        items = list(items)
+        self._remember(items)
+        if self._db is not None and items:
+            with self._lock:
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO embedding_cache (key, vector) VALUES (?, ?)",
+                    [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items]
+                )
+                self._db.commit()
+
+    def _remember(self, items):
+        with self._lock:
+            for key, vector in items:
+                self._entries[key] = vector
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _load(self, keys):
+        rows = []
+        with self._lock:
+            for start in range(0, len(keys), _SQLITE_BATCH):
+                batch = keys[start:start + _SQLITE_BATCH]
+                rows.extend(self._db.execute(
+                    f"SELECT key, vector FROM embedding_cache WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall())
+        return [(key, np.frombuffer(vector, dtype=np.float32)) for key, vector in rows]
+
+
+embedding_cache = EmbeddingCache()
+
+Gauge("embedding_cache_entries", "Embeddings held in the in-process cache tier", lambda: len(embedding_cache))
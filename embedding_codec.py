@@ -0,0 +1,66 @@
+# embedding_codec.py
+#
+# Compact binary encodings for TextItem embeddings, stored in the embedding_blob
+# (bytea) column. Every blob starts with a one-byte format tag:
+#
+#   f32  tag 1 + little-endian float32 values           (4 bytes per dimension)
+#   f16  tag 2 + little-endian float16 values           (2 bytes per dimension)
+#   i8   tag 3 + float32 scale + int8 values            (1 byte per dimension)
+#
+# f32 and f16 decode without copying through np.frombuffer; i8 is rescaled on read.
+import os
+import numpy as np
+
+# How new embeddings are stored: "array" keeps the legacy float[] embeddings column,
+# f32/f16/i8 write embedding_blob instead (run migrations.py first)
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "array")
+
+FORMATS = {"f32": 1, "f16": 2, "i8": 3}
+_F32 = np.dtype("<f4")
+_F16 = np.dtype("<f2")
+
+
+def encode_embedding(vector, storage: str = EMBEDDING_STORAGE) -> bytes:
+    vector = np.asarray(vector, dtype=np.float32)
+    if storage == "f32":
+        return bytes([FORMATS["f32"]]) + vector.astype(_F32, copy=False).tobytes()
+    if storage == "f16":
+        return bytes([FORMATS["f16"]]) + vector.astype(_F16).tobytes()
+    if storage == "i8":
+        peak = float(np.abs(vector).max()) if vector.size else 0.0
+        scale = peak / 127 if peak else 1.0
+        quantized = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+        return bytes([FORMATS["i8"]]) + np.float32(scale).astype(_F32).tobytes() + quantized.tobytes()
+    raise ValueError(f"Unknown embedding storage {storage!r}; expected one of {sorted(FORMATS)}")
+
+
+# Decode one blob. f32/f16 return read-only views over the blob's buffer.
+def decode_embedding(blob) -> np.ndarray:
+    blob = memoryview(blob)
+    tag = blob[0]
+    if tag == FORMATS["f32"]:
+        return np.frombuffer(blob, dtype=_F32, offset=1)
+    if tag == FORMATS["f16"]:
+        return np.frombuffer(blob, dtype=_F16, offset=1)
+    if tag == FORMATS["i8"]:
+        scale = np.frombuffer(blob, dtype=_F32, count=1, offset=1)[0]
+        return np.frombuffer(blob, dtype=np.int8, offset=5).astype(np.float32) * scale
+    raise ValueError(f"Unknown embedding format tag {tag}")
+
+
+# Decode a row's embedding from whichever column holds it
+def row_embedding(embeddings, embedding_blob) -> np.ndarray:
+    if embedding_blob is not None:
+        return decode_embedding(embedding_blob)
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def decode_many(blobs, dtype=np.float32) -> np.ndarray:
+    blobs = list(blobs)
+    if not blobs:
+        return np.empty((0, 0), dtype=dtype)
+    first = decode_embedding(blobs[0])
+    matrix = np.empty((len(blobs), first.shape[0]), dtype=dtype)
+    for i, blob in enumerate(blobs):
+        matrix[i] = decode_embedding(blob)
+    return matrix
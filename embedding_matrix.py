@@ -0,0 +1,256 @@
+# embedding_matrix.py
+#
+# Per-TextSet embedding matrices kept as memory-mapped .npy files, so every worker on a
+# host shares one copy through the page cache instead of reloading float lists from
+# Postgres. Layout on disk:
+#
+#   <EMBEDDING_MATRIX_DIR>/<text_set_id>/<generation>/vectors.npy   (n, dim) float32/float16
+#   <EMBEDDING_MATRIX_DIR>/<text_set_id>/<generation>/ids.npy       (n,) text_item_id as 16 raw bytes
+#   <EMBEDDING_MATRIX_DIR>/<text_set_id>/current -> <generation>
+#
+# Writers build a new generation and swap the "current" symlink, so readers never see
+# a half-written matrix and mappings that are already open stay valid.
+import fcntl
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from embedding_codec import row_embedding
+from migrations import has_column
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MATRIX_DIR = os.getenv("EMBEDDING_MATRIX_DIR") or os.path.join(tempfile.gettempdir(), "textset-embeddings")
+
+# Storage precision of the cached matrices: float32 or float16
+EMBEDDING_MATRIX_DTYPE = np.dtype(os.getenv("EMBEDDING_MATRIX_DTYPE", "float32"))
+
+MATRIX_FETCH_ROWS = 5000
+ID_DTYPE = np.dtype("S16")
+
+
+def _write_npy(path, dtype, shape, sources):
+    # Write an .npy header followed by raw little-endian rows copied from file objects
+    with open(path, "wb") as out:
+        np.lib.format.write_array_header_1_0(out, {
+            "descr": np.lib.format.dtype_to_descr(dtype),
+            "fortran_order": False,
+            "shape": shape,
+        })
+        for source in sources:
+            shutil.copyfileobj(source, out, 1024 * 1024)
+
+
+def _npy_payload(path):
+    # Open an existing .npy file positioned at the first data byte
+    source = open(path, "rb")
+    np.lib.format.read_magic(source)
+    np.lib.format.read_array_header_1_0(source)
+    return source
+
+
+class EmbeddingMatrix:
+    def __init__(self, generation, ids, vectors):
+        self.generation = generation
+        self.ids = ids
+        self.vectors = vectors
+
+    def __len__(self):
+        return len(self.ids)
+
+    def item_ids(self):
+        return [str(uuid.UUID(bytes=raw.ljust(16, b"\0"))) for raw in self.ids]
+
+
+class EmbeddingMatrixCache:
+    def __init__(self, root: str = EMBEDDING_MATRIX_DIR, dtype: np.dtype = EMBEDDING_MATRIX_DTYPE):
+        self.root = root
+        self.dtype = dtype
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def _set_dir(self, text_set_id):
+        return os.path.join(self.root, str(text_set_id))
+
+    @contextmanager
+    def _exclusive(self, text_set_id):
+        # flock serializes builders and writers across uvicorn worker processes
+        os.makedirs(self._set_dir(text_set_id), exist_ok=True)
+        with open(os.path.join(self._set_dir(text_set_id), "lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def current_generation(self, text_set_id):
+        try:
+            return os.readlink(os.path.join(self._set_dir(text_set_id), "current"))
+        except FileNotFoundError:
+            return None
+
+    def _load(self, text_set_id, generation):
+        with self._lock:
+            cached = self._open.get(str(text_set_id))
+            if cached is not None and cached.generation == generation:
+                return cached
+        directory = os.path.join(self._set_dir(text_set_id), generation)
+        matrix = EmbeddingMatrix(
+            generation,
+            np.load(os.path.join(directory, "ids.npy"), mmap_mode="r"),
+            np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        )
+        with self._lock:
+            self._open[str(text_set_id)] = matrix
+        return matrix
+
+    def _publish(self, text_set_id, generation):
+        set_dir = self._set_dir(text_set_id)
+        previous = self.current_generation(text_set_id)
+        link = os.path.join(set_dir, f"current.{generation}")
+        os.symlink(generation, link)
+        os.replace(link, os.path.join(set_dir, "current"))
+        # Workers that still map the old files keep them alive until they remap
+        if previous and previous != generation:
+            shutil.rmtree(os.path.join(set_dir, previous), ignore_errors=True)
+
+    # Return the matrix of a TextSet, building it from the database on first use
+    def get(self, db: Session, text_set_id) -> EmbeddingMatrix:
+        while True:
+            generation = self.current_generation(text_set_id)
+            if generation is None:
+                with self._exclusive(text_set_id):
+                    generation = self.current_generation(text_set_id)
+                    if generation is None:
+                        generation = self._build(db, text_set_id)
+            try:
+                return self._load(text_set_id, generation)
+            except FileNotFoundError:
+                # Another worker replaced this generation between readlink and open
+                continue
+
+    def _build(self, db: Session, text_set_id):
+        generation = uuid.uuid4().hex
+        directory = os.path.join(self._set_dir(text_set_id), generation)
+        os.makedirs(directory)
+
+        count, dim = 0, 0
+        with tempfile.TemporaryFile(dir=directory) as raw_vectors, tempfile.TemporaryFile(dir=directory) as raw_ids:
+            blob_column = "embedding_blob" if has_column(db.get_bind(), "TextItem", "embedding_blob") else "NULL"
+            result = db.execute(
+                text(f"SELECT text_item_id, embeddings, {blob_column} FROM TextItem WHERE text_set_id = :text_set_id")
+                .execution_options(stream_results=True),
+                {"text_set_id": str(text_set_id)}
+            )
+            while True:
+                rows = result.fetchmany(MATRIX_FETCH_ROWS)
+                if not rows:
+                    break
+                vectors = np.asarray([row_embedding(embeddings, blob) for _, embeddings, blob in rows], dtype=self.dtype)
+                dim = vectors.shape[1]
+                raw_vectors.write(vectors.tobytes())
+                raw_ids.write(np.asarray([uuid.UUID(str(item_id)).bytes for item_id, _, _ in rows], dtype=ID_DTYPE).tobytes())
+                count += len(rows)
+
+            raw_vectors.seek(0)
+            raw_ids.seek(0)
+            _write_npy(os.path.join(directory, "vectors.npy"), self.dtype, (count, dim), [raw_vectors])
+            _write_npy(os.path.join(directory, "ids.npy"), ID_DTYPE, (count,), [raw_ids])
+
+        self._publish(text_set_id, generation)
+        logger.info(f"Built embedding matrix for TextSet {text_set_id}: {count} x {dim} {self.dtype}")
+        return generation
+
+    # Append newly committed items to an existing matrix. Sets that were never
+    # loaded are left alone; they are built with the new items on first use.
+    def extend(self, text_set_id, ids, vectors):
+        if len(ids) == 0:
+            return
+        with self._exclusive(text_set_id):
+            generation = self.current_generation(text_set_id)
+            if generation is None:
+                return
+            current = self._load(text_set_id, generation)
+
+            # A build that ran after the commit already holds these items
+            keep = ~np.isin(ids, current.ids)
+            ids, vectors = ids[keep], np.asarray(vectors[keep], dtype=self.dtype)
+            if len(ids) == 0:
+                return
+            if current.vectors.shape[0] and current.vectors.shape[1] != vectors.shape[1]:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match matrix {current.vectors.shape}")
+
+            new_generation = uuid.uuid4().hex
+            old_dir = os.path.join(self._set_dir(text_set_id), generation)
+            directory = os.path.join(self._set_dir(text_set_id), new_generation)
+            os.makedirs(directory)
+            count = len(current) + len(ids)
+            with _npy_payload(os.path.join(old_dir, "vectors.npy")) as old_vectors, \
+                    _npy_payload(os.path.join(old_dir, "ids.npy")) as old_ids, \
+                    tempfile.TemporaryFile(dir=directory) as new_vectors, \
+                    tempfile.TemporaryFile(dir=directory) as new_ids:
+                new_vectors.write(vectors.tobytes())
+                new_ids.write(ids.tobytes())
+                new_vectors.seek(0)
+                new_ids.seek(0)
+                _write_npy(os.path.join(directory, "vectors.npy"), self.dtype, (count, vectors.shape[1]), [old_vectors, new_vectors])
+                _write_npy(os.path.join(directory, "ids.npy"), ID_DTYPE, (count,), [old_ids, new_ids])
+            self._publish(text_set_id, new_generation)
+
+    # Drop the cached matrix of a TextSet; the next reader rebuilds it
+    def invalidate(self, text_set_id):
+        with self._exclusive(text_set_id):
+            generation = self.current_generation(text_set_id)
+            if generation is None:
+                return
+            os.remove(os.path.join(self._set_dir(text_set_id), "current"))
+            shutil.rmtree(os.path.join(self._set_dir(text_set_id), generation), ignore_errors=True)
+        with self._lock:
+            self._open.pop(str(text_set_id), None)
+
+    def staging(self, text_set_id):
+        return MatrixStaging(self, text_set_id)
+
+
+class MatrixStaging:
+    """Collects the embeddings of an ingestion job on disk until its transaction commits."""
+
+    def __init__(self, cache: EmbeddingMatrixCache, text_set_id):
+        self.cache = cache
+        self.text_set_id = text_set_id
+        self.dim = None
+        self.count = 0
+        self._vectors = tempfile.TemporaryFile()
+        self._ids = tempfile.TemporaryFile()
+
+    def append(self, item_ids, vectors):
+        vectors = np.asarray(vectors, dtype=self.cache.dtype)
+        if len(vectors):
+            self.dim = vectors.shape[1]
+        self._vectors.write(vectors.tobytes())
+        self._ids.write(np.asarray([uuid.UUID(str(item_id)).bytes for item_id in item_ids], dtype=ID_DTYPE).tobytes())
+        self.count += len(item_ids)
+
+    def commit(self):
+        try:
+            if self.count:
+                self._vectors.flush()
+                self._ids.flush()
+                vectors = np.memmap(self._vectors, dtype=self.cache.dtype, mode="r", shape=(self.count, self.dim))
+                ids = np.memmap(self._ids, dtype=ID_DTYPE, mode="r", shape=(self.count,))
+                self.cache.extend(self.text_set_id, ids, vectors)
+        finally:
+            self.discard()
+
+    def discard(self):
+        self._vectors.close()
+        self._ids.close()
+
+
+matrix_cache = EmbeddingMatrixCache()
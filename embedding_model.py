@@ -0,0 +1,84 @@
+# embedding_model.py
+#
+# Lazily loaded embedding backend, tokenizer and encoder. Nothing heavy (torch,
+# sentence_transformers, transformers, onnxruntime) is imported until the first call,
+# so the API starts and answers /login and /TextSet without paying for the model.
+import logging
+import os
+import threading
+import time
+from embedding_pool import EMBEDDING_WORKERS, create_encoder
+from embedding_backends import EMBEDDING_BACKEND, load_backend
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# Identifies the vectors this configuration produces (quantized backends differ slightly)
+ENCODER_ID = f"{MODEL_NAME}:{EMBEDDING_BACKEND}"
+
+# Number of segments sent to the encoder per forward pass
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+_lock = threading.RLock()
+_backend = None
+_tokenizer = None
+_encoder = None
+_warmup = {"status": "cold", "seconds": None, "error": None}
+
+
+# Backend loaded in this process; only used when the replica pool is disabled
+def get_backend():
+    global _backend
+    with _lock:
+        if _backend is None:
+            _backend = load_backend(MODEL_NAME, EMBEDDING_BACKEND)
+        return _backend
+
+
+def get_tokenizer():
+    global _tokenizer
+    with _lock:
+        if _tokenizer is None:
+            if EMBEDDING_WORKERS <= 0:
+                _tokenizer = get_backend().tokenizer
+            else:
+                # The replicas hold the weights; this process only needs the tokenizer
+                from transformers import AutoTokenizer
+
+                _tokenizer = AutoTokenizer.from_pretrained(f"sentence-transformers/{MODEL_NAME}")
+        return _tokenizer
+
+
+def get_encoder():
+    global _encoder
+    with _lock:
+        if _encoder is None:
+            _encoder = create_encoder(MODEL_NAME, EMBEDDING_BACKEND, EMBEDDING_BATCH_SIZE, get_backend)
+        return _encoder
+
+
+# Load the tokenizer and encoder and run one encode so the first upload or search
+# does not pay for it. Safe to call from a background thread.
+def warm_up():
+    _warmup.update(status="loading", error=None)
+    start = time.perf_counter()
+    try:
+        get_tokenizer()
+        get_encoder().encode(["warm up"])
+    except Exception as e:
+        logger.error(f"Embedding model warm-up failed: {e}")
+        _warmup.update(status="failed", error=str(e))
+        return
+    _warmup.update(status="ready", seconds=round(time.perf_counter() - start, 3))
+    logger.info(f"Embedding model {MODEL_NAME} ready in {_warmup['seconds']}s")
+
+
+def readiness() -> dict:
+    return {"model": MODEL_NAME, "backend": EMBEDDING_BACKEND, **_warmup}
+
+
+def close_encoder():
+    with _lock:
+        if _encoder is not None:
+            _encoder.close()
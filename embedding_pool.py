@@ -0,0 +1,196 @@
+# embedding_pool.py
+#
+# Embedding subsystem: a pool of worker processes, each holding its own replica of the
+# SentenceTransformer. Encode calls from concurrent uploads and queries are queued,
+# coalesced into shared batches by a dispatcher thread and spread over the replicas.
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Inference threads per replica; replicas default to one per group of that many cores
+EMBEDDING_TORCH_THREADS = int(os.getenv("EMBEDDING_TORCH_THREADS", "1"))
+
+# Every replica holds a full copy of the model, so the default stays small
+EMBEDDING_MAX_DEFAULT_WORKERS = 4
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+
+# CPUs this process may actually use: its affinity mask, further limited by a cgroup
+# CPU quota (containers see every host core in os.cpu_count())
+def available_cpus(cgroup_root: str = CGROUP_ROOT) -> int:
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = _cgroup_cpu_quota(cgroup_root)
+    if quota is not None:
+        cpus = min(cpus, max(1, int(quota)))
+    return max(1, cpus)
+
+
+# cgroup v2 cpu.max ("max 100000" or "<quota> <period>"), else cgroup v1 cfs_quota_us
+def _cgroup_cpu_quota(cgroup_root):
+    try:
+        with open(os.path.join(cgroup_root, "cpu.max")) as cpu_max:
+            quota, period = cpu_max.read().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(os.path.join(cgroup_root, "cpu", "cpu.cfs_quota_us")) as quota_file:
+            quota = int(quota_file.read())
+        with open(os.path.join(cgroup_root, "cpu", "cpu.cfs_period_us")) as period_file:
+            period = int(period_file.read())
+        return None if quota <= 0 or period <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
+
+
+def default_workers(cgroup_root: str = CGROUP_ROOT) -> int:
+    return max(1, min(EMBEDDING_MAX_DEFAULT_WORKERS, available_cpus(cgroup_root) // EMBEDDING_TORCH_THREADS))
+
+
+# Number of model replicas; 0 disables the pool and encodes in the API process
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", str(default_workers())))
+
+# Largest coalesced batch sent to one replica
+EMBEDDING_POOL_BATCH = int(os.getenv("EMBEDDING_POOL_BATCH", "256"))
+
+# How long the dispatcher waits for more work before sending a partial batch
+EMBEDDING_COALESCE_MS = float(os.getenv("EMBEDDING_COALESCE_MS", "5"))
+
+_replica = None
+
+
+def _init_replica(model_name, backend, threads):
+    global _replica
+    from embedding_backends import load_backend
+
+    _replica = load_backend(model_name, backend, threads)
+
+
+def _encode_on_replica(texts, batch_size):
+    return _replica.encode(texts, batch_size)
+
+
+class InProcessEncoder:
+    """Encodes with a backend loaded in the calling process."""
+
+    def __init__(self, backend, batch_size):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.dimension = backend.dimension
+
+    def encode(self, texts) -> np.ndarray:
+        return self.backend.encode(list(texts), self.batch_size)
+
+    def close(self):
+        pass
+
+
+class EmbeddingPool:
+    """Process pool of model replicas fed by a coalescing request queue."""
+
+    def __init__(self, model_name, backend, batch_size, workers=EMBEDDING_WORKERS,
+                 torch_threads=EMBEDDING_TORCH_THREADS, max_batch=EMBEDDING_POOL_BATCH,
+                 coalesce_ms=EMBEDDING_COALESCE_MS):
+        self._dimension = None
+        self.batch_size = batch_size
+        self.max_batch = max_batch
+        self.coalesce_seconds = coalesce_ms / 1000
+        # spawn: forking a process that already holds torch state is unsafe
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_replica,
+            initargs=(model_name, backend, torch_threads)
+        )
+        # Keep two batches per replica in flight so none idles while results travel back
+        self._in_flight = threading.BoundedSemaphore(2 * workers)
+        self._requests = queue.Queue()
+        self._dispatcher = threading.Thread(target=self._dispatch, name="embedding-dispatch", daemon=True)
+        self._dispatcher.start()
+        logger.info(f"Started {workers} {backend} embedding replicas of {model_name} with {torch_threads} thread(s) each")
+
+    @property
+    def dimension(self):
+        # Replicas live in other processes; ask one for the output size once
+        if self._dimension is None:
+            self._dimension = self.encode(["dimension probe"]).shape[1]
+        return self._dimension
+
+    def encode(self, texts) -> np.ndarray:
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        futures = []
+        for start in range(0, len(texts), self.max_batch):
+            future = Future()
+            self._requests.put((texts[start:start + self.max_batch], future))
+            futures.append(future)
+        return np.concatenate([future.result() for future in futures])
+
+    def _dispatch(self):
+        while True:
+            first = self._requests.get()
+            if first is None:
+                return
+            batch, size = [first], len(first[0])
+            deadline = time.monotonic() + self.coalesce_seconds
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._requests.put(None)
+                    break
+                batch.append(request)
+                size += len(request[0])
+
+            self._in_flight.acquire()
+            texts = [text for request_texts, _ in batch for text in request_texts]
+            try:
+                submitted = self._executor.submit(_encode_on_replica, texts, self.batch_size)
+            except Exception as e:
+                self._in_flight.release()
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            submitted.add_done_callback(lambda done, batch=batch: self._complete(done, batch))
+
+    def _complete(self, done, batch):
+        self._in_flight.release()
+        error = done.exception()
+        if error is not None:
+            for _, future in batch:
+                future.set_exception(error)
+            return
+        vectors = done.result()
+        offset = 0
+        for request_texts, future in batch:
+            future.set_result(vectors[offset:offset + len(request_texts)])
+            offset += len(request_texts)
+
+    def close(self):
+        self._requests.put(None)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Build the encoder the ingestion and query paths share. load_backend is only called
+# when encoding stays in this process.
+def create_encoder(model_name, backend, batch_size, load_backend):
+    if EMBEDDING_WORKERS <= 0:
+        return InProcessEncoder(load_backend(), batch_size)
+    return EmbeddingPool(model_name, backend, batch_size)
@@ -0,0 +1,127 @@
+# incremental.py
+#
+# Incremental re-upload: source rows are keyed on (text_set_id, external_item_id)
+# and compared by a hash of their content, so a refreshed export only re-segments
+# and re-embeds the rows that actually changed.
+import hashlib
+import logging
+import math
+from sqlalchemy import text, bindparam
+from sqlalchemy.orm import Session
+from fastapi import HTTPException
+from migrations import has_column
+
+logger = logging.getLogger(__name__)
+
+# Bound on external ids per IN (...) lookup or delete
+LOOKUP_BATCH = 1000
+
+HASHED_COLUMNS = ['text_content', 'creator_id', 'creator_name', 'parent_external_item_id']
+
+
+def _key(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return str(value)
+
+
+# Hash of everything stored for a source row, so a change to any of it counts as an update
+def content_hash(row, post_date) -> bytes:
+    parts = [_key(row.get(column)) or "" for column in HASHED_COLUMNS] + [post_date.isoformat()]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).digest()
+
+
+class IncrementalSync:
+    """Decides per source row whether to insert, replace or skip it, and removes rows missing from the file.
+
+    Works inside the caller's transaction and never commits.
+    """
+
+    def __init__(self, db: Session, text_set_id, delete_missing: bool = False):
+        if not has_column(db.get_bind(), "TextItem", "content_hash"):
+            raise HTTPException(status_code=400, detail="Incremental uploads need the content_hash column; run migrations.py.")
+        self.db = db
+        self.text_set_id = str(text_set_id)
+        self.delete_missing = delete_missing
+        self.seen = set()
+        # Items whose rows were rejected by validation: still in the file, so never missing
+        self.rejected = set()
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.removed = 0
+
+    def filter(self, rows, hashes):
+        """Return the positions of the (row, post_date) pairs that need ingesting; segments of changed rows are deleted."""
+        keys = [_key(row.get('external_item_id')) for row, _ in rows]
+        existing = self._existing_hashes([key for key in keys if key is not None and key not in self.seen])
+
+        selected, changed = [], []
+        for position, (key, row_hash) in enumerate(zip(keys, hashes)):
+            if key is None:
+                # Rows without an external id cannot be matched, so they are always new
+                selected.append(position)
+                self.inserted += 1
+                continue
+            if key in self.seen:
+                logger.warning(f"Duplicate external_item_id {key} in upload. Skipping...")
+                continue
+            self.seen.add(key)
+            stored = existing.get(key)
+            if stored is None:
+                selected.append(position)
+                self.inserted += 1
+            elif stored == {row_hash}:
+                self.unchanged += 1
+            else:
+                selected.append(position)
+                changed.append(key)
+                self.updated += 1
+
+        self._delete(changed)
+        return selected
+
+    def skip_rejected(self, keys):
+        self.rejected.update(key for key in map(_key, keys) if key is not None)
+
+    def finish(self):
+        if not self.delete_missing:
+            return
+        stored = self.db.execute(
+            text("SELECT DISTINCT external_item_id FROM TextItem WHERE text_set_id = :text_set_id AND external_item_id IS NOT NULL"),
+            {"text_set_id": self.text_set_id}
+        ).scalars().all()
+        missing = [key for key in map(str, stored) if key not in self.seen and key not in self.rejected]
+        self._delete(missing)
+        self.removed = len(missing)
+
+    @property
+    def changed_existing(self) -> bool:
+        return bool(self.updated or self.removed)
+
+    def _existing_hashes(self, keys) -> dict:
+        found = {}
+        query = text("""
+            SELECT external_item_id, content_hash FROM TextItem
+            WHERE text_set_id = :text_set_id AND external_item_id IN :keys
+        """).bindparams(bindparam("keys", expanding=True))
+        for start in range(0, len(keys), LOOKUP_BATCH):
+            rows = self.db.execute(query, {"text_set_id": self.text_set_id, "keys": keys[start:start + LOOKUP_BATCH]})
+            for key, stored_hash in rows:
+                found.setdefault(str(key), set()).add(bytes(stored_hash) if stored_hash is not None else None)
+        return found
+
+    def _delete(self, keys):
+        query = text(
+            "DELETE FROM TextItem WHERE text_set_id = :text_set_id AND external_item_id IN :keys"
+        ).bindparams(bindparam("keys", expanding=True))
+        for start in range(0, len(keys), LOOKUP_BATCH):
+            self.db.execute(query, {"text_set_id": self.text_set_id, "keys": keys[start:start + LOOKUP_BATCH]})
+
+    def counts(self) -> dict:
+        return {
+            "items_inserted": self.inserted,
+            "items_updated": self.updated,
+            "items_unchanged": self.unchanged,
+            "items_removed": self.removed,
+        }
@@ -0,0 +1,132 @@
+# jobs.py
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from uuid import uuid4
+from fastapi import HTTPException
+from validation import MAX_REPORTED_REJECTIONS
+
+logger = logging.getLogger(__name__)
+
+# Number of ingestion jobs allowed to run at once per process; the rest wait queued
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "2"))
+
+# Finished jobs are kept this long so clients can still read their final status
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "86400"))
+
+
+class IngestJob:
+    def __init__(self, text_set_id: str, owner_id: str, filename: str):
+        self.id = str(uuid4())
+        self.text_set_id = str(text_set_id)
+        self.owner_id = str(owner_id)
+        self.filename = filename
+        self.status = "queued"
+        self.rows_parsed = 0
+        self.segments_embedded = 0
+        self.rows_inserted = 0
+        self.errors = []
+        self.stage_seconds = {}
+        self.profile_path = None
+        # items_inserted/updated/unchanged/removed, set by incremental uploads only
+        self.item_counts = {}
+        self.rejected_rows = 0
+        self.rejections = []
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at = None
+        self.finished_at = None
+        self._started = None
+        self._finished = None
+
+    def start(self):
+        self.status = "running"
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.monotonic()
+
+    def add_stage_time(self, stage: str, seconds: float):
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    def add_rejections(self, rejections: list):
+        self.rejected_rows += len(rejections)
+        room = MAX_REPORTED_REJECTIONS - len(self.rejections)
+        if room > 0:
+            self.rejections.extend(rejections[:room])
+
+    def finish(self, status: str, error: str = None):
+        if error:
+            self.errors.append(error)
+        self.status = status
+        self.finished_at = datetime.now(timezone.utc)
+        self._finished = time.monotonic()
+
+    def snapshot(self) -> dict:
+        elapsed = 0.0
+        if self._started is not None:
+            elapsed = (self._finished or time.monotonic()) - self._started
+        return {
+            "job_id": self.id,
+            "text_set_id": self.text_set_id,
+            "filename": self.filename,
+            "status": self.status,
+            "rows_parsed": self.rows_parsed,
+            "segments_embedded": self.segments_embedded,
+            "rows_inserted": self.rows_inserted,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.rows_parsed / elapsed, 1) if elapsed else 0.0,
+            "segments_per_second": round(self.segments_embedded / elapsed, 1) if elapsed else 0.0,
+            "stage_seconds": {stage: round(seconds, 3) for stage, seconds in self.stage_seconds.items()},
+            "profile_path": self.profile_path,
+            **self.item_counts,
+            "rejected_rows": self.rejected_rows,
+            "rejections": list(self.rejections),
+            "errors": list(self.errors),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobStore:
+    """In-process registry of ingestion jobs backed by a bounded thread pool."""
+
+    def __init__(self, max_workers: int = MAX_CONCURRENT_JOBS):
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+
+    def submit(self, job: IngestJob, fn, *args):
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn, args)
+        return job
+
+    def get(self, job_id: str) -> IngestJob:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: IngestJob, fn, args):
+        job.start()
+        try:
+            fn(job, *args)
+        except HTTPException as e:
+            logger.warning(f"Ingestion job {job.id} rejected: {e.detail}")
+            job.finish("failed", str(e.detail))
+        except Exception as e:
+            logger.error(f"Ingestion job {job.id} failed: {e}")
+            job.finish("failed", str(e))
+        else:
+            job.finish("completed")
+            logger.info(f"Ingestion job {job.id} completed: {job.rows_inserted} rows inserted")
+
+    def _prune(self):
+        cutoff = time.monotonic() - JOB_RETENTION_SECONDS
+        expired = [job_id for job_id, job in self._jobs.items() if job._finished is not None and job._finished < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+job_store = JobStore()
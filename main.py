@@ -1,16 +1,75 @@
 # main.py
-from fastapi import FastAPI
+import os
+import threading
+import time
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
 from controller import router
 from uploadfile import route
+from search import route as search_route
+from threads import route as threads_route
+from text_set_stats import route as stats_route
+from metrics import router as metrics_router, Histogram
+from embedding_model import warm_up, readiness, close_encoder
 import models
-from database import engine
+from database import engine, async_engine
+
+# Create missing database tables on startup (set to false when the schema is managed elsewhere)
+CREATE_SCHEMA_ON_STARTUP = os.getenv("CREATE_SCHEMA_ON_STARTUP", "true").lower() == "true"
+
+# Load the embedding model in the background once the app is up, instead of on the first upload
+MODEL_WARMUP_ON_STARTUP = os.getenv("MODEL_WARMUP_ON_STARTUP", "true").lower() == "true"
 
 app = FastAPI()
 
-# Create database tables on startup
-models.Base.metadata.create_all(bind=engine)
+request_seconds = Histogram("http_request_seconds", "Request latency by route, method and status code")
+
+# Record request latency under the route template, so /TextSet/{text_set_id}/... is one series
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        request_seconds.observe(
+            time.perf_counter() - start,
+            route=getattr(route, "path", "unmatched"),
+            method=request.method,
+            status=status_code
+        )
+
+@app.on_event("startup")
+def start_up():
+    if CREATE_SCHEMA_ON_STARTUP:
+        models.Base.metadata.create_all(bind=engine)
+    if MODEL_WARMUP_ON_STARTUP:
+        threading.Thread(target=warm_up, name="model-warmup", daemon=True).start()
+
+@app.on_event("shutdown")
+def stop_embedding_workers():
+    close_encoder()
+
+@app.on_event("shutdown")
+async def close_database_pool():
+    await async_engine.dispose()
+
+# Readiness probe: 200 once the embedding model is loaded, 503 while it is warming up or failed
+@app.get("/ready", include_in_schema=False)
+def ready():
+    state = readiness()
+    # Without warm-up the model loads on first use, so only a failed load makes us unready
+    is_ready = state["status"] == "ready" or (not MODEL_WARMUP_ON_STARTUP and state["status"] != "failed")
+    code = status.HTTP_200_OK if is_ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(state, status_code=code)
 
 # Include the router for authentication and TextSet-related endpoints
 app.include_router(router)
 app.include_router(route)
-
+app.include_router(search_route)
+app.include_router(threads_route)
+app.include_router(stats_route)
+app.include_router(metrics_router)
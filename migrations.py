@@ -0,0 +1,53 @@
+# migrations.py
+#
+# Idempotent schema changes for tables that already exist. create_all only creates
+# missing tables, so new indexes and columns on live tables are applied here:
+#
+#   python migrations.py
+import logging
+from sqlalchemy import text, inspect
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS = [
+    'CREATE INDEX IF NOT EXISTS "ix_TextSet_owner_id_created_at" ON "TextSet" (owner_id, created_at, id)',
+    # Compact embedding storage (embedding_codec.py); fill old rows with backfill_embeddings.py
+    'ALTER TABLE TextItem ADD COLUMN IF NOT EXISTS embedding_blob BYTEA',
+    # Incremental re-upload (incremental.py): match rows on external_item_id and compare content hashes
+    'ALTER TABLE TextItem ADD COLUMN IF NOT EXISTS content_hash BYTEA',
+    'CREATE INDEX IF NOT EXISTS ix_TextItem_text_set_id_external_item_id ON TextItem (text_set_id, external_item_id)',
+    # Thread retrieval (threads.py): walk replies by parent id, fetch a whole thread by its root
+    'CREATE INDEX IF NOT EXISTS ix_TextItem_text_set_id_parent_external_item_id ON TextItem (text_set_id, parent_external_item_id)',
+    'ALTER TABLE TextItem ADD COLUMN IF NOT EXISTS thread_root_id TEXT',
+    'CREATE INDEX IF NOT EXISTS ix_TextItem_text_set_id_thread_root_id ON TextItem (text_set_id, thread_root_id)',
+    # TextSet stats (text_set_stats.py): tokens per segment; fill old rows with rebuild_stats.py --count-tokens
+    'ALTER TABLE TextItem ADD COLUMN IF NOT EXISTS token_count INTEGER',
+    # Position of a segment within its source row; segment 0 marks one item for the stats
+    'ALTER TABLE TextItem ADD COLUMN IF NOT EXISTS segment_index INTEGER',
+]
+
+
+_columns = {}
+
+
+# Whether a migrated column exists yet, so readers work before and after migrating
+def has_column(engine: Engine, table: str, column: str) -> bool:
+    key = (table.lower(), column)
+    if key not in _columns:
+        _columns[key] = any(found["name"] == column for found in inspect(engine).get_columns(table.lower()))
+    return _columns[key]
+
+
+def run_migrations(engine: Engine):
+    with engine.begin() as connection:
+        for statement in MIGRATIONS:
+            logger.info(f"Applying: {statement}")
+            connection.execute(text(statement))
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    logging.basicConfig(level=logging.INFO)
+    run_migrations(engine)
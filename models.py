@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, TIMESTAMP
+from sqlalchemy import Column, String, DateTime, ForeignKey, TIMESTAMP, Index, BigInteger, LargeBinary
 from sqlalchemy.dialects.postgresql import UUID
 from uuid import uuid4
 from database import Base
@@ -25,4 +25,23 @@ class TextSet(Base):
     owner_id = Column(UUID(as_uuid=True), ForeignKey('RegisteredUser.id'))  # Rename from registered_user_id to owner_id
 
     registered_user = relationship("RegisteredUser", back_populates="textsets")
-    
+
+    # Serves the owner-scoped, keyset-paginated listing of GET /TextSet
+    __table_args__ = (
+        Index("ix_TextSet_owner_id_created_at", "owner_id", "created_at", "id"),
+    )
+
+
+# One row per TextSet, maintained by uploads (text_set_stats.py) so stats are a primary-key read
+class TextSetStats(Base):
+    __tablename__ = "TextSetStats"
+    text_set_id = Column(UUID(as_uuid=True), ForeignKey('TextSet.id', ondelete="CASCADE"), primary_key=True)
+    item_count = Column(BigInteger, nullable=False, server_default="0")
+    segment_count = Column(BigInteger, nullable=False, server_default="0")
+    creator_count = Column(BigInteger, nullable=False, server_default="0")
+    creator_sketch = Column(LargeBinary)  # HyperLogLog registers behind creator_count
+    total_tokens = Column(BigInteger, nullable=False, server_default="0")
+    first_post_date = Column(TIMESTAMP(timezone=True))
+    last_post_date = Column(TIMESTAMP(timezone=True))
+    last_ingest_at = Column(TIMESTAMP(timezone=True))
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,117 @@
+# password_hashing.py
+#
+# bcrypt runs on its own small thread pool (bcrypt releases the GIL) instead of the
+# threadpool that serves every sync route, so a burst of logins cannot starve the
+# rest of the API. Work beyond the pool's queue limit is refused with 503 and
+# Retry-After rather than queued without bound.
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import bcrypt
+from fastapi import HTTPException, status
+from metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+# bcrypt cost factor for new hashes; stored hashes with another cost are rehashed on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# Threads dedicated to hashing, and how many more calls may wait for one
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "32"))
+
+# Retry-After sent with 503 when the queue is full
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "1"))
+
+hash_calls = Counter("password_hash_total", "Password hash and verify calls")
+hash_seconds = Counter("password_hash_seconds_total", "Time spent hashing or verifying passwords")
+hash_wait_seconds = Counter("password_hash_queue_wait_seconds_total", "Time password hash calls waited for a thread")
+hash_rejected = Counter("password_hash_rejected_total", "Password hash calls refused because the queue was full")
+
+
+# bcrypt reads only the first 72 bytes of a password. passlib truncated silently when
+# the stored hashes were made, while bcrypt 5 raises, so truncate the same way here.
+def _secret(password: str) -> bytes:
+    return password.encode("utf-8")[:72]
+
+
+def _hash(password: str) -> str:
+    return bcrypt.hashpw(_secret(password), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode("ascii")
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    try:
+        return bcrypt.checkpw(_secret(password), hashed_password.encode("ascii"))
+    except ValueError:
+        logger.error("Stored password hash is not a valid bcrypt hash")
+        return False
+
+
+# Hashes look like $2b$<cost>$<salt and digest>
+def _needs_update(hashed_password: str) -> bool:
+    try:
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+class PasswordHashPool:
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, queue_limit: int = PASSWORD_HASH_QUEUE_LIMIT):
+        self.capacity = workers + queue_limit
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+
+    async def run(self, operation: str, fn, *args):
+        with self._lock:
+            if self.pending >= self.capacity:
+                hash_rejected.inc(operation=operation)
+                logger.warning(f"Password hashing queue full ({self.pending} pending), refusing {operation}")
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server busy, please retry",
+                    headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)}
+                )
+            self.pending += 1
+
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            hash_wait_seconds.inc(started - submitted, operation=operation)
+            try:
+                return fn(*args)
+            finally:
+                hash_seconds.inc(time.perf_counter() - started, operation=operation)
+                hash_calls.inc(operation=operation)
+
+        try:
+            return await asyncio.wrap_future(self._executor.submit(timed))
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+
+hash_pool = PasswordHashPool()
+
+Gauge("password_hash_pending", "Password hash calls running or queued", lambda: hash_pool.pending)
+
+
+async def hash_password(password: str) -> str:
+    return await hash_pool.run("hash", _hash, password)
+
+
+# Returns (valid, replacement): replacement is a new hash when the stored one uses another cost
+async def verify_password(password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    valid = await hash_pool.run("verify", _verify, password, hashed_password)
+    if valid and _needs_update(hashed_password):
+        # The rehash is optional; when the queue is full, keep the old hash and log in anyway
+        try:
+            return True, await hash_password(password)
+        except HTTPException:
+            logger.info("Password hashing queue full, skipping rehash for this login")
+    return valid, None
@@ -0,0 +1,184 @@
+# readers.py
+import logging
+import os
+import tempfile
+from fastapi import UploadFile
+
+logger = logging.getLogger(__name__)
+
+# Rows handed to the ingestion pipeline at a time; bounds peak memory per upload
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "2000"))
+
+# Directory for spooled uploads (defaults to the system temp directory)
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None
+
+SPOOL_READ_BYTES = 1024 * 1024
+
+# Bytes of CSV parsed at a time (pyarrow's default)
+CSV_BLOCK_BYTES = 1024 * 1024
+
+# Bytes of JSONL parsed at a time; a single line must fit in one block
+JSON_BLOCK_BYTES = 8 * 1024 * 1024
+
+# Function to copy an upload to a temporary file without holding it in memory
+async def spool_upload(file: UploadFile) -> str:
+    suffix = os.path.splitext(file.filename)[1].lower()
+    spool = tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=UPLOAD_SPOOL_DIR)
+    try:
+        while True:
+            data = await file.read(SPOOL_READ_BYTES)
+            if not data:
+                break
+            spool.write(data)
+    except Exception:
+        spool.close()
+        os.remove(spool.name)
+        raise
+    spool.close()
+    return spool.name
+
+# Accepted upload formats: extension -> content types clients send for it.
+# application/octet-stream is accepted for every format, since many clients send nothing better.
+UPLOAD_FORMATS = {
+    '.xlsx': {"application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"},
+    '.xls': {"application/vnd.ms-excel"},
+    '.csv': {"text/csv", "application/csv", "text/plain", "application/vnd.ms-excel"},
+    '.parquet': {"application/vnd.apache.parquet", "application/x-parquet"},
+    '.jsonl': {"application/jsonl", "application/x-ndjson", "application/json", "text/plain"},
+    '.ndjson': {"application/x-ndjson", "application/jsonl", "application/json", "text/plain"},
+}
+GENERIC_CONTENT_TYPE = "application/octet-stream"
+
+# Identifier columns are read as text so "0012" or "123" are not turned into numbers
+TEXT_COLUMNS = ['creator_id', 'creator_name', 'text_content', 'external_item_id', 'parent_external_item_id']
+
+# Formats that can be parsed front to back as their bytes arrive
+STREAMABLE_FORMATS = {'.csv', '.jsonl', '.ndjson'}
+
+# Function to read an upload as DataFrames of at most chunk_rows rows.
+# At least one (possibly empty) DataFrame is yielded so callers always see the header.
+# For a streamable format, source may be a function returning a new binary file object
+# over the upload's bytes (an upload still arriving, say); path then only names the format.
+def iter_row_chunks(path: str, chunk_rows: int = INGEST_CHUNK_ROWS, source=None):
+    import pandas as pd
+
+    extension = os.path.splitext(path)[1].lower()
+    if source is not None and extension not in STREAMABLE_FORMATS:
+        raise ValueError(f"{extension} uploads cannot be read from a stream")
+    if extension == '.xlsx':
+        yield from _iter_xlsx_chunks(path, chunk_rows)
+    elif extension in ('.csv', '.parquet', '.jsonl', '.ndjson'):
+        yield from _iter_arrow_chunks(path, extension, chunk_rows, source)
+    else:
+        # Legacy .xls workbooks have no streaming reader; parse them whole
+        df = pd.read_excel(path)
+        if df.empty:
+            yield df
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+
+def _iter_xlsx_chunks(path, chunk_rows):
+    import pandas as pd
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        columns = [str(name) if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+
+        buffer = []
+        yielded = False
+        for values in rows:
+            # Read-only sheets often report trailing blank rows
+            if all(value is None for value in values):
+                continue
+            buffer.append(values[:len(columns)])
+            if len(buffer) >= chunk_rows:
+                yield pd.DataFrame(buffer, columns=columns)
+                yielded = True
+                buffer = []
+        if buffer or not yielded:
+            yield pd.DataFrame(buffer, columns=columns)
+    finally:
+        workbook.close()
+
+# Columnar formats are read with pyarrow in record batches; each batch becomes one
+# DataFrame, so the pipeline sees the same chunks as for spreadsheets.
+def _iter_arrow_chunks(path, extension, chunk_rows, source=None):
+    import pyarrow as pa  # type: ignore
+
+    opened = []
+
+    def open_input():
+        if source is None:
+            return path
+        opened.append(source())
+        return opened[-1]
+
+    try:
+        if extension == '.csv':
+            from pyarrow import csv  # type: ignore
+
+            reader = csv.open_csv(
+                open_input(),
+                read_options=csv.ReadOptions(block_size=CSV_BLOCK_BYTES),
+                convert_options=csv.ConvertOptions(column_types={column: pa.string() for column in TEXT_COLUMNS})
+            )
+            batches = _rebatch(reader, chunk_rows)
+            schema = reader.schema
+        elif extension == '.parquet':
+            import pyarrow.parquet as pq  # type: ignore
+
+            parquet_file = pq.ParquetFile(path)
+            batches = parquet_file.iter_batches(batch_size=chunk_rows)
+            schema = parquet_file.schema_arrow
+        else:
+            import pandas as pd
+            from pyarrow import json  # type: ignore
+
+            empty = os.path.getsize(path) == 0 if source is None else not open_input().read(1)
+            if empty:
+                yield pd.DataFrame()
+                return
+            read_options = json.ReadOptions(block_size=JSON_BLOCK_BYTES)
+            # The streaming reader fixes column types from the first block. Columns that are
+            # all null there are read as text, as are id and text columns that only appear
+            # later (a key missing from a line is a null), so later blocks cannot conflict.
+            inferred = json.open_json(open_input(), read_options=read_options).schema
+            fields = [pa.field(field.name, pa.string() if pa.types.is_null(field.type) else field.type) for field in inferred]
+            fields += [pa.field(column, pa.string()) for column in TEXT_COLUMNS if column not in inferred.names]
+            reader = json.open_json(
+                open_input(),
+                read_options=read_options,
+                parse_options=json.ParseOptions(explicit_schema=pa.schema(fields), unexpected_field_behavior="ignore")
+            )
+            batches = _rebatch(reader, chunk_rows)
+            schema = reader.schema
+
+        yielded = False
+        for batch in batches:
+            if batch.num_rows:
+                yield batch.to_pandas()
+                yielded = True
+        if not yielded:
+            yield schema.empty_table().to_pandas()
+    finally:
+        for stream in opened:
+            stream.close()
+
+# CSV and JSON blocks are sized in bytes; regroup them into batches of chunk_rows rows
+def _rebatch(batches, chunk_rows):
+    import pyarrow as pa  # type: ignore
+
+    pending, rows = [], 0
+    for batch in batches:
+        pending.append(batch)
+        rows += batch.num_rows
+        while rows >= chunk_rows:
+            table = pa.Table.from_batches(pending)
+            yield from table.slice(0, chunk_rows).combine_chunks().to_batches()
+            remainder = table.slice(chunk_rows)
+            pending, rows = remainder.to_batches(), remainder.num_rows
+    if rows:
+        yield from pa.Table.from_batches(pending).combine_chunks().to_batches()
@@ -0,0 +1,84 @@
+# rebuild_stats.py
+#
+# Recomputes TextSetStats rows from TextItem, one set per transaction. Use it once
+# after deploying stats for sets uploaded before, or whenever a row looks wrong.
+# --count-tokens first fills token_count for segments stored before that column
+# existed, in keyset-ordered batches. Run migrations.py first.
+#
+#   python rebuild_stats.py
+#   python rebuild_stats.py --text-set-id 6f1c... --count-tokens
+import argparse
+import logging
+import time
+from sqlalchemy import text, select
+from database import SessionLocal
+from embedding_model import get_tokenizer
+from models import TextSet
+from text_set_stats import rebuild_stats
+
+logger = logging.getLogger(__name__)
+
+
+def count_tokens(db, text_set_id, batch_size: int) -> int:
+    select_query = text("""
+        SELECT text_item_id, text_content FROM TextItem
+        WHERE text_set_id = :text_set_id AND token_count IS NULL AND text_item_id > :after
+        ORDER BY text_item_id
+        LIMIT :limit
+    """)
+    update_query = text("UPDATE TextItem SET token_count = :token_count WHERE text_item_id = :text_item_id")
+    tokenizer = get_tokenizer()
+
+    after = "00000000-0000-0000-0000-000000000000"
+    total = 0
+    while True:
+        rows = db.execute(select_query, {"text_set_id": str(text_set_id), "after": after, "limit": batch_size}).fetchall()
+        if not rows:
+            break
+        encoded = tokenizer(
+            [text_content or "" for _, text_content in rows],
+            add_special_tokens=False,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+            verbose=False
+        )
+        db.execute(update_query, [
+            {"text_item_id": text_item_id, "token_count": len(input_ids)}
+            for (text_item_id, _), input_ids in zip(rows, encoded["input_ids"])
+        ])
+        db.commit()
+        after = str(rows[-1][0])
+        total += len(rows)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild TextSetStats rows from TextItem")
+    parser.add_argument("--text-set-id", help="Rebuild one TextSet (default: all)")
+    parser.add_argument("--count-tokens", action="store_true",
+                        help="Fill TextItem.token_count where it is missing before rebuilding")
+    parser.add_argument("--batch-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        text_set_ids = [args.text_set_id] if args.text_set_id else db.execute(select(TextSet.id)).scalars().all()
+        for text_set_id in text_set_ids:
+            start = time.perf_counter()
+            if args.count_tokens:
+                counted = count_tokens(db, text_set_id, args.batch_size)
+                logger.info(f"Counted tokens of {counted} segments in TextSet {text_set_id}")
+            stats = rebuild_stats(db, text_set_id)
+            db.commit()
+            logger.info(
+                f"Rebuilt stats of TextSet {text_set_id} in {time.perf_counter() - start:.3f}s: "
+                f"{stats.item_count} items, {stats.segment_count} segments, ~{stats.creator_count} creators"
+            )
+    finally:
+        db.close()
+    logger.info(f"Rebuilt stats for {len(text_set_ids)} TextSets")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 # schemas.py
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from uuid import UUID
+from datetime import datetime
+from typing import Optional
 
 class CreateTextSet(BaseModel):
     title: str
@@ -15,6 +17,28 @@ class TextSetResponse(CreateTextSet):
     class Config:
         from_attributes = True
 
+class BulkCreateTextSets(BaseModel):
+    items: list[CreateTextSet] = Field(..., min_length=1)
+
+class BulkTextSetResult(BaseModel):
+    title: str
+    status: str  # "created" or "conflict" (title already taken)
+    id: Optional[UUID] = None
+
+class BulkTextSetResponse(BaseModel):
+    created: int
+    conflicts: int
+    results: list[BulkTextSetResult]
+
+class TextSetListItem(BaseModel):
+    id: Optional[UUID] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
 class GetResponse(CreateTextSet):
     textsetId: UUID
     registered_user_id: UUID  # Include user ID in response
@@ -47,3 +71,124 @@ class RegisteredUserResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class RowRejection(BaseModel):
+    row: int  # row number in the file, the header being row 1
+    column: str
+    reason: str
+    value: Optional[str] = None
+    external_item_id: Optional[str] = None
+
+
+class UploadJobResponse(BaseModel):
+    job_id: str
+    status: str
+
+
+class CreateUploadSession(BaseModel):
+    filename: str
+    total_size: int = Field(..., gt=0, description="Size of the whole file in bytes")
+    chunk_size: Optional[int] = Field(None, gt=0, description="Defaults to the server's UPLOAD_CHUNK_SIZE")
+    incremental: bool = False
+    delete_missing: bool = False
+    skip_invalid: bool = False
+
+
+class UploadSessionStatus(BaseModel):
+    upload_id: str
+    filename: str
+    total_size: int
+    chunk_size: int
+    chunk_count: int
+    received_chunks: list[int]
+    missing_chunks: list[int]
+    # Set once a CSV or JSONL session is being parsed while it uploads
+    job_id: Optional[str] = None
+
+
+class IngestJobStatus(BaseModel):
+    job_id: str
+    text_set_id: str
+    filename: str
+    status: str
+    rows_parsed: int
+    segments_embedded: int
+    rows_inserted: int
+    elapsed_seconds: float
+    rows_per_second: float
+    segments_per_second: float
+    stage_seconds: dict[str, float] = {}
+    profile_path: Optional[str] = None
+    # Rows skipped by validation; rejections lists the first MAX_REPORTED_REJECTIONS of them
+    rejected_rows: int = 0
+    rejections: list[RowRejection] = []
+    # Source rows by outcome, keyed on external_item_id; only set for incremental uploads
+    items_inserted: Optional[int] = None
+    items_updated: Optional[int] = None
+    items_unchanged: Optional[int] = None
+    items_removed: Optional[int] = None
+    errors: list[str]
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class SearchRequest(BaseModel):
+    query: str = Field(..., min_length=1)
+    top_k: int = Field(10, ge=1, le=100)
+    creator_id: Optional[str] = None
+    post_date_from: Optional[datetime] = None
+    post_date_to: Optional[datetime] = None
+
+
+class SearchResult(BaseModel):
+    text_item_id: str
+    text_content: str
+    creator_id: Optional[str] = None
+    creator_name: Optional[str] = None
+    post_date: Optional[datetime] = None
+    external_item_id: Optional[str] = None
+    parent_external_item_id: Optional[str] = None
+    score: float
+
+
+class ThreadSegment(BaseModel):
+    text_item_id: str
+    text_content: str
+
+
+class ThreadNode(BaseModel):
+    external_item_id: str
+    parent_external_item_id: Optional[str] = None
+    creator_id: Optional[str] = None
+    creator_name: Optional[str] = None
+    post_date: Optional[datetime] = None
+    depth: int
+    segments: list[ThreadSegment] = []
+    children: list["ThreadNode"] = []
+
+
+ThreadNode.model_rebuild()
+
+
+class ThreadResponse(BaseModel):
+    root_external_item_id: str
+    node_count: int
+    truncated: bool
+    # None when the root is a parent id that was never uploaded; its replies are then in orphans
+    root: Optional[ThreadNode] = None
+    orphans: list[ThreadNode] = []
+
+
+class TextSetStatsResponse(BaseModel):
+    text_set_id: UUID
+    item_count: int = 0
+    segment_count: int = 0
+    # HyperLogLog estimate, within a few percent for large sets
+    creator_count: int = 0
+    # Tokens across all segments; the overlap between windows of one item counts in both
+    total_tokens: int = 0
+    first_post_date: Optional[datetime] = None
+    last_post_date: Optional[datetime] = None
+    last_ingest_at: Optional[datetime] = None
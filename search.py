@@ -0,0 +1,210 @@
+# search.py
+import logging
+import os
+import threading
+import time
+from datetime import timezone
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Path
+from sqlalchemy import text, bindparam
+from sqlalchemy.orm import Session
+from controller import authenticate_user
+from database import get_db
+from models import TextSet
+from schemas import SearchRequest, SearchResult
+from embedding_matrix import matrix_cache
+from embedding_model import get_encoder
+
+try:
+    import hnswlib  # type: ignore
+except ImportError:  # exact search is used when hnswlib is not installed
+    hnswlib = None
+
+logger = logging.getLogger(__name__)
+
+route = APIRouter()
+
+# Sets smaller than this are searched exactly; building a graph would not pay off
+SEARCH_ANN_MIN_ITEMS = int(os.getenv("SEARCH_ANN_MIN_ITEMS", "5000"))
+
+SEARCH_FETCH_ROWS = 5000
+
+
+class SearchIndex:
+    """Normalized embeddings of one TextSet plus the columns search can filter on."""
+
+    def __init__(self, item_ids, creator_ids, post_dates, matrix, generation=None):
+        self.item_ids = item_ids
+        self.creator_ids = creator_ids
+        self.post_dates = post_dates
+        # all-MiniLM-L6-v2 already emits unit vectors; keep the shared mapping when it can
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True).astype(np.float32)
+        if len(matrix) and not np.allclose(norms, 1, atol=1e-2):
+            matrix = (matrix / np.where(norms == 0, 1, norms)).astype(np.float32)
+        self.matrix = matrix
+        # The embedding matrix generation this index was built from
+        self.generation = generation
+        self.graph = None
+        if hnswlib is not None and len(item_ids) >= SEARCH_ANN_MIN_ITEMS:
+            self.graph = hnswlib.Index(space="ip", dim=self.matrix.shape[1])
+            self.graph.init_index(max_elements=len(item_ids), ef_construction=200, M=16)
+            self.graph.add_items(self.matrix, np.arange(len(item_ids)))
+
+    def __len__(self):
+        return len(self.item_ids)
+
+    def filter_mask(self, creator_id=None, post_date_from=None, post_date_to=None):
+        if creator_id is None and post_date_from is None and post_date_to is None:
+            return None
+        mask = np.ones(len(self), dtype=bool)
+        if creator_id is not None:
+            mask &= self.creator_ids == str(creator_id)
+        if post_date_from is not None:
+            mask &= self.post_dates >= _as_datetime64(post_date_from)
+        if post_date_to is not None:
+            mask &= self.post_dates <= _as_datetime64(post_date_to)
+        return mask
+
+    def query(self, vector, top_k, mask=None):
+        vector = vector / (np.linalg.norm(vector) or 1)
+        candidates = None if mask is None else np.flatnonzero(mask)
+        if candidates is not None and len(candidates) == 0:
+            return []
+
+        # Use the graph only when the filter leaves enough rows for it to beat a scan
+        if self.graph is not None and (candidates is None or len(candidates) >= SEARCH_ANN_MIN_ITEMS):
+            k = min(top_k, len(self) if candidates is None else len(candidates))
+            self.graph.set_ef(max(64, 2 * k))
+            if mask is None:
+                labels, distances = self.graph.knn_query(vector, k=k)
+            else:
+                labels, distances = self.graph.knn_query(vector, k=k, filter=lambda label: bool(mask[label]))
+            return [(int(label), 1.0 - float(distance)) for label, distance in zip(labels[0], distances[0])]
+
+        rows = np.arange(len(self)) if candidates is None else candidates
+        scores = self.matrix[rows] @ vector
+        k = min(top_k, len(rows))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(rows[i]), float(scores[i])) for i in best]
+
+
+def _optional_str(value):
+    return None if value is None else str(value)
+
+
+def _as_datetime64(value):
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return np.datetime64(value, "us")
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+_build_locks = {}
+
+# Function to build a SearchIndex from the shared embedding matrix of a TextSet
+def build_index(db: Session, text_set_id) -> SearchIndex:
+    matrix = matrix_cache.get(db, text_set_id)
+    item_ids = np.array(matrix.item_ids(), dtype=object)
+    positions = {item_id: position for position, item_id in enumerate(item_ids)}
+
+    # Only the filterable columns are read from the database
+    creator_ids = np.full(len(item_ids), None, dtype=object)
+    post_dates = np.full(len(item_ids), np.datetime64("NaT"), dtype="datetime64[us]")
+    result = db.execute(
+        text("SELECT text_item_id, creator_id, post_date FROM TextItem WHERE text_set_id = :text_set_id")
+        .execution_options(stream_results=True),
+        {"text_set_id": str(text_set_id)}
+    )
+    while True:
+        rows = result.fetchmany(SEARCH_FETCH_ROWS)
+        if not rows:
+            break
+        for text_item_id, creator_id, post_date in rows:
+            position = positions.get(str(text_item_id))
+            if position is None:
+                continue
+            creator_ids[position] = str(creator_id)
+            if post_date:
+                post_dates[position] = np.datetime64(post_date.replace(tzinfo=None), "us")
+
+    return SearchIndex(item_ids, creator_ids, post_dates, matrix.vectors, matrix.generation)
+
+# Function to return the cached index of a TextSet, building it on first use. Every
+# upload, from any worker, publishes a new matrix generation, so an index is rebuilt
+# only when the set's current generation is no longer the one it was built from.
+def get_index(db: Session, text_set_id) -> SearchIndex:
+    key = str(text_set_id)
+    generation = matrix_cache.current_generation(key)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None and generation is not None and index.generation == generation:
+            return index
+        build_lock = _build_locks.setdefault(key, threading.Lock())
+
+    # Only one request builds a given set; the others wait for its result
+    with build_lock:
+        with _indexes_lock:
+            index = _indexes.get(key)
+        generation = matrix_cache.current_generation(key)
+        if index is None or generation is None or index.generation != generation:
+            start = time.perf_counter()
+            index = build_index(db, key)
+            logger.info(f"Built search index for TextSet {key}: {len(index)} items in {time.perf_counter() - start:.2f}s")
+            with _indexes_lock:
+                _indexes[key] = index
+    return index
+
+# Function to drop a TextSet's index after its items change
+def invalidate_index(text_set_id):
+    with _indexes_lock:
+        _indexes.pop(str(text_set_id), None)
+
+# Similarity search endpoint over the TextItems of a TextSet
+@route.post("/TextSet/{text_set_id}/search", response_model=list[SearchResult])
+def search_text_set(
+    request: SearchRequest,
+    text_set_id: str = Path(..., description="UUID of the TextSet to search"),
+    user_id: str = Depends(authenticate_user),
+    db: Session = Depends(get_db)
+):
+    text_set = db.query(TextSet).filter_by(id=text_set_id, owner_id=user_id).first()
+    if not text_set:
+        raise HTTPException(status_code=404, detail="TextSet not found or not accessible")
+
+    index = get_index(db, text_set_id)
+    if len(index) == 0:
+        return []
+
+    query_vector = get_encoder().encode([request.query])[0]
+    mask = index.filter_mask(request.creator_id, request.post_date_from, request.post_date_to)
+    hits = index.query(query_vector, request.top_k, mask)
+    if not hits:
+        return []
+
+    scores = {index.item_ids[position]: score for position, score in hits}
+    rows = db.execute(
+        text("""
+            SELECT text_item_id, text_content, creator_id, creator_name, post_date,
+                   external_item_id, parent_external_item_id
+            FROM TextItem WHERE text_item_id IN :ids
+        """).bindparams(bindparam("ids", expanding=True)),
+        {"ids": list(scores)}
+    ).mappings().all()
+
+    results = [
+        SearchResult(
+            text_item_id=str(row["text_item_id"]),
+            text_content=row["text_content"],
+            creator_id=_optional_str(row["creator_id"]),
+            creator_name=_optional_str(row["creator_name"]),
+            post_date=row["post_date"],
+            external_item_id=_optional_str(row["external_item_id"]),
+            parent_external_item_id=_optional_str(row["parent_external_item_id"]),
+            score=scores[str(row["text_item_id"])]
+        )
+        for row in rows
+    ]
+    results.sort(key=lambda result: result.score, reverse=True)
+    return results
@@ -97,60 +97,124 @@
     
     
 # service.py
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from fastapi import HTTPException, status
-from passlib.hash import bcrypt
-from uuid import UUID
+from password_hashing import hash_password, verify_password
+from uuid import UUID, uuid4
+from datetime import datetime
+from typing import Optional
+import base64
+import os
 from models import RegisteredUser, TextSet
-from schemas import RegisteredUserCreate, RegisteredUserResponse, CreateTextSet, TextSetResponse
+from schemas import RegisteredUserCreate, RegisteredUserResponse, CreateTextSet, TextSetResponse, BulkTextSetResult, BulkTextSetResponse
 from auth import create_access_token
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Columns GET /TextSet can project, and the ones returned when no projection is given
+TEXT_SET_FIELDS = ['id', 'title', 'description', 'created_at']
+DEFAULT_TEXT_SET_FIELDS = ['id', 'title', 'description']
+
+# Most TextSets accepted by one POST /TextSet/bulk request
+TEXT_SET_BULK_MAX = int(os.getenv("TEXT_SET_BULK_MAX", "1000"))
+
+# Keyset cursors are the (created_at, id) of the last row of a page
+def encode_cursor(created_at: datetime, text_set_id: UUID) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{text_set_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        created_at, text_set_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), UUID(text_set_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
 class TextSetService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def create_text_set(self, text_set: CreateTextSet, user_id: UUID) -> TextSetResponse:
-        existing_text_set = self.db.query(TextSet).filter(TextSet.title == text_set.title).first()
-        if existing_text_set:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="TextSet with this title already exists")
-        
-        new_text_set = TextSet(
-        title=text_set.title,
-        description=text_set.description,
-        owner_id=user_id  # Ensure this is a UUID
-    )
-        
+    # Insert TextSets in one INSERT ... ON CONFLICT (title) DO NOTHING RETURNING statement.
+    # Taken titles are skipped by the database, so there is no check-then-insert race.
+    # Returns title -> id for the rows actually inserted.
+    async def insert_text_sets(self, text_sets: list[CreateTextSet], user_id: UUID) -> dict:
+        rows = [
+            {"id": uuid4(), "title": text_set.title, "description": text_set.description, "owner_id": user_id}
+            for text_set in text_sets
+        ]
+        statement = (
+            pg_insert(TextSet)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=[TextSet.title])
+            .returning(TextSet.id, TextSet.title)
+        )
         try:
-            self.db.add(new_text_set)
-            self.db.commit()
-            self.db.refresh(new_text_set)
+            created = {title: text_set_id for text_set_id, title in (await self.db.execute(statement)).all()}
+            await self.db.commit()
         except SQLAlchemyError as e:
-            self.db.rollback()
-            logger.error(f"Error saving TextSet: {str(e)}")
+            await self.db.rollback()
+            logger.error(f"Error saving TextSets: {str(e)}")
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error saving TextSet")
-        
-        return TextSetResponse(id=new_text_set.id, title=new_text_set.title, description=new_text_set.description)
+        return created
+
+    async def create_text_set(self, text_set: CreateTextSet, user_id: UUID) -> TextSetResponse:
+        created = await self.insert_text_sets([text_set], user_id)
+        if text_set.title not in created:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="TextSet with this title already exists")
+        return TextSetResponse(id=created[text_set.title], title=text_set.title, description=text_set.description)
+
+    async def create_text_sets(self, text_sets: list[CreateTextSet], user_id: UUID) -> BulkTextSetResponse:
+        if len(text_sets) > TEXT_SET_BULK_MAX:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"At most {TEXT_SET_BULK_MAX} TextSets can be created per request"
+            )
+        created = await self.insert_text_sets(text_sets, user_id)
+        results = []
+        for text_set in text_sets:
+            # A title repeated within the request is created once; later copies are conflicts
+            text_set_id = created.pop(text_set.title, None)
+            results.append(BulkTextSetResult(
+                title=text_set.title,
+                status="created" if text_set_id else "conflict",
+                id=text_set_id
+            ))
+        created_count = sum(1 for result in results if result.status == "created")
+        return BulkTextSetResponse(created=created_count, conflicts=len(results) - created_count, results=results)
+
+    async def get_text_set(self, owner_id: UUID, limit: int = 50, after: Optional[str] = None,
+                     fields: Optional[list[str]] = None) -> tuple[list[dict], Optional[str]]:
+        fields = fields or DEFAULT_TEXT_SET_FIELDS
+        unknown = [field for field in fields if field not in TEXT_SET_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown fields: {unknown}")
+
+        # id and created_at are always read because the cursor is built from them
+        columns = list(dict.fromkeys(fields + ['created_at', 'id']))
+        query = select(*[getattr(TextSet, column) for column in columns]).where(TextSet.owner_id == owner_id)
+        if after:
+            created_at, last_id = decode_cursor(after)
+            query = query.where(tuple_(TextSet.created_at, TextSet.id) > tuple_(created_at, last_id))
 
-    def get_text_set(self) -> list[TextSetResponse]:
         try:
-            return self.db.query(TextSet).all()
+            rows = (await self.db.execute(query.order_by(TextSet.created_at, TextSet.id).limit(limit + 1))).all()
         except SQLAlchemyError as e:
             logger.error(f"Error fetching TextSets: {str(e)}")
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error fetching TextSets")
 
+        next_cursor = encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id) if len(rows) > limit else None
+        return [{field: getattr(row, field) for field in fields} for row in rows[:limit]], next_cursor
 
-class UserService:
-    blacklisted_tokens = set()
 
-    def __init__(self, db: Session):
+class UserService:
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def register_user(self, Ruser: RegisteredUserCreate) -> RegisteredUserResponse:
-        hashed_password = bcrypt.hash(Ruser.password)
+    async def register_user(self, Ruser: RegisteredUserCreate) -> RegisteredUserResponse:
+        hashed_password = await hash_password(Ruser.password)
         new_user = RegisteredUser(
             user_name=Ruser.user_name,
             email=Ruser.email,
@@ -159,26 +223,36 @@ class UserService:
         
         try:
             self.db.add(new_user)
-            self.db.commit()
-            self.db.refresh(new_user)
+            await self.db.commit()
         except IntegrityError:
-            self.db.rollback()
+            await self.db.rollback()
             logger.error("Username or email already exists.")
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username or email already exists.")
         except SQLAlchemyError as e:
-            self.db.rollback()
+            await self.db.rollback()
             logger.error(f"Database error during user registration: {str(e)}")
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to register user")
         
         return RegisteredUserResponse(id=new_user.id, user_name=new_user.user_name)
 
-    def login(self, username: str, password: str) -> str:
-        user = self.db.query(RegisteredUser).filter(RegisteredUser.user_name == username).first()
-        if not user or not bcrypt.verify(password, user.hashed_password):
+    async def login(self, username: str, password: str) -> str:
+        user = await self.db.scalar(select(RegisteredUser).where(RegisteredUser.user_name == username).limit(1))
+        if not user:
+            logger.warning("Invalid login credentials.")
+            return None
+        user_id = user.id  # read before a possible rollback expires the instance
+        valid, rehashed = await verify_password(password, user.hashed_password)
+        if not valid:
             logger.warning("Invalid login credentials.")
             return None
+        if rehashed:
+            # Stored hash used a different BCRYPT_ROUNDS; upgrading it must not fail the login
+            try:
+                user.hashed_password = rehashed
+                await self.db.commit()
+            except SQLAlchemyError as e:
+                await self.db.rollback()
+                logger.error(f"Error rehashing password for user {user_id}: {str(e)}")
     # Pass user ID instead of username to create_access_token
-        return create_access_token(data={"sub": str(user.id)})
+        return create_access_token(data={"sub": str(user_id)})
 
-    def is_token_blacklisted(self, token: str) -> bool:
-        return token in self.blacklisted_tokens
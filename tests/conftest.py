@@ -0,0 +1,109 @@
+# tests/conftest.py
+import os
+import sys
+
+# The service modules live at the repository root and are imported by name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import csv
+import json
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+COLUMNS = ['creator_id', 'creator_name', 'text_content', 'post_date', 'external_item_id', 'parent_external_item_id']
+
+# Characters the test tokenizer knows, after NFD: ASCII, combining accents, Hangul jamo
+VOCAB_CHARS = (
+    [chr(c) for c in range(33, 127)]
+    + [chr(c) for c in range(0x300, 0x370)]
+    + [chr(c) for c in range(0x1100, 0x1200)]
+)
+
+
+def make_tokenizer():
+    """Character-level WordPiece behind an NFD normalizer, so one Hangul syllable is 2-3 tokens."""
+    from tokenizers import Tokenizer, models, normalizers, pre_tokenizers
+    from transformers import PreTrainedTokenizerFast
+
+    vocab = {"[UNK]": 0}
+    for char in VOCAB_CHARS:
+        vocab.setdefault(char, len(vocab))
+        vocab.setdefault("##" + char, len(vocab))
+    backend = Tokenizer(models.WordPiece(vocab, unk_token="[UNK]", max_input_chars_per_word=10000))
+    backend.normalizer = normalizers.NFD()
+    backend.pre_tokenizer = pre_tokenizers.Whitespace()
+    return PreTrainedTokenizerFast(tokenizer_object=backend, unk_token="[UNK]")
+
+
+@pytest.fixture(scope="session")
+def tokenizer():
+    return make_tokenizer()
+
+
+@pytest.fixture
+def db(tmp_path):
+    from benchmarks.ingestion import SQLITE_TEXT_ITEM
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.sqlite'}")
+    with engine.begin() as connection:
+        connection.execute(text(SQLITE_TEXT_ITEM))
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def pipeline(monkeypatch, tokenizer):
+    """Run uploadfile's ingestion with the test tokenizer, a stub encoder and blob embeddings."""
+    import uploadfile
+    from benchmarks.ingestion import StubEncoder
+    from bulk_writer import TextItemWriter
+    from embedding_cache import EmbeddingCache
+
+    encoder = StubEncoder()
+    monkeypatch.setattr(uploadfile, "get_tokenizer", lambda: tokenizer)
+    monkeypatch.setattr(uploadfile, "get_encoder", lambda: encoder)
+    monkeypatch.setattr(uploadfile, "embedding_cache", EmbeddingCache(path=None))
+    monkeypatch.setattr(uploadfile, "TextItemWriter", lambda db: TextItemWriter(db, storage="f32"))
+    return uploadfile
+
+
+def write_upload(path, rows, file_format):
+    """Write rows (dicts over COLUMNS, None for a blank cell) as an upload file."""
+    path = f"{path}.{file_format}"
+    if file_format == "csv":
+        with open(path, "w", newline="", encoding="utf-8") as output:
+            writer = csv.writer(output)
+            writer.writerow(COLUMNS)
+            writer.writerows([["" if row[column] is None else row[column] for column in COLUMNS] for row in rows])
+    elif file_format == "xlsx":
+        from openpyxl import Workbook
+
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(COLUMNS)
+        for row in rows:
+            sheet.append([row[column] for column in COLUMNS])
+        workbook.save(path)
+    elif file_format == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        pq.write_table(pa.table({column: [row[column] for row in rows] for column in COLUMNS}), path)
+    elif file_format == "jsonl":
+        with open(path, "w", encoding="utf-8") as output:
+            for row in rows:
+                output.write(json.dumps({column: row[column] for column in COLUMNS}) + "\n")
+    return path
+
+
+def item(external_item_id, parent=None, text_content=None, post_date="2024-01-01T00:00:00Z", creator_id="c1"):
+    return {
+        'creator_id': creator_id,
+        'creator_name': f"Creator {creator_id}",
+        'text_content': text_content or f"text of {external_item_id}",
+        'post_date': post_date,
+        'external_item_id': external_item_id,
+        'parent_external_item_id': parent,
+    }
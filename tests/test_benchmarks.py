@@ -0,0 +1,39 @@
+# tests/test_benchmarks.py
+import pytest
+from sqlalchemy import text
+from benchmarks.corpus import DISTRIBUTIONS, make_rows
+from benchmarks.ingestion import StageTimer, write_input
+from readers import iter_row_chunks
+
+
+def test_corpus_is_reproducible_per_seed():
+    assert make_rows(50, seed=3) == make_rows(50, seed=3)
+    assert make_rows(50, seed=3) != make_rows(50, seed=4)
+
+
+def test_distributions_bound_the_word_counts():
+    for row in make_rows(20, distribution=DISTRIBUTIONS["short"]):
+        assert 3 <= len(row.split()) <= 45
+
+
+def test_stage_timer_counts_calls_and_iterator_steps():
+    timer = StageTimer()
+    double = timer.wrap("double", lambda value: value * 2)
+    assert double(2) == 4
+    assert list(timer.wrap_iterator("read", lambda: iter("ab"))()) == ["a", "b"]
+
+    assert timer.calls == {"double": 1, "read": 3}
+
+
+@pytest.mark.parametrize("file_format", ["csv", "xlsx"])
+def test_generated_input_ingests_end_to_end(pipeline, db, tmp_path, file_format):
+    path = str(tmp_path / f"input.{file_format}")
+    write_input(path, make_rows(30, distribution=DISTRIBUTIONS["short"]), file_format, seed=0)
+
+    assert sum(len(chunk) for chunk in iter_row_chunks(path)) == 30
+
+    segments = pipeline.ingest_file(db, "bench-set", path)
+    db.commit()
+
+    stored = db.execute(text("SELECT COUNT(*), COUNT(DISTINCT external_item_id) FROM TextItem")).one()
+    assert tuple(stored) == (segments, 30)
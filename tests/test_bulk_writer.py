@@ -0,0 +1,36 @@
+# tests/test_bulk_writer.py
+import logging
+from datetime import datetime, timezone
+import numpy as np
+from sqlalchemy import text
+from bulk_writer import TextItemWriter, _copy_field
+
+
+def row(n):
+    return {
+        'creator_id': "c1", 'creator_name': "Creator", 'text_set_id': "set-1", 'text_item_id': f"id-{n}",
+        'text_content': f"segment {n}", 'post_date': datetime(2024, 1, 1, tzinfo=timezone.utc),
+        'external_item_id': f"p{n}", 'parent_external_item_id': None,
+        'embeddings': np.ones(4, dtype=np.float32),
+    }
+
+
+def test_writer_logs_the_insert_path_and_flushes_in_batches(db, caplog):
+    writer = TextItemWriter(db, flush_size=2, storage="f32")
+    with caplog.at_level(logging.INFO, logger="bulk_writer"):
+        for n in range(5):
+            writer.add(row(n))
+        writer.flush()
+    assert writer.use_copy is False
+    assert "executemany INSERT (sqlite+pysqlite)" in caplog.text
+    assert writer.inserted == 5
+    assert db.execute(text("SELECT COUNT(*) FROM TextItem")).scalar() == 5
+
+
+def test_copy_field_escapes_copy_text_format():
+    assert _copy_field(None) == "\\N"
+    assert _copy_field(float("nan")) == "\\N"
+    assert _copy_field("a\tb\nc\\") == "a\\tb\\nc\\\\"
+    # bytea goes in as \x hex, whose backslash COPY needs escaped
+    assert _copy_field(b"\x01\xff") == "\\\\x01ff"
+    assert _copy_field([1, 2.5]) == "{1.0,2.5}"
@@ -0,0 +1,8 @@
+# tests/test_database.py
+import database
+
+
+def test_engines_name_their_drivers():
+    # bulk_writer.py's COPY path depends on the sync engine running psycopg2
+    assert database.engine.dialect.driver == "psycopg2"
+    assert database.async_engine.dialect.driver == "asyncpg"
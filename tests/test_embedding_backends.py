@@ -0,0 +1,68 @@
+# tests/test_embedding_backends.py
+import numpy as np
+import pytest
+import embedding_backends
+from conftest import make_tokenizer
+from embedding_backends import OnnxBackend, export_onnx, load_backend
+
+
+class FakeSession:
+    """Returns each token's id as its hidden state, so pooling is easy to predict."""
+
+    def run(self, outputs, feed):
+        ids = feed["input_ids"].astype(np.float32)
+        return [np.stack([ids, np.ones_like(ids)], axis=-1)]
+
+
+@pytest.fixture
+def tokenizer():
+    tokenizer = make_tokenizer()
+    # Padded positions are masked out, so any token id will do
+    tokenizer.pad_token = "[UNK]"
+    return tokenizer
+
+
+@pytest.fixture
+def backend(tokenizer):
+    backend = object.__new__(OnnxBackend)
+    backend.session = FakeSession()
+    backend.input_names = ["input_ids", "attention_mask"]
+    backend.tokenizer = tokenizer
+    backend.max_length = 256
+    backend.dimension = 2
+    return backend
+
+
+def expected(tokenizer, text):
+    ids = np.asarray(tokenizer(text)["input_ids"], dtype=np.float32)
+    pooled = np.array([ids.mean(), 1.0], dtype=np.float32)
+    return pooled / np.linalg.norm(pooled)
+
+
+def test_mean_pooling_ignores_padding(backend, tokenizer):
+    texts = ["a", "abc def", "zz"]
+
+    embeddings = backend.encode(texts, batch_size=3)
+
+    for text, vector in zip(texts, embeddings):
+        np.testing.assert_allclose(vector, expected(tokenizer, text), rtol=1e-5)
+
+
+def test_rows_keep_input_order_across_batches(backend):
+    texts = ["bb", "a", "dddd", "ccc", "e"]
+    np.testing.assert_allclose(backend.encode(texts, batch_size=2), backend.encode(texts, batch_size=5), rtol=1e-6)
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown embedding backend"):
+        load_backend("all-MiniLM-L6-v2", "tensorrt")
+
+
+def test_exported_graphs_are_reused(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_backends, "ONNX_MODEL_DIR", str(tmp_path))
+    directory = tmp_path / "sentence-transformers__all-MiniLM-L6-v2"
+    directory.mkdir()
+    (directory / "model.onnx").write_bytes(b"graph")
+    monkeypatch.setattr(embedding_backends, "_export_fp32", lambda *args: pytest.fail("exported again"))
+
+    assert export_onnx("sentence-transformers/all-MiniLM-L6-v2") == str(directory / "model.onnx")
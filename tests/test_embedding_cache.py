@@ -0,0 +1,52 @@
+# tests/test_embedding_cache.py
+import numpy as np
+from embedding_cache import EmbeddingCache, cache_hits, cache_key, cache_misses
+
+
+def vector(value):
+    return np.full(4, value, dtype=np.float32)
+
+
+def test_key_ignores_whitespace_and_unicode_form():
+    assert cache_key("model", "café  au\tlait ") == cache_key("model", "café au lait")
+
+
+def test_key_depends_on_encoder():
+    assert cache_key("model-a", "hello") != cache_key("model-b", "hello")
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = EmbeddingCache(max_entries=2, path=None)
+    cache.put_many([(b"a", vector(1)), (b"b", vector(2))])
+    cache.get_many([b"a"])
+    cache.put_many([(b"c", vector(3))])
+
+    assert len(cache) == 2
+    assert set(cache.get_many([b"a", b"b", b"c"])) == {b"a", b"c"}
+
+
+def test_hits_and_misses_are_counted_per_tier(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    EmbeddingCache(max_entries=10, path=path).put_many([(b"a", vector(1))])
+    cache = EmbeddingCache(max_entries=10, path=path)
+
+    memory, disk, misses = cache_hits.value(tier="memory"), cache_hits.value(tier="disk"), cache_misses.value()
+    cache.get_many([b"a", b"missing"])
+    cache.get_many([b"a"])
+
+    assert cache_hits.value(tier="disk") - disk == 1
+    assert cache_hits.value(tier="memory") - memory == 1
+    assert cache_misses.value() - misses == 1
+
+
+def test_sqlite_tier_is_shared_between_caches(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    EmbeddingCache(max_entries=10, path=path).put_many([(b"a", vector(0.5))])
+
+    cache = EmbeddingCache(max_entries=10, path=path)
+    found = cache.get_many([b"a", b"b"])
+
+    assert list(found) == [b"a"]
+    np.testing.assert_array_equal(found[b"a"], vector(0.5))
+    # Disk hits are promoted into the memory tier
+    assert len(cache) == 1
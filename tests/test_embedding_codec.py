@@ -0,0 +1,47 @@
+# tests/test_embedding_codec.py
+import numpy as np
+import pytest
+from embedding_codec import FORMATS, decode_embedding, decode_many, encode_embedding, row_embedding
+
+TOLERANCE = {"f32": 0.0, "f16": 1e-3, "i8": 1e-2}
+
+
+@pytest.fixture
+def vector():
+    vector = np.random.default_rng(0).standard_normal(384).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+@pytest.mark.parametrize("storage", sorted(FORMATS))
+def test_round_trip_within_format_precision(vector, storage):
+    blob = encode_embedding(vector, storage)
+    assert blob[0] == FORMATS[storage]
+    decoded = decode_embedding(blob)
+    assert decoded.shape == vector.shape
+    assert np.max(np.abs(decoded.astype(np.float32) - vector)) <= TOLERANCE[storage]
+
+
+def test_blob_sizes(vector):
+    assert len(encode_embedding(vector, "f32")) == 1 + 4 * 384
+    assert len(encode_embedding(vector, "f16")) == 1 + 2 * 384
+    assert len(encode_embedding(vector, "i8")) == 1 + 4 + 384
+
+
+def test_zero_vector_survives_i8():
+    assert not decode_embedding(encode_embedding(np.zeros(8), "i8")).any()
+
+
+def test_decode_many_and_legacy_rows(vector):
+    blobs = [encode_embedding(vector * n, "f16") for n in (1, 2)]
+    matrix = decode_many(blobs)
+    assert matrix.shape == (2, 384) and matrix.dtype == np.float32
+    assert decode_many([]).shape == (0, 0)
+    # Rows without a blob fall back to the float[] column
+    assert np.array_equal(row_embedding(vector.tolist(), None), vector)
+
+
+def test_unknown_formats_are_rejected(vector):
+    with pytest.raises(ValueError):
+        encode_embedding(vector, "f64")
+    with pytest.raises(ValueError):
+        decode_embedding(b"\x09abcd")
@@ -0,0 +1,86 @@
+# tests/test_embedding_matrix.py
+import numpy as np
+import pytest
+from sqlalchemy import text
+from conftest import item, write_upload
+from embedding_codec import row_embedding
+from embedding_matrix import EmbeddingMatrixCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return EmbeddingMatrixCache(root=str(tmp_path / "matrices"), dtype=np.dtype("float32"))
+
+
+def upload(pipeline, db, tmp_path, name, ids, staging=None):
+    path = write_upload(tmp_path / name, [item(external_item_id) for external_item_id in ids], "csv")
+    pipeline.ingest_file(db, "set-1", path, staging=staging)
+    db.commit()
+    if staging:
+        staging.commit()
+
+
+def stored(db):
+    rows = db.execute(text("SELECT text_item_id, embeddings, embedding_blob FROM TextItem")).fetchall()
+    return {str(item_id): row_embedding(embeddings, blob) for item_id, embeddings, blob in rows}
+
+
+def assert_matches(matrix, db):
+    expected = stored(db)
+    assert sorted(matrix.item_ids()) == sorted(expected)
+    for item_id, vector in zip(matrix.item_ids(), matrix.vectors):
+        np.testing.assert_allclose(vector, expected[item_id], rtol=1e-6)
+
+
+def test_first_read_builds_the_matrix_from_the_database(pipeline, db, tmp_path, cache):
+    upload(pipeline, db, tmp_path, "first", ["p1", "p2", "p3"])
+
+    matrix = cache.get(db, "set-1")
+
+    assert len(matrix) == 3
+    assert isinstance(matrix.vectors, np.memmap)
+    assert_matches(matrix, db)
+    assert cache.get(db, "set-1") is matrix
+
+
+def test_committed_uploads_extend_a_loaded_matrix(pipeline, db, tmp_path, cache):
+    upload(pipeline, db, tmp_path, "first", ["p1", "p2"])
+    before = cache.get(db, "set-1")
+
+    upload(pipeline, db, tmp_path, "second", ["p3"], staging=cache.staging("set-1"))
+    after = cache.get(db, "set-1")
+
+    assert after.generation != before.generation
+    assert len(after) == 3
+    assert_matches(after, db)
+    # Mappings that were already open stay readable
+    assert len(np.asarray(before.vectors)) == 2
+
+
+def test_extend_skips_items_the_matrix_already_holds(pipeline, db, tmp_path, cache):
+    upload(pipeline, db, tmp_path, "first", ["p1", "p2"])
+    matrix = cache.get(db, "set-1")
+
+    cache.extend("set-1", np.asarray(matrix.ids), np.asarray(matrix.vectors))
+
+    assert cache.get(db, "set-1").generation == matrix.generation
+
+
+def test_unloaded_sets_are_left_alone_until_first_read(pipeline, db, tmp_path, cache):
+    upload(pipeline, db, tmp_path, "first", ["p1"], staging=cache.staging("set-1"))
+
+    assert cache.current_generation("set-1") is None
+    assert len(cache.get(db, "set-1")) == 1
+
+
+def test_invalidate_forces_a_rebuild(pipeline, db, tmp_path, cache):
+    upload(pipeline, db, tmp_path, "first", ["p1", "p2"])
+    matrix = cache.get(db, "set-1")
+    db.execute(text("DELETE FROM TextItem WHERE external_item_id = 'p2'"))
+    db.commit()
+
+    cache.invalidate("set-1")
+    rebuilt = cache.get(db, "set-1")
+
+    assert rebuilt.generation != matrix.generation
+    assert_matches(rebuilt, db)
@@ -0,0 +1,58 @@
+# tests/test_embedding_model.py
+import pytest
+from fastapi.testclient import TestClient
+import embedding_model
+import main
+from benchmarks.ingestion import StubEncoder
+
+
+@pytest.fixture(autouse=True)
+def warmup_state(monkeypatch):
+    monkeypatch.setattr(embedding_model, "_warmup", {"status": "cold", "seconds": None, "error": None})
+
+
+def test_importing_the_app_loads_no_model():
+    assert embedding_model._encoder is None
+    assert embedding_model._backend is None
+
+
+def test_warm_up_loads_and_encodes_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(embedding_model, "get_tokenizer", lambda: calls.append("tokenizer"))
+    monkeypatch.setattr(embedding_model, "get_encoder", lambda: calls.append("encoder") or StubEncoder())
+
+    embedding_model.warm_up()
+
+    assert calls == ["tokenizer", "encoder"]
+    state = embedding_model.readiness()
+    assert state["status"] == "ready"
+    assert state["seconds"] is not None
+
+
+def test_failed_warm_up_is_reported(monkeypatch):
+    def missing_model():
+        raise OSError("model files not found")
+
+    monkeypatch.setattr(embedding_model, "get_tokenizer", missing_model)
+
+    embedding_model.warm_up()
+
+    assert embedding_model.readiness()["status"] == "failed"
+    assert embedding_model.readiness()["error"] == "model files not found"
+
+
+@pytest.mark.parametrize("warmup, status, code", [
+    (True, "cold", 503),
+    (True, "loading", 503),
+    (True, "ready", 200),
+    (False, "cold", 200),
+    (False, "failed", 503),
+])
+def test_ready_endpoint(monkeypatch, warmup, status, code):
+    monkeypatch.setattr(main, "MODEL_WARMUP_ON_STARTUP", warmup)
+    embedding_model._warmup["status"] = status
+
+    response = TestClient(main.app).get("/ready")
+
+    assert response.status_code == code
+    assert response.json()["status"] == status
@@ -0,0 +1,119 @@
+# tests/test_embedding_pool.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+import embedding_pool
+from benchmarks.ingestion import StubEncoder
+from embedding_pool import EmbeddingPool, InProcessEncoder, create_encoder
+
+
+class StubReplica:
+    dimension = StubEncoder.dimension
+
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+
+    def encode(self, texts, batch_size):
+        self.batches.append(len(texts))
+        if self.fail:
+            raise RuntimeError("replica crashed")
+        return StubEncoder().encode(texts)
+
+
+class ThreadExecutor(ThreadPoolExecutor):
+    """Stands in for the process pool; replicas share the stub in this process."""
+
+    def __init__(self, max_workers, mp_context=None, initializer=None, initargs=()):
+        super().__init__(max_workers=max_workers)
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    replica = StubReplica()
+    monkeypatch.setattr(embedding_pool, "ProcessPoolExecutor", ThreadExecutor)
+    monkeypatch.setattr(embedding_pool, "_replica", replica)
+    return replica
+
+
+@pytest.fixture
+def pool(replica):
+    pool = EmbeddingPool("model", "torch", batch_size=8, workers=2, max_batch=4, coalesce_ms=50)
+    yield pool
+    pool.close()
+
+
+def test_results_follow_the_request_order(pool):
+    texts = [f"text {i}" for i in range(10)]
+    np.testing.assert_allclose(pool.encode(texts), StubEncoder().encode(texts), rtol=1e-6)
+
+
+def test_large_requests_are_split_into_pool_batches(pool, replica):
+    pool.encode([f"text {i}" for i in range(10)])
+    assert max(replica.batches) <= 4
+    assert sum(replica.batches) == 10
+
+
+def test_concurrent_requests_are_coalesced(pool, replica):
+    results = {}
+    start = threading.Barrier(4)
+
+    def request(n):
+        start.wait()
+        results[n] = pool.encode([f"caller {n}"])
+
+    callers = [threading.Thread(target=request, args=(n,)) for n in range(4)]
+    for caller in callers:
+        caller.start()
+    for caller in callers:
+        caller.join()
+
+    assert len(replica.batches) < 4
+    for n, vectors in results.items():
+        np.testing.assert_allclose(vectors, StubEncoder().encode([f"caller {n}"]), rtol=1e-6)
+
+
+def test_replica_errors_reach_every_caller(pool, replica):
+    replica.fail = True
+    with pytest.raises(RuntimeError, match="replica crashed"):
+        pool.encode(["a", "b"])
+
+
+def test_empty_request_has_the_output_width(pool):
+    assert pool.encode([]).shape == (0, StubEncoder.dimension)
+
+
+def test_zero_workers_encode_in_process(monkeypatch):
+    monkeypatch.setattr(embedding_pool, "EMBEDDING_WORKERS", 0)
+    encoder = create_encoder("model", "torch", 8, StubReplica)
+    assert isinstance(encoder, InProcessEncoder)
+    assert encoder.encode(["a"]).shape == (1, StubEncoder.dimension)
+
+
+def cgroup(tmp_path, files):
+    for name, content in files.items():
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text(content)
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize("files, expected", [
+    ({}, 16),
+    ({"cpu.max": "max 100000\n"}, 16),
+    ({"cpu.max": "250000 100000\n"}, 2),
+    ({"cpu.max": "50000 100000\n"}, 1),
+    ({"cpu/cpu.cfs_quota_us": "300000\n", "cpu/cpu.cfs_period_us": "100000\n"}, 3),
+    ({"cpu/cpu.cfs_quota_us": "-1\n", "cpu/cpu.cfs_period_us": "100000\n"}, 16),
+])
+def test_available_cpus_honours_the_cgroup_quota(tmp_path, monkeypatch, files, expected):
+    monkeypatch.setattr(embedding_pool.os, "sched_getaffinity", lambda pid: set(range(16)), raising=False)
+    assert embedding_pool.available_cpus(cgroup(tmp_path, files)) == expected
+
+
+def test_default_workers_are_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_pool.os, "sched_getaffinity", lambda pid: set(range(64)), raising=False)
+    assert embedding_pool.default_workers(cgroup(tmp_path, {})) == embedding_pool.EMBEDDING_MAX_DEFAULT_WORKERS
+
+    monkeypatch.setattr(embedding_pool, "EMBEDDING_TORCH_THREADS", 2)
+    assert embedding_pool.default_workers(cgroup(tmp_path, {"cpu.max": "300000 100000"})) == 1
@@ -0,0 +1,45 @@
+# tests/test_encode_segments.py
+import numpy as np
+import pytest
+from benchmarks.ingestion import StubEncoder
+
+
+class RecordingEncoder(StubEncoder):
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts):
+        self.batches.append(list(texts))
+        return super().encode(texts)
+
+
+@pytest.fixture
+def encoder(pipeline, monkeypatch):
+    encoder = RecordingEncoder()
+    monkeypatch.setattr(pipeline, "get_encoder", lambda: encoder)
+    return encoder
+
+
+def test_rows_match_their_segments(pipeline, encoder):
+    segments = ["short", "a much longer segment", "mid length"]
+    embeddings = pipeline.encode_segments(segments)
+
+    assert embeddings.shape == (3, encoder.dimension)
+    np.testing.assert_allclose(embeddings, StubEncoder().encode(segments), rtol=1e-6)
+
+
+def test_one_batch_per_call_longest_first_and_deduplicated(pipeline, encoder):
+    segments = ["bb", "a", "ccc", "a", "bb"]
+    embeddings = pipeline.encode_segments(segments)
+
+    assert encoder.batches == [["ccc", "bb", "a"]]
+    np.testing.assert_array_equal(embeddings[1], embeddings[3])
+    np.testing.assert_array_equal(embeddings[0], embeddings[4])
+
+
+def test_cached_segments_are_not_encoded_again(pipeline, encoder):
+    first = pipeline.encode_segments(["hello world", "again"])
+    second = pipeline.encode_segments(["hello  world", "new"])
+
+    assert encoder.batches[1] == ["new"]
+    np.testing.assert_array_equal(first[0], second[0])
@@ -0,0 +1,41 @@
+# tests/test_incremental.py
+from sqlalchemy import text
+from incremental import IncrementalSync
+from conftest import item, write_upload
+
+
+def stored(db):
+    return db.execute(text(
+        "SELECT external_item_id, text_content FROM TextItem ORDER BY external_item_id"
+    )).fetchall()
+
+
+def upload(pipeline, db, path, **options):
+    sync = IncrementalSync(db, "set-1", options.pop("delete_missing", False))
+    pipeline.ingest_file(db, "set-1", path, sync=sync, **options)
+    db.commit()
+    return sync.counts()
+
+
+def test_reupload_inserts_updates_and_skips(pipeline, db, tmp_path):
+    upload(pipeline, db, write_upload(tmp_path / "first", [item("p1"), item("p2")], "csv"))
+    counts = upload(pipeline, db, write_upload(
+        tmp_path / "second", [item("p1"), item("p2", text_content="edited"), item("p3")], "csv"
+    ))
+    assert counts == {"items_inserted": 1, "items_updated": 1, "items_unchanged": 1, "items_removed": 0}
+    assert stored(db) == [("p1", "text of p1"), ("p2", "edited"), ("p3", "text of p3")]
+
+
+def test_delete_missing_removes_items_absent_from_the_file(pipeline, db, tmp_path):
+    upload(pipeline, db, write_upload(tmp_path / "first", [item("p1"), item("p2")], "csv"))
+    counts = upload(pipeline, db, write_upload(tmp_path / "second", [item("p1")], "csv"), delete_missing=True)
+    assert counts["items_removed"] == 1
+    assert stored(db) == [("p1", "text of p1")]
+
+
+def test_delete_missing_keeps_items_whose_rows_were_rejected(pipeline, db, tmp_path):
+    upload(pipeline, db, write_upload(tmp_path / "first", [item("p1"), item("p2")], "csv"))
+    rows = [item("p1"), item("p2", post_date="not a date")]
+    counts = upload(pipeline, db, write_upload(tmp_path / "second", rows, "csv"), delete_missing=True, skip_invalid=True)
+    assert counts == {"items_inserted": 0, "items_updated": 0, "items_unchanged": 1, "items_removed": 0}
+    assert stored(db) == [("p1", "text of p1"), ("p2", "text of p2")]
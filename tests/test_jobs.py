@@ -0,0 +1,79 @@
+# tests/test_jobs.py
+import threading
+import pytest
+from fastapi import HTTPException
+import jobs
+from jobs import IngestJob, JobStore
+
+
+@pytest.fixture
+def store():
+    store = JobStore(max_workers=1)
+    yield store
+    store._executor.shutdown(wait=True)
+
+
+def run(store, fn, *args):
+    job = store.submit(IngestJob("set", "owner", "upload.csv"), fn, *args)
+    store._executor.shutdown(wait=True)
+    return job
+
+
+def test_completed_job_reports_counts_and_rates(store):
+    def ingest(job):
+        job.rows_parsed = 10
+        job.rows_inserted = 12
+        job.add_stage_time("embed", 0.25)
+        job.add_stage_time("embed", 0.5)
+
+    snapshot = run(store, ingest).snapshot()
+
+    assert snapshot["status"] == "completed"
+    assert snapshot["rows_inserted"] == 12
+    assert snapshot["stage_seconds"] == {"embed": 0.75}
+    assert snapshot["rows_per_second"] > 0
+    assert snapshot["finished_at"] >= snapshot["started_at"]
+
+
+@pytest.mark.parametrize("error, detail", [
+    (HTTPException(status_code=400, detail="Missing mandatory columns"), "Missing mandatory columns"),
+    (RuntimeError("database went away"), "database went away"),
+])
+def test_failed_job_keeps_the_error(store, error, detail):
+    def ingest(job):
+        raise error
+
+    snapshot = run(store, ingest).snapshot()
+
+    assert snapshot["status"] == "failed"
+    assert snapshot["errors"] == [detail]
+
+
+def test_jobs_queue_beyond_the_worker_limit(store):
+    release = threading.Event()
+    first = store.submit(IngestJob("set", "owner", "a.csv"), lambda job: release.wait(5))
+    second = store.submit(IngestJob("set", "owner", "b.csv"), lambda job: None)
+
+    assert store.get(second.id).status == "queued"
+    release.set()
+    store._executor.shutdown(wait=True)
+    assert first.status == second.status == "completed"
+
+
+def test_rejections_are_counted_but_reports_are_capped(monkeypatch):
+    monkeypatch.setattr(jobs, "MAX_REPORTED_REJECTIONS", 3)
+    job = IngestJob("set", "owner", "upload.csv")
+    job.add_rejections([{"row": n} for n in range(2)])
+    job.add_rejections([{"row": n} for n in range(2, 5)])
+
+    assert job.rejected_rows == 5
+    assert [rejection["row"] for rejection in job.rejections] == [0, 1, 2]
+
+
+def test_finished_jobs_expire_after_retention(store, monkeypatch):
+    job = run(store, lambda job: None)
+    assert store.get(job.id) is job
+
+    monkeypatch.setattr(jobs, "JOB_RETENTION_SECONDS", -1)
+    store._prune()
+    assert store.get(job.id) is None
@@ -0,0 +1,58 @@
+# tests/test_metrics.py
+import pytest
+from metrics import Counter, Histogram, render
+
+
+def samples_by_name(histogram):
+    return {(name, labels): value for name, labels, value in histogram.samples()}
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_histogram_seconds", "Test histogram", buckets=(1, 0.1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, stage="embed")
+
+    samples = samples_by_name(histogram)
+    labels = (("stage", "embed"),)
+    assert samples[("test_histogram_seconds_bucket", labels + (("le", "0.1"),))] == 2
+    assert samples[("test_histogram_seconds_bucket", labels + (("le", "1.0"),))] == 3
+    assert samples[("test_histogram_seconds_bucket", labels + (("le", "+Inf"),))] == 4
+    assert samples[("test_histogram_seconds_count", labels)] == 4
+    assert samples[("test_histogram_seconds_sum", labels)] == pytest.approx(3.65)
+
+
+def test_histogram_time_observes_once_per_block():
+    histogram = Histogram("test_timed_seconds", "Test timer")
+    with histogram.time(stage="parse"):
+        pass
+
+    assert samples_by_name(histogram)[("test_timed_seconds_count", (("stage", "parse"),))] == 1
+
+
+def test_render_exposition_format():
+    counter = Counter("test_render_total", "Test counter")
+    counter.inc(2, tier="memory")
+    histogram = Histogram("test_render_seconds", "Test render", buckets=(1,))
+    histogram.observe(0.5)
+
+    lines = render().splitlines()
+
+    assert "# TYPE test_render_total counter" in lines
+    assert 'test_render_total{tier="memory"} 2' in lines
+    assert "# TYPE test_render_seconds histogram" in lines
+    assert 'test_render_seconds_bucket{le="1.0"} 1' in lines
+    assert "test_render_seconds_count 1" in lines
+
+
+def test_ingestion_stages_are_timed(pipeline):
+    from jobs import IngestJob
+
+    job = IngestJob("set", "owner", "upload.csv")
+    with pipeline.stage("embed", job):
+        pass
+    with pipeline.stage("embed", job):
+        pass
+
+    assert set(job.stage_seconds) == {"embed"}
+    samples = samples_by_name(pipeline.stage_seconds)
+    assert samples[("ingest_stage_seconds_count", (("stage", "embed"),))] >= 2
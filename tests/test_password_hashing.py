@@ -0,0 +1,76 @@
+# tests/test_password_hashing.py
+import asyncio
+import threading
+import bcrypt
+import pytest
+from fastapi import HTTPException
+import password_hashing
+from password_hashing import PasswordHashPool
+
+
+@pytest.fixture(autouse=True)
+def cheap_hashes(monkeypatch):
+    monkeypatch.setattr(password_hashing, "BCRYPT_ROUNDS", 4)
+
+
+def test_verify_accepts_the_right_password():
+    hashed = asyncio.run(password_hashing.hash_password("secret"))
+    assert hashed.startswith("$2b$04$")
+    assert asyncio.run(password_hashing.verify_password("secret", hashed)) == (True, None)
+    assert asyncio.run(password_hashing.verify_password("wrong", hashed)) == (False, None)
+
+
+def test_hashes_with_another_cost_are_replaced_on_login():
+    old = bcrypt.hashpw(b"secret", bcrypt.gensalt(rounds=5)).decode()
+    valid, replacement = asyncio.run(password_hashing.verify_password("secret", old))
+    assert valid and replacement.startswith("$2b$04$")
+    assert bcrypt.checkpw(b"secret", replacement.encode())
+    # A wrong password never triggers a rehash
+    assert asyncio.run(password_hashing.verify_password("wrong", old)) == (False, None)
+
+
+def test_long_passwords_match_on_their_first_72_bytes():
+    password = "p" * 100
+    hashed = asyncio.run(password_hashing.hash_password(password))
+    assert asyncio.run(password_hashing.verify_password("p" * 72 + "q" * 10, hashed))[0]
+
+
+def test_malformed_stored_hashes_do_not_verify():
+    assert asyncio.run(password_hashing.verify_password("secret", "not-a-hash")) == (False, None)
+
+
+def test_pool_refuses_work_beyond_its_queue():
+    pool = PasswordHashPool(workers=1, queue_limit=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = [asyncio.ensure_future(pool.run("hash", release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as error:
+            await pool.run("hash", release.wait)
+        release.set()
+        await asyncio.gather(*running)
+        return error.value
+
+    error = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == str(password_hashing.PASSWORD_HASH_RETRY_AFTER)
+    assert pool.pending == 0
+
+
+def test_login_succeeds_when_the_rehash_is_refused(monkeypatch):
+    old = bcrypt.hashpw(b"secret", bcrypt.gensalt(rounds=5)).decode()
+    monkeypatch.setattr(password_hashing, "hash_pool", PasswordHashPool(workers=1, queue_limit=0))
+    calls = []
+    run = password_hashing.hash_pool.run
+
+    async def verify_then_refuse(operation, fn, *args):
+        calls.append(operation)
+        if operation == "hash":
+            password_hashing.hash_pool.pending = password_hashing.hash_pool.capacity
+        return await run(operation, fn, *args)
+
+    monkeypatch.setattr(password_hashing.hash_pool, "run", verify_then_refuse)
+
+    assert asyncio.run(password_hashing.verify_password("secret", old)) == (True, None)
+    assert calls == ["verify", "hash"]
@@ -0,0 +1,93 @@
+# tests/test_readers.py
+import pandas as pd
+import pytest
+from conftest import COLUMNS, item, write_upload
+from readers import iter_row_chunks
+
+FORMATS = ["csv", "xlsx", "parquet", "jsonl"]
+
+
+@pytest.mark.parametrize("file_format", FORMATS)
+def test_chunks_are_bounded_and_complete(tmp_path, file_format):
+    rows = [item(f"i{n}") for n in range(7)]
+    path = write_upload(tmp_path / "upload", rows, file_format)
+
+    chunks = list(iter_row_chunks(path, chunk_rows=3))
+
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert [value for chunk in chunks for value in chunk['external_item_id']] == [f"i{n}" for n in range(7)]
+    assert all(list(chunk.columns) == COLUMNS for chunk in chunks)
+
+
+@pytest.mark.parametrize("file_format", ["csv", "xlsx"])
+def test_header_only_upload_yields_one_empty_chunk(tmp_path, file_format):
+    path = write_upload(tmp_path / "upload", [], file_format)
+
+    chunks = list(iter_row_chunks(path, chunk_rows=3))
+
+    assert len(chunks) == 1
+    assert chunks[0].empty
+    assert list(chunks[0].columns) == COLUMNS
+
+
+def test_csv_ids_stay_text(tmp_path):
+    path = write_upload(tmp_path / "upload", [item("0012", creator_id="007")], "csv")
+
+    chunk = next(iter_row_chunks(path))
+
+    assert chunk['external_item_id'][0] == "0012"
+    assert chunk['creator_id'][0] == "007"
+
+
+def test_xlsx_trailing_blank_rows_are_skipped(tmp_path):
+    from openpyxl import load_workbook
+
+    path = write_upload(tmp_path / "upload", [item("i1"), item("i2")], "xlsx")
+    workbook = load_workbook(path)
+    # A formatted but empty cell makes read-only sheets report the rows above it
+    workbook.active.cell(row=6, column=1).number_format = "0.00"
+    workbook.save(path)
+
+    assert sum(len(chunk) for chunk in iter_row_chunks(path, chunk_rows=10)) == 2
+
+
+def test_jsonl_is_streamed_in_blocks(tmp_path, monkeypatch):
+    import readers
+    from pyarrow import json
+
+    monkeypatch.setattr(readers, "JSON_BLOCK_BYTES", 1024)
+    monkeypatch.setattr(json, "read_json", lambda *args, **kwargs: pytest.fail("read the whole file"))
+    # Early lines have no parent, so the first block sees that column as all null
+    rows = [item(f"i{n}") for n in range(40)] + [item(f"r{n}", parent="i0") for n in range(40)]
+    path = write_upload(tmp_path / "upload", rows, "jsonl")
+
+    chunks = list(iter_row_chunks(path, chunk_rows=25))
+
+    assert [len(chunk) for chunk in chunks] == [25, 25, 25, 5]
+    parents = [None if pd.isna(value) else value for chunk in chunks for value in chunk['parent_external_item_id']]
+    assert parents == [None] * 40 + ["i0"] * 40
+
+
+def test_jsonl_keys_missing_from_lines_are_null(tmp_path):
+    path = tmp_path / "upload.jsonl"
+    path.write_text(
+        '{"creator_id": 7, "text_content": "a", "post_date": "2024-01-01T00:00:00Z", "external_item_id": 1}\n'
+        '{"creator_id": 8, "text_content": "b", "post_date": "2024-01-01T00:00:00Z", "external_item_id": 2,'
+        ' "parent_external_item_id": "1"}\n'
+    )
+
+    chunk = next(iter_row_chunks(str(path)))
+
+    # Numeric ids keep their inferred type; validation.coerce_ids turns them into text
+    assert list(chunk['external_item_id']) == [1, 2]
+    assert list(chunk['parent_external_item_id'].isna()) == [True, False]
+    assert chunk['creator_name'].isna().all()
+
+
+def test_empty_jsonl_yields_one_empty_chunk(tmp_path):
+    path = tmp_path / "upload.jsonl"
+    path.write_text("")
+
+    chunks = list(iter_row_chunks(str(path)))
+
+    assert len(chunks) == 1 and chunks[0].empty
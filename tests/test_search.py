@@ -0,0 +1,106 @@
+# tests/test_search.py
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pytest
+from search import SearchIndex, _as_datetime64
+
+
+def make_index(vectors, creators=None, start=datetime(2024, 1, 1)):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    n = len(vectors)
+    return SearchIndex(
+        np.array([f"item-{i}" for i in range(n)], dtype=object),
+        np.array(creators or ["c1"] * n, dtype=object),
+        np.array([np.datetime64(start + timedelta(days=i), "us") for i in range(n)], dtype="datetime64[us]"),
+        vectors
+    )
+
+
+@pytest.fixture
+def index():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((50, 8)).astype(np.float32)
+    return make_index(vectors / np.linalg.norm(vectors, axis=1, keepdims=True),
+                      creators=["c1" if i % 2 else "c2" for i in range(50)])
+
+
+def test_exact_search_ranks_by_cosine_similarity(index):
+    query = np.asarray(index.matrix[7]) * 3
+
+    hits = index.query(query, top_k=5)
+
+    assert hits[0][0] == 7
+    assert hits[0][1] == pytest.approx(1.0, abs=1e-5)
+    expected = np.argsort(-(np.asarray(index.matrix) @ index.matrix[7]))[:5]
+    assert [position for position, _ in hits] == list(expected)
+
+
+def test_top_k_larger_than_the_set(index):
+    assert len(index.query(index.matrix[0], top_k=500)) == 50
+
+
+def test_unnormalized_matrices_are_normalized():
+    index = make_index([[3.0, 4.0], [0.0, 2.0], [0.0, 0.0]])
+
+    np.testing.assert_allclose(np.linalg.norm(index.matrix[:2], axis=1), 1.0, rtol=1e-6)
+    assert index.query(np.array([0.0, 1.0]), top_k=1) == [(1, pytest.approx(1.0))]
+
+
+def test_filters_restrict_the_candidates(index):
+    mask = index.filter_mask(creator_id="c1", post_date_from=datetime(2024, 1, 11), post_date_to=datetime(2024, 1, 20))
+
+    hits = index.query(index.matrix[0], top_k=50, mask=mask)
+
+    assert sorted(position for position, _ in hits) == [11, 13, 15, 17, 19]
+
+
+def test_filter_that_matches_nothing(index):
+    mask = index.filter_mask(creator_id="nobody")
+    assert index.query(index.matrix[0], top_k=5, mask=mask) == []
+
+
+def test_no_filter_means_no_mask(index):
+    assert index.filter_mask() is None
+
+
+def test_aware_bounds_are_compared_in_utc():
+    bound = datetime(2024, 1, 1, 2, tzinfo=timezone(timedelta(hours=2)))
+    assert _as_datetime64(bound) == np.datetime64("2024-01-01T00:00:00", "us")
+
+
+class FakeMatrixCache:
+    def __init__(self):
+        self.generation = "g1"
+
+    def current_generation(self, text_set_id):
+        return self.generation
+
+
+def test_index_is_rebuilt_only_when_the_matrix_generation_changes(monkeypatch):
+    import search
+
+    matrices = FakeMatrixCache()
+    builds = []
+
+    def build_index(db, text_set_id):
+        builds.append(matrices.generation)
+        index = make_index([[1.0, 0.0]])
+        index.generation = matrices.generation
+        return index
+
+    monkeypatch.setattr(search, "matrix_cache", matrices)
+    monkeypatch.setattr(search, "build_index", build_index)
+    monkeypatch.setattr(search, "_indexes", {})
+
+    first = search.get_index(None, "set-1")
+    assert search.get_index(None, "set-1") is first
+
+    matrices.generation = "g2"
+    second = search.get_index(None, "set-1")
+    assert second is not first
+    assert search.get_index(None, "set-1") is second
+
+    # An invalidated matrix has no generation until the rebuild publishes one
+    matrices.generation = None
+    search.get_index(None, "set-1")
+    assert builds == ["g1", "g2", None]
@@ -0,0 +1,85 @@
+# tests/test_segmentation.py
+import pytest
+import uploadfile
+
+HANGUL = "안녕하세요 반갑습니다 오늘은 날씨가 좋네요 "
+TEXTS = [
+    "short ascii post",
+    "",
+    "   ",
+    "a longer ascii post that needs several windows " * 3,
+    HANGUL,
+    HANGUL * 4,
+    "café résumé naïve " * 3,
+    "mixed: hello 안녕 world 세계 " * 5,
+]
+
+
+@pytest.fixture(autouse=True)
+def test_tokenizer(monkeypatch, tokenizer):
+    monkeypatch.setattr(uploadfile, "get_tokenizer", lambda: tokenizer)
+
+
+# Characters covered by a run of tokens, ignoring WordPiece continuation markers
+def covered(tokens):
+    return "".join(token[2:] if token.startswith("##") else token for token in tokens)
+
+
+def baseline_windows(tokenizer, text, max_length, overlap):
+    tokens = tokenizer.tokenize(text)
+    return [tokens[i:i + max_length] for i in range(0, len(tokens), max_length - overlap)]
+
+
+@pytest.mark.parametrize("max_length, overlap", [(300, 50), (16, 4), (5, 1)])
+def test_segment_texts_matches_segment_text_windows(tokenizer, max_length, overlap):
+    segmented, counts = uploadfile.segment_texts(TEXTS, max_length, overlap, token_counts=True)
+    for text, segments, segment_counts in zip(TEXTS, segmented, counts):
+        windows = baseline_windows(tokenizer, text, max_length, overlap)
+        assert len(segments) == len(uploadfile.segment_text(text, max_length, overlap)) == len(windows), text
+        assert segment_counts == [len(window) for window in windows]
+        for segment, window in zip(segments, windows):
+            # A window may cut a Hangul syllable into jamo; the slice then holds the whole
+            # syllable, so it may reach past the window by less than one character per side
+            segment_covered, window_covered = covered(tokenizer.tokenize(segment)), covered(window)
+            assert window_covered in segment_covered
+            assert len(segment_covered) - len(window_covered) <= 4
+
+
+def test_short_hangul_post_is_split_when_it_exceeds_the_window(tokenizer):
+    text = (HANGUL * 10)[:247]
+    step = 300 - 50
+    assert len(text) <= step < len(tokenizer.tokenize(text))
+    segmented, counts = uploadfile.segment_texts([text], token_counts=True)
+    assert len(segmented[0]) == 2
+    assert all(count <= 300 for count in counts[0])
+
+
+def test_window_sizes():
+    assert uploadfile.window_sizes(0) == []
+    assert uploadfile.window_sizes(10) == [10]
+    assert uploadfile.window_sizes(301) == [300, 51]
+    assert uploadfile.window_sizes(600) == [300, 300, 100]
+
+
+def test_short_ascii_texts_skip_the_tokenizer_unless_counted(monkeypatch, tokenizer):
+    calls = []
+
+    class CountingTokenizer:
+        is_fast = True
+
+        def __call__(self, texts, **kwargs):
+            calls.append(list(texts))
+            return tokenizer(texts, **kwargs)
+
+    monkeypatch.setattr(uploadfile, "get_tokenizer", lambda: CountingTokenizer())
+    texts = ["short ascii post", "a longer ascii post that needs several windows " * 30]
+
+    segmented, counts = uploadfile.segment_texts(texts, token_counts=True, count_short=False)
+    assert calls == [[texts[1]]]
+    assert segmented[0] == [texts[0]] and counts[0] == [None]
+    assert None not in counts[1]
+
+    calls.clear()
+    _, counts = uploadfile.segment_texts(texts, token_counts=True)
+    assert calls == [[texts[1]], [texts[0]]]
+    assert counts[0] == [len(tokenizer.tokenize(texts[0]))]
@@ -0,0 +1,127 @@
+# tests/test_text_set_service.py
+import asyncio
+from datetime import datetime, timezone
+from uuid import uuid4
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+import service
+from schemas import CreateTextSet
+from service import TextSetService, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    created_at, text_set_id = datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc), uuid4()
+    assert decode_cursor(encode_cursor(created_at, text_set_id)) == (created_at, text_set_id)
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", "bm8tc2VwYXJhdG9y", encode_cursor(datetime(2024, 1, 1), uuid4())[:-8]])
+def test_invalid_cursors_are_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_unknown_projection_fields_are_rejected():
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(TextSetService(None).get_text_set(uuid4(), fields=["id", "owner_id"]))
+    assert error.value.status_code == 400
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    """Records statements and answers every execute with the given rows."""
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.statements = []
+        self.commits = 0
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return FakeResult(self.rows)
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        pass
+
+
+def compiled(statement):
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+class Row:
+    def __init__(self, n):
+        self.id = uuid4()
+        self.title = f"set {n}"
+        self.description = "d"
+        self.created_at = datetime(2024, 1, n + 1)
+
+
+def test_pages_end_with_a_cursor_of_their_last_row():
+    rows = [Row(n) for n in range(3)]
+    db = FakeSession(rows)
+    page, cursor = asyncio.run(TextSetService(db).get_text_set(uuid4(), limit=2, fields=["title"]))
+    assert page == [{"title": "set 0"}, {"title": "set 1"}]
+    assert decode_cursor(cursor) == (rows[1].created_at, rows[1].id)
+
+    asyncio.run(TextSetService(db).get_text_set(uuid4(), limit=2, after=cursor))
+    sql = compiled(db.statements[-1])
+    assert '("TextSet".created_at, "TextSet".id) > (' in sql
+    assert 'ORDER BY "TextSet".created_at, "TextSet".id' in sql
+
+
+def test_last_page_has_no_cursor():
+    page, cursor = asyncio.run(TextSetService(FakeSession([Row(0)])).get_text_set(uuid4(), limit=2))
+    assert len(page) == 1 and cursor is None
+
+
+def new_sets(*titles):
+    return [CreateTextSet(title=title, description="d") for title in titles]
+
+
+def test_insert_skips_taken_titles_in_one_statement():
+    inserted = uuid4()
+    db = FakeSession([(inserted, "fresh")])
+    created = asyncio.run(TextSetService(db).insert_text_sets(new_sets("fresh", "taken"), uuid4()))
+    assert created == {"fresh": inserted}
+    assert len(db.statements) == 1 and db.commits == 1
+    sql = compiled(db.statements[0])
+    assert "ON CONFLICT (title) DO NOTHING RETURNING" in sql
+
+
+def test_create_reports_a_taken_title():
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(TextSetService(FakeSession([])).create_text_set(new_sets("taken")[0], uuid4()))
+    assert error.value.status_code == 400
+
+
+def test_bulk_create_reports_each_item(monkeypatch):
+    ids = {"a": uuid4(), "c": uuid4()}
+
+    async def insert_text_sets(self, text_sets, user_id):
+        return {title: text_set_id for title, text_set_id in ids.items() if title in {s.title for s in text_sets}}
+
+    monkeypatch.setattr(TextSetService, "insert_text_sets", insert_text_sets)
+    result = asyncio.run(TextSetService(None).create_text_sets(new_sets("a", "b", "a", "c"), uuid4()))
+    assert (result.created, result.conflicts) == (2, 2)
+    # "b" was taken already; the second "a" repeats a title of the same request
+    assert [(r.title, r.status, r.id) for r in result.results] == [
+        ("a", "created", ids["a"]), ("b", "conflict", None), ("a", "conflict", None), ("c", "created", ids["c"]),
+    ]
+
+
+def test_bulk_create_is_capped(monkeypatch):
+    monkeypatch.setattr(service, "TEXT_SET_BULK_MAX", 2)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(TextSetService(FakeSession()).create_text_sets(new_sets("a", "b", "c"), uuid4()))
+    assert error.value.status_code == 400
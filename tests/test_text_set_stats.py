@@ -0,0 +1,121 @@
+# tests/test_text_set_stats.py
+from uuid import uuid4
+import pytest
+from incremental import IncrementalSync
+from models import Base, TextSetStats
+from text_set_stats import CreatorSketch, TextSetStatsTracker, rebuild_stats
+from conftest import item, write_upload
+
+FIELDS = ['item_count', 'segment_count', 'creator_count', 'total_tokens', 'first_post_date', 'last_post_date']
+
+
+@pytest.fixture
+def stats_db(db):
+    Base.metadata.create_all(bind=db.get_bind())
+    return db
+
+
+def snapshot(db, text_set_id):
+    db.expire_all()
+    stats = db.get(TextSetStats, text_set_id)
+    return {field: getattr(stats, field) for field in FIELDS}
+
+
+def upload(pipeline, db, text_set_id, path, incremental=False, delete_missing=False):
+    sync = IncrementalSync(db, text_set_id, delete_missing) if incremental else None
+    pipeline.ingest_file(db, str(text_set_id), path, sync=sync, stats=TextSetStatsTracker(db, text_set_id))
+    db.commit()
+
+
+def rebuilt(db, text_set_id):
+    rebuild_stats(db, text_set_id)
+    db.commit()
+    return snapshot(db, text_set_id)
+
+
+ROWS = [
+    item("p1", text_content="a long post that is split into several windows " * 30, creator_id="c1"),
+    item("p2", parent="p1", post_date="2024-03-01T12:00:00Z", creator_id="c2"),
+    # No external id, same creator and date: still two source rows
+    item(None, text_content="anonymous one", creator_id="c3"),
+    item(None, text_content="anonymous two", creator_id="c3"),
+    # A blank creator is not counted as a creator
+    item("p3", creator_id=None, post_date="2023-12-31T00:00:00Z"),
+]
+
+
+def test_upload_stats_match_a_rebuild(pipeline, stats_db, tmp_path):
+    text_set_id = uuid4()
+    upload(pipeline, stats_db, text_set_id, write_upload(tmp_path / "rows", ROWS, "xlsx"))
+    tracked = snapshot(stats_db, text_set_id)
+    assert tracked['item_count'] == 5
+    assert tracked['segment_count'] > 5
+    assert tracked['creator_count'] == 3
+    assert tracked['total_tokens'] > 0
+    assert tracked['first_post_date'].year == 2023 and tracked['last_post_date'].month == 3
+    assert rebuilt(stats_db, text_set_id) == tracked
+
+
+def test_incremental_changes_recompute_the_same_stats_as_a_rebuild(pipeline, stats_db, tmp_path):
+    text_set_id = uuid4()
+    upload(pipeline, stats_db, text_set_id, write_upload(tmp_path / "first", ROWS, "csv"))
+    changed = [item("p1", text_content="now short", creator_id="c1"), item("p4", creator_id="c4")]
+    upload(pipeline, stats_db, text_set_id, write_upload(tmp_path / "second", changed, "csv"),
+           incremental=True, delete_missing=True)
+    tracked = snapshot(stats_db, text_set_id)
+    # p2 and p3 are removed; the rows without an external id cannot be matched and stay
+    assert tracked['item_count'] == 4
+    assert rebuilt(stats_db, text_set_id) == tracked
+
+
+def test_appending_uploads_add_up(pipeline, stats_db, tmp_path):
+    text_set_id = uuid4()
+    upload(pipeline, stats_db, text_set_id, write_upload(tmp_path / "first", ROWS[:2], "csv"))
+    upload(pipeline, stats_db, text_set_id, write_upload(tmp_path / "second", ROWS[2:], "csv"))
+    tracked = snapshot(stats_db, text_set_id)
+    assert tracked['item_count'] == 5
+    assert rebuilt(stats_db, text_set_id) == tracked
+
+
+def test_creator_sketch_estimates_and_merges():
+    first, second = CreatorSketch(), CreatorSketch()
+    first.add_many(f"creator-{n}" for n in range(20000))
+    second.add_many(f"creator-{n}" for n in range(10000, 30000))
+    second.add_many([None, float("nan")])
+    assert abs(first.estimate() - 20000) < 20000 * 0.05
+    first.merge(second)
+    assert abs(first.estimate() - 30000) < 30000 * 0.05
+    assert CreatorSketch(first.to_bytes()).estimate() == first.estimate()
+    assert CreatorSketch().estimate() == 0
+
+
+def test_rebuild_locks_the_stats_row_before_aggregating(stats_db):
+    from sqlalchemy import event
+
+    statements = []
+    engine = stats_db.get_bind()
+    record = lambda conn, cursor, statement, *args: statements.append(" ".join(statement.split()))
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        rebuild_stats(stats_db, uuid4())
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    locked = next(i for i, statement in enumerate(statements) if statement.startswith("SELECT") and "TextSetStats" in statement)
+    counted = next(i for i, statement in enumerate(statements) if "FROM TextItem" in statement)
+    assert locked < counted
+
+
+@pytest.mark.parametrize("count_tokens", [False, True])
+def test_short_texts_are_only_counted_on_request(pipeline, stats_db, tmp_path, monkeypatch, count_tokens):
+    from sqlalchemy import text
+
+    monkeypatch.setattr(pipeline, "INGEST_COUNT_TOKENS", count_tokens)
+    text_set_id = uuid4()
+    upload(pipeline, stats_db, text_set_id, write_upload(tmp_path / "rows", ROWS, "csv"))
+
+    short_counts = stats_db.execute(
+        text("SELECT token_count FROM TextItem WHERE external_item_id = 'p2'")
+    ).scalars().all()
+    assert (short_counts[0] is not None) == count_tokens
+    assert rebuilt(stats_db, text_set_id) == snapshot(stats_db, text_set_id)
@@ -0,0 +1,97 @@
+# tests/test_threads.py
+import pytest
+from sqlalchemy import text
+from threads import ThreadRootResolver
+from conftest import item, write_upload
+
+FORMATS = ["csv", "xlsx", "parquet", "jsonl"]
+
+
+def roots(db):
+    return db.execute(text(
+        "SELECT external_item_id, parent_external_item_id, thread_root_id FROM TextItem ORDER BY external_item_id"
+    )).fetchall()
+
+
+@pytest.mark.parametrize("file_format", FORMATS)
+def test_blank_parent_cells_make_thread_roots(pipeline, db, tmp_path, file_format):
+    rows = [item("p1"), item("p2", parent="p1"), item("p3", parent="p2"), item("q1")]
+    pipeline.ingest_file(db, "set-1", write_upload(tmp_path / "upload", rows, file_format))
+    db.commit()
+    assert roots(db) == [("p1", None, "p1"), ("p2", "p1", "p1"), ("p3", "p2", "p1"), ("q1", None, "q1")]
+
+
+@pytest.mark.parametrize("file_format", FORMATS)
+def test_replies_uploaded_before_their_parent_are_rerooted(pipeline, db, tmp_path, file_format):
+    pipeline.ingest_file(db, "set-1", write_upload(tmp_path / "replies", [item("p3", parent="p2")], file_format))
+    pipeline.ingest_file(db, "set-1", write_upload(tmp_path / "parents", [item("p1"), item("p2", parent="p1")], file_format))
+    db.commit()
+    assert roots(db) == [("p1", None, "p1"), ("p2", "p1", "p1"), ("p3", "p2", "p1")]
+
+
+@pytest.mark.parametrize("file_format", FORMATS)
+def test_chains_spanning_chunks_newest_first_share_one_root(pipeline, db, tmp_path, monkeypatch, file_format):
+    import readers
+
+    # One row per chunk, as when a date-descending export splits a thread across chunks
+    monkeypatch.setattr(pipeline, "iter_row_chunks", lambda path, **options: readers.iter_row_chunks(path, 1, **options))
+    rows = [item("e", parent="d"), item("d", parent="c"), item("c", parent="b"), item("b", parent="a"), item("a")]
+    pipeline.ingest_file(db, "set-1", write_upload(tmp_path / "upload", rows, file_format))
+    db.commit()
+    assert [root for _, _, root in roots(db)] == ["a"] * 5
+
+
+def test_reroots_earlier_uploads_through_a_multi_level_chain(pipeline, db, tmp_path, monkeypatch):
+    import readers
+
+    monkeypatch.setattr(pipeline, "iter_row_chunks", lambda path, **options: readers.iter_row_chunks(path, 1, **options))
+    pipeline.ingest_file(db, "set-1", write_upload(tmp_path / "replies", [item("d", parent="c")], "csv"))
+    rows = [item("c", parent="b"), item("b", parent="a"), item("a")]
+    pipeline.ingest_file(db, "set-1", write_upload(tmp_path / "parents", rows, "csv"))
+    db.commit()
+    assert [root for _, _, root in roots(db)] == ["a"] * 4
+
+
+def test_resolver_treats_nan_parents_as_missing(db):
+    nan = float("nan")
+    rows = [({'external_item_id': "p1", 'parent_external_item_id': nan}, None),
+            ({'external_item_id': "p2", 'parent_external_item_id': "p1"}, None),
+            ({'external_item_id': nan, 'parent_external_item_id': nan}, None)]
+    resolver = ThreadRootResolver(db, "set-1")
+    assert resolver.resolve(rows) == ["p1", "p1", None]
+    assert resolver.replies == {"p2"}
+
+
+def insert_items(db, pairs, segments=1):
+    db.execute(
+        text("""
+            INSERT INTO TextItem (text_item_id, text_set_id, external_item_id, parent_external_item_id, text_content)
+            VALUES (:text_item_id, 'set-1', :key, :parent, 'text')
+        """),
+        [{"text_item_id": f"{key}-{n}", "key": key, "parent": parent} for key, parent in pairs for n in range(segments)]
+    )
+
+
+def thread_nodes(db, root_id, max_depth=100, node_limit=1000):
+    from threads import THREAD_QUERY
+
+    rows = db.execute(THREAD_QUERY, {
+        "text_set_id": "set-1", "root_id": root_id, "max_depth": max_depth, "node_limit": node_limit
+    }).fetchall()
+    return sorted({(row.depth, row.external_item_id) for row in rows})
+
+
+def test_thread_query_walks_the_whole_thread_once_per_node(db):
+    insert_items(db, [("r", None), ("a", "r"), ("b", "r"), ("a1", "a"), ("x", None)], segments=3)
+    assert thread_nodes(db, "r") == [(0, "r"), (1, "a"), (1, "b"), (2, "a1")]
+    assert thread_nodes(db, "r", max_depth=1) == [(0, "r"), (1, "a"), (1, "b")]
+
+
+def test_thread_query_stops_walking_at_the_node_limit(db):
+    # A wide level and a long chain below it: only the first levels are walked
+    insert_items(db, [("r", None)] + [(f"c{n}", "r") for n in range(50)]
+                 + [(f"d{n}", f"d{n - 1}" if n else "c0") for n in range(200)], segments=2)
+    nodes = thread_nodes(db, "r", node_limit=11)
+    assert len(nodes) == 11
+    assert nodes[0] == (0, "r")
+    assert all(depth == 1 for depth, _ in nodes[1:])
@@ -0,0 +1,106 @@
+# tests/test_token_store.py
+import time
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import controller
+from auth import create_access_token
+from token_store import RevocationStore, VerifiedTokenCache, token_hash
+
+
+def test_verified_token_cache_expires_and_evicts():
+    cache = VerifiedTokenCache(max_entries=2)
+    cache.put(b"a", "user-a", time.time() + 60)
+    cache.put(b"b", "user-b", time.time() - 1)
+    assert cache.get(b"a") == "user-a"
+    assert cache.get(b"b") is None  # past its exp
+    cache.put(b"c", "user-c", time.time() + 60)
+    cache.put(b"d", "user-d", time.time() + 60)
+    assert cache.get(b"a") is None and len(cache) == 2
+
+
+def wait_until(condition, seconds=5):
+    deadline = time.monotonic() + seconds
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+
+def test_revocations_reach_other_workers(tmp_path):
+    path = str(tmp_path / "revoked.sqlite")
+    worker_a, worker_b = RevocationStore(path, sync_seconds=0), RevocationStore(path, sync_seconds=0)
+    assert not worker_b.is_revoked(b"token")
+    worker_a.revoke(b"token", time.time() + 60)
+    worker_b.sync()
+    assert worker_b.is_revoked(b"token")
+
+
+def test_lookups_sync_in_the_background(tmp_path):
+    path = str(tmp_path / "revoked.sqlite")
+    worker_a, worker_b = RevocationStore(path, sync_seconds=0), RevocationStore(path, sync_seconds=0)
+    worker_a.revoke(b"token", time.time() + 60)
+    wait_until(lambda: worker_b.is_revoked(b"token"))
+
+
+def test_new_workers_start_with_existing_revocations(tmp_path):
+    path = str(tmp_path / "revoked.sqlite")
+    RevocationStore(path).revoke(b"token", time.time() + 60)
+    assert RevocationStore(path, sync_seconds=3600).is_revoked(b"token")
+
+
+def test_revocations_after_pruning_are_still_seen(tmp_path):
+    path = str(tmp_path / "revoked.sqlite")
+    worker_a, worker_b = RevocationStore(path, sync_seconds=0), RevocationStore(path, sync_seconds=0)
+    worker_a.revoke(b"old", time.time() - 1)
+    worker_b.sync()  # sees the expired row and prunes it
+    assert worker_b._db.execute("SELECT COUNT(*) FROM revoked_tokens").fetchone()[0] == 0
+    worker_a.revoke(b"new", time.time() + 60)
+    worker_b.sync()
+    assert worker_b.is_revoked(b"new")
+    assert not worker_b.is_revoked(b"old")
+
+
+def test_syncs_without_expired_rows_do_not_write(tmp_path):
+    path = str(tmp_path / "revoked.sqlite")
+    worker_a = RevocationStore(path, sync_seconds=0)
+    worker_b = RevocationStore(path, sync_seconds=0, prune_seconds=3600)
+    worker_a.revoke(b"token", time.time() + 60)
+    statements = []
+    worker_b._db.set_trace_callback(statements.append)
+    worker_b.sync()
+    worker_a.revoke(b"old", time.time() - 1)
+    worker_b.sync()  # prunes once
+    worker_a.revoke(b"older", time.time() - 1)
+    worker_b.sync()  # within prune_seconds: read only
+    assert sum(statement.startswith("DELETE") for statement in statements) == 1
+
+
+def test_stale_copies_wait_for_the_sync_interval(tmp_path):
+    path = str(tmp_path / "revoked.sqlite")
+    worker_a, worker_b = RevocationStore(path, sync_seconds=0), RevocationStore(path, sync_seconds=3600)
+    worker_b.is_revoked(b"token")
+    worker_a.revoke(b"token", time.time() + 60)
+    assert not worker_b.is_revoked(b"token")
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(controller, "revocations", RevocationStore(str(tmp_path / "revoked.sqlite"), sync_seconds=0))
+    monkeypatch.setattr(controller, "verified_tokens", VerifiedTokenCache())
+    app = FastAPI()
+    app.include_router(controller.router)
+    return TestClient(app)
+
+
+def test_logout_revokes_a_cached_token(client):
+    token = create_access_token({"sub": "user-1"})
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.post("/logout", headers=headers).status_code == 204
+    assert controller.verified_tokens.get(token_hash(token)) is None
+    response = client.post("/logout", headers=headers)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token has been logged out"
+
+
+def test_invalid_tokens_are_rejected(client):
+    assert client.post("/logout", headers={"Authorization": "Bearer not-a-jwt"}).status_code == 401
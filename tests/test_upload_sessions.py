@@ -0,0 +1,243 @@
+# tests/test_upload_sessions.py
+import hashlib
+import threading
+import time
+import uuid
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+import upload_sessions
+import uploadfile
+from controller import authenticate_user
+from conftest import item, write_upload
+
+OWNER = "user-1"
+TEXT_SET = "set-1"
+
+
+@pytest.fixture(autouse=True)
+def session_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(upload_sessions, "UPLOAD_SESSION_DIR", str(tmp_path / "sessions"))
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(uploadfile.route)
+    app.dependency_overrides[authenticate_user] = lambda: OWNER
+    return TestClient(app)
+
+
+def sha(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def new_session(data, chunk_size, filename="rows.xlsx"):
+    return upload_sessions.create_session(TEXT_SET, OWNER, filename, len(data), chunk_size)
+
+
+def test_chunks_in_any_order_assemble_the_file(tmp_path):
+    data = bytes(range(256)) * 10
+    session = new_session(data, 1000)
+    for index in (2, 0, 1, 0):  # out of order, with a retry
+        chunk = data[index * 1000:(index + 1) * 1000]
+        upload_sessions.write_chunk(session, index, chunk, sha(chunk))
+    status = upload_sessions.status(session)
+    assert status["received_chunks"] == [0, 1, 2] and status["missing_chunks"] == []
+
+    path = upload_sessions.finalize_session(session, str(tmp_path))
+    with open(path, "rb") as assembled:
+        assert assembled.read() == data
+    with pytest.raises(HTTPException) as error:
+        upload_sessions.get_session(session["upload_id"], TEXT_SET, OWNER)
+    assert error.value.status_code == 404
+
+
+def test_finalize_reports_missing_chunks():
+    data = b"x" * 2500
+    session = new_session(data, 1000)
+    upload_sessions.write_chunk(session, 1, data[1000:2000], sha(data[1000:2000]))
+    with pytest.raises(HTTPException) as error:
+        upload_sessions.finalize_session(session)
+    assert error.value.status_code == 409
+    assert "[0, 2]" in error.value.detail
+
+
+@pytest.mark.parametrize("index, chunk, digest", [
+    (0, b"x" * 999, None),       # wrong length
+    (0, b"x" * 1000, "0" * 64),  # wrong checksum
+    (5, b"x" * 1000, None),      # index out of range
+])
+def test_bad_chunks_are_rejected(index, chunk, digest):
+    session = new_session(b"x" * 2000, 1000)
+    with pytest.raises(HTTPException) as error:
+        upload_sessions.write_chunk(session, index, chunk, digest or sha(chunk))
+    assert error.value.status_code == 400
+    assert upload_sessions.received_chunks(session) == []
+
+
+def test_sessions_are_scoped_to_owner_and_text_set():
+    session = new_session(b"x" * 10, 10)
+    for text_set_id, owner_id in ((TEXT_SET, "someone-else"), ("other-set", OWNER)):
+        with pytest.raises(HTTPException):
+            upload_sessions.get_session(session["upload_id"], text_set_id, owner_id)
+    with pytest.raises(HTTPException):
+        upload_sessions.get_session("../" + session["upload_id"], TEXT_SET, OWNER)
+
+
+def chunk_url(session, index=0):
+    return f"/TextSet/{TEXT_SET}/uploads/{session['upload_id']}/chunks/{index}"
+
+
+def test_put_chunk_stores_it(client):
+    session = new_session(b"abc", 10)
+    response = client.put(chunk_url(session), content=b"abc", headers={"X-Chunk-SHA256": sha(b"abc")})
+    assert response.status_code == 204
+    assert upload_sessions.received_chunks(session) == [0]
+
+
+def test_put_chunk_rejects_a_malformed_content_length(client):
+    session = new_session(b"abc", 10)
+    response = client.put(chunk_url(session), content=b"abc",
+                          headers={"X-Chunk-SHA256": sha(b"abc"), "Content-Length": "three"})
+    assert response.status_code == 400
+
+
+def test_put_chunk_stops_reading_a_chunked_body_past_the_limit(client):
+    session = new_session(b"x" * 10, 10)
+    parts = iter([b"x" * 6, b"x" * 6, b"x" * 6])
+    response = client.put(chunk_url(session), content=parts, headers={"X-Chunk-SHA256": sha(b"x" * 10)})
+    assert response.status_code == 413
+    assert upload_sessions.received_chunks(session) == []
+
+
+def put_chunks(session, data, indexes):
+    size = session["chunk_size"]
+    for index in indexes:
+        chunk = data[index * size:(index + 1) * size]
+        upload_sessions.write_chunk(session, index, chunk, sha(chunk))
+
+
+def wait_until(condition, seconds=10):
+    deadline = time.monotonic() + seconds
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(upload_sessions, "UPLOAD_STREAM_POLL_SECONDS", 0.01)
+
+
+def test_stream_serves_the_contiguous_prefix_until_finalize(fast_polling):
+    data = bytes(range(250)) * 4
+    session = new_session(data, 300, "rows.csv")
+    put_chunks(session, data, [0, 2])
+    stream = upload_sessions.open_stream(session)
+    received = []
+    reader = threading.Thread(target=lambda: received.append(stream.read()))
+    reader.start()
+
+    time.sleep(0.1)
+    assert reader.is_alive()  # chunk 1 is missing
+    put_chunks(session, data, [1, 3])
+    time.sleep(0.1)
+    assert reader.is_alive()  # every chunk is in, but the session is not finalized
+    upload_sessions.finish_stream(session)
+    reader.join(5)
+
+    assert received == [data]
+    stream.close()
+
+
+def test_stream_fails_once_the_session_is_gone(fast_polling):
+    session = new_session(b"x" * 600, 300, "rows.csv")
+    put_chunks(session, b"x" * 600, [0])
+    stream = upload_sessions.open_stream(session)
+    assert stream.read(300) == b"x" * 300
+    upload_sessions.remove_session(session)
+    with pytest.raises(HTTPException) as error:
+        stream.read(1)
+    assert error.value.status_code == 410
+
+
+@pytest.mark.parametrize("filename, streamed", [("rows.csv", True), ("rows.jsonl", True), ("rows.xlsx", False)])
+def test_only_streamable_sessions_are_claimed_once_chunk_0_is_in(filename, streamed):
+    session = new_session(b"x" * 600, 300, filename)
+    assert not upload_sessions.start_stream(session, "job-0")
+    put_chunks(session, b"x" * 600, [0])
+    assert upload_sessions.start_stream(session, "job-1") == streamed
+    assert not upload_sessions.start_stream(session, "job-2")
+    assert upload_sessions.stream_job_id(session) == ("job-1" if streamed else None)
+
+
+@pytest.fixture
+def ingest_client(client, pipeline, db, monkeypatch, tmp_path, fast_polling):
+    import readers
+    from sqlalchemy.orm import sessionmaker
+    from embedding_matrix import EmbeddingMatrixCache
+    from jobs import JobStore
+    from models import Base
+
+    Base.metadata.create_all(bind=db.get_bind())
+    store = JobStore(max_workers=1)
+    monkeypatch.setattr(pipeline, "job_store", store)
+    monkeypatch.setattr(pipeline, "SessionLocal", sessionmaker(bind=db.get_bind()))
+    monkeypatch.setattr(pipeline, "matrix_cache", EmbeddingMatrixCache(root=str(tmp_path / "matrices")))
+    # Small blocks and row chunks, so rows are parsed from the first chunks already
+    monkeypatch.setattr(readers, "CSV_BLOCK_BYTES", 256)
+    monkeypatch.setattr(pipeline, "iter_row_chunks", lambda path, **options: readers.iter_row_chunks(path, 5, **options))
+    yield client, store
+    # A job still waiting for chunks gives up once its session is gone
+    for directory in (tmp_path / "sessions").iterdir():
+        upload_sessions.remove_session({"upload_id": directory.name})
+    store._executor.shutdown(wait=True)
+
+
+def test_csv_sessions_are_parsed_while_they_upload(ingest_client, db, tmp_path):
+    from sqlalchemy import text
+
+    client, store = ingest_client
+    text_set_id = str(uuid.uuid4())
+    with open(write_upload(tmp_path / "rows", [item(f"p{n}") for n in range(60)], "csv"), "rb") as upload:
+        data = upload.read()
+    session = upload_sessions.create_session(text_set_id, OWNER, "rows.csv", len(data), 512)
+    base = f"/TextSet/{text_set_id}/uploads/{session['upload_id']}"
+
+    for index in range(session["chunk_count"] - 1):
+        chunk = data[index * 512:(index + 1) * 512]
+        assert client.put(f"{base}/chunks/{index}", content=chunk, headers={"X-Chunk-SHA256": sha(chunk)}).status_code == 204
+    job_id = client.get(base).json()["job_id"]
+    job = store.get(job_id)
+    wait_until(lambda: job.rows_parsed > 0)
+    assert job.status == "running"
+
+    last = session["chunk_count"] - 1
+    chunk = data[last * 512:]
+    client.put(f"{base}/chunks/{last}", content=chunk, headers={"X-Chunk-SHA256": sha(chunk)})
+    response = client.post(f"{base}/finalize")
+    assert response.status_code == 202 and response.json()["job_id"] == job_id
+    wait_until(lambda: job.finished_at is not None)
+
+    assert job.status == "completed", job.errors
+    assert job.rows_parsed == 60
+    assert db.execute(text("SELECT COUNT(DISTINCT external_item_id) FROM TextItem")).scalar() == 60
+    with pytest.raises(HTTPException):
+        upload_sessions.get_session(session["upload_id"], text_set_id, OWNER)
+
+
+def test_a_failed_streaming_job_is_reported_at_finalize(ingest_client, tmp_path):
+    client, store = ingest_client
+    text_set_id = str(uuid.uuid4())
+    data = b"creator_id,text_content\n1,no date or ids\n"
+    session = upload_sessions.create_session(text_set_id, OWNER, "rows.csv", len(data), 512)
+    base = f"/TextSet/{text_set_id}/uploads/{session['upload_id']}"
+
+    client.put(f"{base}/chunks/0", content=data, headers={"X-Chunk-SHA256": sha(data)})
+    job = store.get(client.get(base).json()["job_id"])
+    response = client.post(f"{base}/finalize")
+    wait_until(lambda: job.finished_at is not None)
+
+    assert response.status_code == 202
+    assert job.status == "failed" and "Missing mandatory columns" in job.errors[0]
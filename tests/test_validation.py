@@ -0,0 +1,54 @@
+# tests/test_validation.py
+import math
+import pandas as pd
+from validation import coerce_ids, validate_chunk
+
+
+def test_coerce_ids_turns_blanks_into_none():
+    result = coerce_ids(pd.Series([12.0, None, float("nan"), 3.0]))
+    assert result.tolist() == ["12", None, None, "3"]
+    assert result[1] is None and result[2] is None
+
+
+def test_coerce_ids_strips_text_and_blank_strings():
+    result = coerce_ids(pd.Series([" a ", "", "   ", None, "b"]))
+    assert result.tolist() == ["a", None, None, None, "b"]
+
+
+def test_validate_chunk_rows_hold_none_for_missing_ids():
+    df = pd.DataFrame({
+        "creator_id": [7.0, float("nan")],
+        "creator_name": ["A", "B"],
+        "text_content": ["first", "second"],
+        "post_date": ["2024-01-01T00:00:00Z", "2024-01-02"],
+        "external_item_id": ["p1", "p2"],
+        "parent_external_item_id": [float("nan"), "p1"],
+    })
+    rows, rejections = validate_chunk(df)
+    assert rejections == []
+    (first, first_date), (second, _) = rows
+    assert first["creator_id"] == "7"
+    assert first["parent_external_item_id"] is None
+    assert second["creator_id"] is None
+    assert second["parent_external_item_id"] == "p1"
+    assert first_date.tzinfo is not None
+
+
+def test_validate_chunk_reports_rejected_rows_with_file_row_numbers():
+    df = pd.DataFrame({
+        "creator_id": ["c1", "c2", "c3", "c4"],
+        "creator_name": ["A", "B", "C", "D"],
+        "text_content": ["ok", "  ", "bad date", "ok too"],
+        "post_date": ["2024-01-01", "2024-01-01", "yesterday", "2024-01-03"],
+        "external_item_id": ["p1", "p2", "p3", "p4"],
+        "parent_external_item_id": [None, None, None, None],
+    })
+    rows, rejections = validate_chunk(df, first_row=100)
+    assert [row["external_item_id"] for row, _ in rows] == ["p1", "p4"]
+    # The header is row 1, so the chunk's first data row is first_row + 2
+    assert [(r["row"], r["column"], r["reason"]) for r in rejections] == [
+        (103, "text_content", "missing"),
+        (104, "post_date", "invalid date"),
+    ]
+    assert rejections[1]["value"] == "yesterday"
+    assert not any(isinstance(value, float) and math.isnan(value) for row, _ in rows for value in row.values())
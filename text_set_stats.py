@@ -0,0 +1,228 @@
+# text_set_stats.py
+#
+# Per-TextSet statistics kept in one TextSetStats row. Each upload adds the counts,
+# post_date range, creators and tokens of its own rows to that row inside the
+# upload's transaction, so GET /TextSet/{id}/stats is a primary-key read however
+# large the set grows. Uploads that delete or replace rows cannot subtract from a
+# range or a sketch, so they recompute the row from TextItem instead; so does
+# rebuild_stats.py. Both paths count an item as one stored source row, marked by its
+# segment_index 0, and ignore rows without a creator id.
+import hashlib
+import logging
+import math
+from datetime import datetime, timezone
+from uuid import UUID
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Path
+from sqlalchemy import text, select, DateTime
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from controller import authenticate_user
+from database import get_async_db
+from migrations import has_column
+from models import TextSet, TextSetStats
+from schemas import TextSetStatsResponse
+
+logger = logging.getLogger(__name__)
+
+route = APIRouter()
+
+# 2**12 one-byte registers: a 4 KiB sketch with about 1.6% standard error
+SKETCH_PRECISION = 12
+_REGISTERS = 1 << SKETCH_PRECISION
+_REST_BITS = 64 - SKETCH_PRECISION
+
+# Distinct creator ids fetched per round trip when a sketch is rebuilt
+CREATOR_FETCH_SIZE = 10000
+
+
+class CreatorSketch:
+    """HyperLogLog sketch of distinct creator ids. Sketches merge by taking the register-wise maximum."""
+
+    def __init__(self, registers: bytes = None):
+        if registers is None:
+            self.registers = np.zeros(_REGISTERS, dtype=np.uint8)
+        else:
+            self.registers = np.frombuffer(registers, dtype=np.uint8).copy()
+
+    def add_many(self, values):
+        registers = self.registers
+        for value in values:
+            # Blank cells may arrive as NaN; they are not a creator
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                continue
+            hashed = int.from_bytes(hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest(), "big")
+            index = hashed >> _REST_BITS
+            rank = _REST_BITS - (hashed & ((1 << _REST_BITS) - 1)).bit_length() + 1
+            if rank > registers[index]:
+                registers[index] = rank
+
+    def merge(self, other: "CreatorSketch"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / _REGISTERS)
+        raw = alpha * _REGISTERS * _REGISTERS / float(np.sum(np.exp2(-self.registers.astype(np.float64))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        # Linear counting is more accurate while many registers are still empty
+        if raw <= 2.5 * _REGISTERS and zeros:
+            return round(_REGISTERS * math.log(_REGISTERS / zeros))
+        return round(raw)
+
+    def to_bytes(self) -> bytes:
+        return self.registers.tobytes()
+
+
+# TextItem stores post_date without a zone; ingestion writes UTC
+def _utc(value):
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+# Insert the set's row if it is missing, then lock it until the caller commits
+def _locked_row(db: Session, text_set_id: UUID) -> TextSetStats:
+    insert = sqlite_insert if db.get_bind().dialect.name == "sqlite" else pg_insert
+    db.execute(insert(TextSetStats).values(text_set_id=text_set_id).on_conflict_do_nothing())
+    return db.execute(
+        select(TextSetStats).where(TextSetStats.text_set_id == text_set_id).with_for_update()
+    ).scalar_one()
+
+
+def rebuild_stats(db: Session, text_set_id, ingested_at: datetime = None) -> TextSetStats:
+    """Recompute a set's stats row from its TextItem rows. Does not commit.
+
+    An item is a stored source row, i.e. a segment with segment_index 0, exactly as
+    uploads count them. Rows stored before segment_index existed are grouped on the
+    external_item_id, creator_id and post_date their segments share. Segments without
+    a token_count, stored before the column existed or short texts uploaded without
+    INGEST_COUNT_TOKENS, add no tokens until rebuild_stats.py --count-tokens has filled
+    them in.
+    """
+    text_set_id = UUID(str(text_set_id))
+    # Lock the row before aggregating: an additive upload that commits in between would
+    # otherwise have its delta overwritten by totals that never included its rows.
+    # Under READ COMMITTED the aggregates below then see every upload committed so far.
+    stats = _locked_row(db, text_set_id)
+    bind = db.get_bind()
+    tokens = "SUM(token_count)" if has_column(bind, "TextItem", "token_count") else "0"
+    indexed = has_column(bind, "TextItem", "segment_index")
+    segments, items, total_tokens, first_post_date, last_post_date = db.execute(
+        text(f"""
+            SELECT COUNT(*), {"COUNT(CASE WHEN segment_index = 0 THEN 1 END)" if indexed else "0"},
+                   COALESCE({tokens}, 0), MIN(post_date) AS first_post_date, MAX(post_date) AS last_post_date
+            FROM TextItem WHERE text_set_id = :text_set_id
+        """).columns(first_post_date=DateTime(timezone=True), last_post_date=DateTime(timezone=True)),
+        {"text_set_id": str(text_set_id)}
+    ).one()
+    items += db.execute(
+        text(f"""
+            SELECT COUNT(*) FROM (
+                SELECT 1 FROM TextItem
+                WHERE text_set_id = :text_set_id {"AND segment_index IS NULL" if indexed else ""}
+                GROUP BY external_item_id, creator_id, post_date
+            ) AS legacy_items
+        """),
+        {"text_set_id": str(text_set_id)}
+    ).scalar()
+
+    sketch = CreatorSketch()
+    creators = db.execute(
+        text("SELECT DISTINCT creator_id FROM TextItem WHERE text_set_id = :text_set_id AND creator_id IS NOT NULL"),
+        {"text_set_id": str(text_set_id)},
+        execution_options={"yield_per": CREATOR_FETCH_SIZE}
+    )
+    for partition in creators.scalars().partitions():
+        sketch.add_many(partition)
+
+    stats.item_count = items
+    stats.segment_count = segments
+    stats.total_tokens = total_tokens
+    stats.first_post_date = _utc(first_post_date)
+    stats.last_post_date = _utc(last_post_date)
+    stats.creator_sketch = sketch.to_bytes()
+    stats.creator_count = sketch.estimate()
+    if ingested_at:
+        stats.last_ingest_at = ingested_at
+    db.flush()
+    return stats
+
+
+class TextSetStatsTracker:
+    """Collects the stats of the rows an upload writes and applies them to the set's row before it commits."""
+
+    def __init__(self, db: Session, text_set_id):
+        self.db = db
+        self.text_set_id = UUID(str(text_set_id))
+        self.items = 0
+        self.segments = 0
+        self.tokens = 0
+        self.first_post_date = None
+        self.last_post_date = None
+        self.creators = CreatorSketch()
+
+    # rows are the (row, post_date) pairs that were stored, with their segment and token totals
+    def add(self, rows, segments: int, tokens: int):
+        if not rows:
+            return
+        post_dates = [post_date for _, post_date in rows]
+        self.first_post_date = min(post_dates + ([self.first_post_date] if self.first_post_date else []))
+        self.last_post_date = max(post_dates + ([self.last_post_date] if self.last_post_date else []))
+        self.creators.add_many({row.get('creator_id') for row, _ in rows})
+        self.items += len(rows)
+        self.segments += segments
+        self.tokens += tokens
+
+    def finish(self, recompute: bool = False):
+        ingested_at = datetime.now(timezone.utc)
+        if recompute:
+            rebuild_stats(self.db, self.text_set_id, ingested_at)
+            return
+
+        stats = _locked_row(self.db, self.text_set_id)
+        stats.item_count += self.items
+        stats.segment_count += self.segments
+        stats.total_tokens += self.tokens
+        if self.first_post_date:
+            stored = _utc(stats.first_post_date)
+            stats.first_post_date = min(stored, self.first_post_date) if stored else self.first_post_date
+            stored = _utc(stats.last_post_date)
+            stats.last_post_date = max(stored, self.last_post_date) if stored else self.last_post_date
+        sketch = CreatorSketch(stats.creator_sketch) if stats.creator_sketch else CreatorSketch()
+        sketch.merge(self.creators)
+        stats.creator_sketch = sketch.to_bytes()
+        stats.creator_count = sketch.estimate()
+        stats.last_ingest_at = ingested_at
+        self.db.flush()
+
+
+@route.get("/TextSet/{text_set_id}/stats", response_model=TextSetStatsResponse)
+async def get_text_set_stats(
+    text_set_id: str = Path(..., description="UUID of the TextSet"),
+    user_id: str = Depends(authenticate_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    row = (await db.execute(
+        select(TextSet.id, TextSetStats)
+        .outerjoin(TextSetStats, TextSetStats.text_set_id == TextSet.id)
+        .filter(TextSet.id == text_set_id, TextSet.owner_id == user_id)
+    )).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="TextSet not found or not accessible")
+
+    owned_id, stats = row
+    # Sets that have not been uploaded to since stats were introduced have no row yet
+    if stats is None:
+        return TextSetStatsResponse(text_set_id=owned_id)
+    return TextSetStatsResponse(
+        text_set_id=owned_id,
+        item_count=stats.item_count,
+        segment_count=stats.segment_count,
+        creator_count=stats.creator_count,
+        total_tokens=stats.total_tokens,
+        first_post_date=stats.first_post_date,
+        last_post_date=stats.last_post_date,
+        last_ingest_at=stats.last_ingest_at,
+    )
@@ -0,0 +1,236 @@
+# threads.py
+#
+# Reply threads over external_item_id / parent_external_item_id. Ingestion stores
+# each item's thread root in thread_root_id, so the root of any item is a single
+# index lookup; the tree below it is fetched with one recursive query.
+import logging
+import math
+import os
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from sqlalchemy import text, bindparam, select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from controller import authenticate_user
+from database import get_async_db, engine
+from migrations import has_column
+from models import TextSet
+from schemas import ThreadNode, ThreadSegment, ThreadResponse
+
+logger = logging.getLogger(__name__)
+
+route = APIRouter()
+
+# Limits for GET .../threads/{external_item_id}; clients may ask for less
+THREAD_MAX_DEPTH = int(os.getenv("THREAD_MAX_DEPTH", "100"))
+THREAD_MAX_ITEMS = int(os.getenv("THREAD_MAX_ITEMS", "5000"))
+
+LOOKUP_BATCH = 1000
+
+
+# Blank cells may arrive as NaN instead of None; neither is an item id
+def _node_id(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return str(value)
+
+
+class ThreadRootResolver:
+    """Assigns thread_root_id to uploaded rows, chunk by chunk, inside the upload's transaction."""
+
+    def __init__(self, db: Session, text_set_id):
+        self.db = db
+        self.text_set_id = str(text_set_id)
+        self.roots = {}
+        self.replies = set()
+
+    # Returns the thread root for each (row, post_date) pair, in order
+    def resolve(self, rows) -> list:
+        ids = [(_node_id(row.get('external_item_id')), _node_id(row.get('parent_external_item_id'))) for row, _ in rows]
+        parents = {}
+        for key, parent in ids:
+            if key is not None:
+                parents[key] = parent
+        self.replies.update(key for key, parent in parents.items() if parent is not None)
+
+        wanted = {parent for _, parent in ids} - {None} - parents.keys() - self.roots.keys()
+        self.roots.update(self._stored_roots(list(wanted)))
+
+        roots = []
+        for key, parent in ids:
+            if key is not None:
+                roots.append(self._root_of(key, parents))
+            elif parent is not None:
+                roots.append(self._root_of(parent, parents))
+            else:
+                roots.append(None)
+        return roots
+
+    def _root_of(self, node, parents):
+        path = []
+        while node not in self.roots and node in parents and len(path) < THREAD_MAX_DEPTH:
+            path.append(node)
+            parent = parents[node]
+            if parent is None or parent == node:
+                root = node
+                break
+            node = parent
+        else:
+            # A known root, or a parent that is not (yet) in the set and stands in for the root
+            root = self.roots.get(node, node)
+        for visited in path:
+            self.roots[visited] = root
+        return root
+
+    def _stored_roots(self, keys) -> dict:
+        found = {}
+        query = text("""
+            SELECT DISTINCT external_item_id, thread_root_id FROM TextItem
+            WHERE text_set_id = :text_set_id AND external_item_id IN :keys AND thread_root_id IS NOT NULL
+        """).bindparams(bindparam("keys", expanding=True))
+        for start in range(0, len(keys), LOOKUP_BATCH):
+            rows = self.db.execute(query, {"text_set_id": self.text_set_id, "keys": keys[start:start + LOOKUP_BATCH]})
+            found.update((str(key), str(root)) for key, root in rows)
+        return found
+
+    # Follow stand-in roots until one is a real root or is not in the set
+    def _final_root(self, node):
+        seen = set()
+        while self.roots.get(node, node) != node and node not in seen and len(seen) < THREAD_MAX_DEPTH:
+            seen.add(node)
+            node = self.roots[node]
+        return node
+
+    # Replies that arrived before their parent were rooted at the parent's id; now that
+    # the parent is stored, move them to the final root of the parent's chain. Chains
+    # that span chunks may be several stand-ins deep, so the root is resolved here
+    # rather than by copying the parent's stored root one level at a time.
+    def finish(self):
+        moves = []
+        for reply in sorted(self.replies):
+            root = self._final_root(reply)
+            if root != reply:
+                moves.append({"text_set_id": self.text_set_id, "stand_in": reply, "root": root})
+        if not moves:
+            return
+        query = text("""
+            UPDATE TextItem SET thread_root_id = :root
+            WHERE text_set_id = :text_set_id AND thread_root_id = :stand_in
+        """)
+        for start in range(0, len(moves), LOOKUP_BATCH):
+            self.db.execute(query, moves[start:start + LOOKUP_BATCH])
+
+
+# Nodes are external ids; UNION (not UNION ALL) keeps one row per node and depth even
+# though each item may be stored as several segments. The recursion runs level by level
+# and is only evaluated as far as walk reads it, so LIMIT :node_limit there stops the
+# walk itself once enough nodes are found instead of trimming a fully expanded thread.
+THREAD_QUERY = text("""
+    WITH RECURSIVE thread (external_item_id, depth) AS (
+        SELECT CAST(:root_id AS TEXT), 0
+        UNION
+        SELECT item.external_item_id, thread.depth + 1
+        FROM TextItem AS item JOIN thread ON item.parent_external_item_id = thread.external_item_id
+        WHERE item.text_set_id = :text_set_id AND thread.depth < :max_depth
+    ),
+    walk AS (
+        SELECT external_item_id, depth FROM thread LIMIT :node_limit
+    ),
+    nodes AS (
+        SELECT external_item_id, MIN(depth) AS depth FROM walk GROUP BY external_item_id
+    )
+    SELECT nodes.depth, item.external_item_id, item.parent_external_item_id, item.creator_id,
+           item.creator_name, item.post_date, item.text_item_id, item.text_content
+    FROM nodes JOIN TextItem AS item
+      ON item.text_set_id = :text_set_id AND item.external_item_id = nodes.external_item_id
+    ORDER BY nodes.depth, item.post_date, item.external_item_id
+""")
+
+
+async def _find_root(db: AsyncSession, text_set_id, external_item_id):
+    if has_column(engine, "TextItem", "thread_root_id"):
+        row = (await db.execute(
+            text("""
+                SELECT thread_root_id FROM TextItem
+                WHERE text_set_id = :text_set_id AND external_item_id = :key
+                LIMIT 1
+            """),
+            {"text_set_id": text_set_id, "key": external_item_id}
+        )).first()
+        if row is None:
+            return None
+        if row[0] is not None:
+            return str(row[0])
+
+    # Rows stored before thread roots existed: walk up the parent chain instead
+    row = (await db.execute(
+        text("""
+            WITH RECURSIVE ancestors (external_item_id, parent_external_item_id, depth) AS (
+                SELECT external_item_id, parent_external_item_id, 0 FROM TextItem
+                WHERE text_set_id = :text_set_id AND external_item_id = :key
+                UNION
+                SELECT item.external_item_id, item.parent_external_item_id, ancestors.depth + 1
+                FROM TextItem AS item JOIN ancestors ON item.external_item_id = ancestors.parent_external_item_id
+                WHERE item.text_set_id = :text_set_id AND ancestors.depth < :max_depth
+            )
+            SELECT external_item_id FROM ancestors ORDER BY depth DESC LIMIT 1
+        """),
+        {"text_set_id": text_set_id, "key": external_item_id, "max_depth": THREAD_MAX_DEPTH}
+    )).first()
+    return None if row is None else str(row[0])
+
+
+# Whole reply thread containing an item, as a tree from its root
+@route.get("/TextSet/{text_set_id}/threads/{external_item_id}", response_model=ThreadResponse)
+async def get_thread(
+    text_set_id: str = Path(..., description="UUID of the TextSet"),
+    external_item_id: str = Path(..., description="Any item of the thread"),
+    max_depth: int = Query(THREAD_MAX_DEPTH, ge=0, le=THREAD_MAX_DEPTH),
+    max_items: int = Query(THREAD_MAX_ITEMS, ge=1, le=THREAD_MAX_ITEMS),
+    user_id: str = Depends(authenticate_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    owned = await db.scalar(select(TextSet.id).filter_by(id=text_set_id, owner_id=user_id))
+    if not owned:
+        raise HTTPException(status_code=404, detail="TextSet not found or not accessible")
+
+    root_id = await _find_root(db, text_set_id, external_item_id)
+    if root_id is None:
+        raise HTTPException(status_code=404, detail="Item not found in this TextSet")
+
+    rows = (await db.execute(
+        THREAD_QUERY,
+        {"text_set_id": text_set_id, "root_id": root_id, "max_depth": max_depth, "node_limit": max_items + 1}
+    )).mappings().all()
+
+    nodes = {}
+    for row in rows:
+        key = str(row["external_item_id"])
+        node = nodes.get(key)
+        if node is None:
+            node = nodes[key] = ThreadNode(
+                external_item_id=key,
+                parent_external_item_id=None if row["parent_external_item_id"] is None else str(row["parent_external_item_id"]),
+                creator_id=None if row["creator_id"] is None else str(row["creator_id"]),
+                creator_name=row["creator_name"],
+                post_date=row["post_date"],
+                depth=row["depth"],
+            )
+        node.segments.append(ThreadSegment(text_item_id=str(row["text_item_id"]), text_content=row["text_content"]))
+
+    truncated = len(nodes) > max_items
+    kept = list(nodes.values())[:max_items]
+    kept_ids = {node.external_item_id for node in kept}
+    for node in kept:
+        parent = nodes.get(node.parent_external_item_id)
+        if node.depth > 0 and parent is not None and parent.external_item_id in kept_ids:
+            parent.children.append(node)
+
+    # The root may be a parent id that was never uploaded; its replies are then top-level
+    root = nodes.get(root_id)
+    return ThreadResponse(
+        root_external_item_id=root_id,
+        node_count=len(kept),
+        truncated=truncated,
+        root=root,
+        orphans=[] if root is not None else [node for node in kept if node.depth == 1],
+    )
@@ -0,0 +1,167 @@
+# token_store.py
+#
+# Keeps JWT verification off the request hot path. Verified tokens are cached by
+# hash until they expire, and revocations (logout) go to a SQLite table shared by
+# every worker on the host. Each worker mirrors that table in memory and re-syncs
+# it in a background thread at most every TOKEN_REVOCATION_SYNC_SECONDS, so a lookup
+# never touches the database and a logout reaches the other workers within about
+# that interval.
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of verified tokens kept per worker
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+# SQLite file holding revoked tokens, shared by all workers on a host
+TOKEN_REVOCATION_PATH = os.getenv("TOKEN_REVOCATION_PATH") or os.path.join(tempfile.gettempdir(), "textset-revoked-tokens.sqlite")
+
+# How stale a worker's copy of the revocation table may get
+TOKEN_REVOCATION_SYNC_SECONDS = float(os.getenv("TOKEN_REVOCATION_SYNC_SECONDS", "1"))
+
+# Minimum time between deletes of expired rows by one worker; a delete takes the write lock
+TOKEN_REVOCATION_PRUNE_SECONDS = float(os.getenv("TOKEN_REVOCATION_PRUNE_SECONDS", "300"))
+
+token_cache_hits = Counter("auth_token_cache_hits_total", "Requests authenticated from the verified-token cache")
+token_cache_misses = Counter("auth_token_cache_misses_total", "Requests whose token had to be decoded and verified")
+
+
+def token_hash(token: str) -> bytes:
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of token hash -> user id, each entry dropped at the token's exp."""
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: bytes):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user_id, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user_id
+
+    def put(self, key: bytes, user_id: str, expires_at: float):
+        with self._lock:
+            self._entries[key] = (user_id, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: bytes):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class RevocationStore:
+    """Revoked token hashes in a shared SQLite table, mirrored in memory per worker."""
+
+    def __init__(self, path: str = TOKEN_REVOCATION_PATH, sync_seconds: float = TOKEN_REVOCATION_SYNC_SECONDS,
+                 prune_seconds: float = TOKEN_REVOCATION_PRUNE_SECONDS):
+        self.sync_seconds = sync_seconds
+        self.prune_seconds = prune_seconds
+        self._revoked = {}
+        self._lock = threading.Lock()
+        self._syncing = False
+        self._synced_at = 0.0
+        self._pruned_at = None
+        self._last_id = 0
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # AUTOINCREMENT keeps ids increasing after pruning, so "id > last seen" never misses a row
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS revoked_tokens "
+            "(id INTEGER PRIMARY KEY AUTOINCREMENT, token_hash BLOB NOT NULL UNIQUE, expires_at REAL NOT NULL)"
+        )
+        self._db.commit()
+        # Start from the shared table, so a new worker knows every revocation before its first request
+        self.sync()
+
+    def __len__(self):
+        return len(self._revoked)
+
+    def revoke(self, key: bytes, expires_at: float):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO revoked_tokens (token_hash, expires_at) VALUES (?, ?)",
+                (key, expires_at)
+            )
+            self._db.commit()
+            self._revoked[key] = expires_at
+
+    # Answers from memory only; a stale copy is refreshed in the background
+    def is_revoked(self, key: bytes) -> bool:
+        if time.monotonic() - self._synced_at >= self.sync_seconds:
+            self._start_sync()
+        return key in self._revoked
+
+    def _start_sync(self):
+        with self._lock:
+            if self._syncing:
+                return
+            self._syncing = True
+        threading.Thread(target=self._background_sync, name="revocation-sync", daemon=True).start()
+
+    def _background_sync(self):
+        try:
+            self.sync()
+        finally:
+            self._syncing = False
+
+    # Pull revocations written by other workers since the last sync and drop expired ones.
+    # Expired rows are deleted from the shared table only when this worker has seen some,
+    # and at most every prune_seconds, so syncs are normally read-only.
+    def sync(self):
+        with self._lock:
+            now = time.time()
+            try:
+                rows = self._db.execute(
+                    "SELECT id, token_hash, expires_at FROM revoked_tokens WHERE id > ? ORDER BY id",
+                    (self._last_id,)
+                ).fetchall()
+            except sqlite3.Error as e:
+                # Keep serving from the in-memory copy; the next request retries
+                logger.error(f"Error syncing revoked tokens: {e}")
+                return
+            for row_id, key, expires_at in rows:
+                self._revoked[key] = expires_at
+                self._last_id = row_id
+            unexpired = {key: expires_at for key, expires_at in self._revoked.items() if expires_at > now}
+            expired = len(unexpired) < len(self._revoked)
+            self._revoked = unexpired
+            self._synced_at = time.monotonic()
+
+            if expired and (self._pruned_at is None or self._synced_at - self._pruned_at >= self.prune_seconds):
+                self._pruned_at = self._synced_at
+                try:
+                    self._db.execute("DELETE FROM revoked_tokens WHERE expires_at <= ?", (now,))
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    self._db.rollback()
+                    logger.error(f"Error pruning revoked tokens: {e}")
+
+verified_tokens = VerifiedTokenCache()
+revocations = RevocationStore()
+
+Gauge("auth_token_cache_entries", "Verified tokens held in the cache", lambda: len(verified_tokens))
+Gauge("auth_revoked_tokens", "Unexpired revoked tokens known to this worker", lambda: len(revocations))
@@ -0,0 +1,282 @@
+# upload_sessions.py
+#
+# Resumable uploads. A session is a directory holding the spool file, its metadata
+# and one marker per received chunk. Chunks are written at their own offset, so
+# they may arrive in any order and be retried; everything lives on disk, so any
+# worker on the host can serve any request of a session.
+#
+# CSV and JSONL sessions are parsed while they upload: once chunk 0 is in, an
+# ingestion job reads the file through a SessionStream, which serves the contiguous
+# leading chunks and waits for the next one, and ends only after finalize.
+#
+#   <UPLOAD_SESSION_DIR>/<upload_id>/meta.json
+#   <UPLOAD_SESSION_DIR>/<upload_id>/data
+#   <UPLOAD_SESSION_DIR>/<upload_id>/chunks/<index>   (sha256 of the chunk)
+#   <UPLOAD_SESSION_DIR>/<upload_id>/stream           (id of the job parsing it early)
+#   <UPLOAD_SESSION_DIR>/<upload_id>/finalized
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from uuid import uuid4
+from fastapi import HTTPException
+from readers import STREAMABLE_FORMATS
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_SESSION_DIR = os.getenv("UPLOAD_SESSION_DIR") or os.path.join(tempfile.gettempdir(), "textset-uploads")
+
+# Chunk size offered to clients, and the largest one accepted
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+UPLOAD_MAX_CHUNK_SIZE = int(os.getenv("UPLOAD_MAX_CHUNK_SIZE", str(64 * 1024 * 1024)))
+
+# Largest file a session may declare
+UPLOAD_MAX_SIZE = int(os.getenv("UPLOAD_MAX_SIZE", str(4 * 1024 ** 3)))
+
+# Sessions idle for longer than this are removed
+UPLOAD_SESSION_TTL_SECONDS = int(os.getenv("UPLOAD_SESSION_TTL_SECONDS", "86400"))
+
+# How often a job parsing a session early checks for the next chunk
+UPLOAD_STREAM_POLL_SECONDS = float(os.getenv("UPLOAD_STREAM_POLL_SECONDS", "0.5"))
+
+STREAM_READ_BYTES = 1024 * 1024
+
+
+def _session_dir(upload_id: str) -> str:
+    # upload ids are generated here; reject anything that could escape the directory
+    if not upload_id or os.path.basename(upload_id) != upload_id or upload_id in (".", ".."):
+        raise HTTPException(status_code=404, detail="Upload session not found or not accessible")
+    return os.path.join(UPLOAD_SESSION_DIR, upload_id)
+
+
+def create_session(text_set_id: str, owner_id: str, filename: str, total_size: int,
+                   chunk_size: int = UPLOAD_CHUNK_SIZE, options: dict = None) -> dict:
+    if total_size > UPLOAD_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"Files larger than {UPLOAD_MAX_SIZE} bytes are not accepted.")
+    if chunk_size > UPLOAD_MAX_CHUNK_SIZE:
+        raise HTTPException(status_code=400, detail=f"chunk_size may not exceed {UPLOAD_MAX_CHUNK_SIZE} bytes.")
+    prune_sessions()
+
+    session = {
+        "upload_id": str(uuid4()),
+        "text_set_id": str(text_set_id),
+        "owner_id": str(owner_id),
+        "filename": filename,
+        "total_size": total_size,
+        "chunk_size": chunk_size,
+        "chunk_count": -(-total_size // chunk_size),
+        "options": options or {},
+        "created_at": time.time(),
+    }
+    directory = _session_dir(session["upload_id"])
+    os.makedirs(os.path.join(directory, "chunks"))
+    with open(os.path.join(directory, "data"), "wb") as data:
+        data.truncate(total_size)
+    _write_meta(directory, session)
+    return session
+
+
+def _write_meta(directory: str, session: dict):
+    temporary = os.path.join(directory, "meta.json.tmp")
+    with open(temporary, "w") as meta:
+        json.dump(session, meta)
+    os.replace(temporary, os.path.join(directory, "meta.json"))
+
+
+# Load a session, checking that it belongs to this TextSet and user
+def get_session(upload_id: str, text_set_id: str, owner_id: str) -> dict:
+    try:
+        with open(os.path.join(_session_dir(upload_id), "meta.json")) as meta:
+            session = json.load(meta)
+    except (FileNotFoundError, ValueError):
+        session = None
+    if not session or session["text_set_id"] != str(text_set_id) or session["owner_id"] != str(owner_id):
+        raise HTTPException(status_code=404, detail="Upload session not found or not accessible")
+    return session
+
+
+def write_chunk(session: dict, index: int, data: bytes, sha256: str):
+    if not 0 <= index < session["chunk_count"]:
+        raise HTTPException(status_code=400, detail=f"Chunk index must be between 0 and {session['chunk_count'] - 1}.")
+    offset = index * session["chunk_size"]
+    expected = min(session["chunk_size"], session["total_size"] - offset)
+    if len(data) != expected:
+        raise HTTPException(status_code=400, detail=f"Chunk {index} must be {expected} bytes, got {len(data)}.")
+    digest = hashlib.sha256(data).hexdigest()
+    if digest != sha256.lower():
+        raise HTTPException(status_code=400, detail=f"Checksum mismatch for chunk {index}.")
+
+    directory = _session_dir(session["upload_id"])
+    descriptor = os.open(os.path.join(directory, "data"), os.O_WRONLY)
+    try:
+        os.pwrite(descriptor, data, offset)
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+    # The marker is written last, so a chunk only counts once its bytes are on disk
+    with open(os.path.join(directory, "chunks", str(index)), "w") as marker:
+        marker.write(digest)
+    # Activity keeps the session from expiring
+    os.utime(os.path.join(directory, "meta.json"))
+
+
+def received_chunks(session: dict) -> list[int]:
+    names = os.listdir(os.path.join(_session_dir(session["upload_id"]), "chunks"))
+    return sorted(int(name) for name in names if name.isdigit())
+
+
+def status(session: dict) -> dict:
+    received = received_chunks(session)
+    present = set(received)
+    return {
+        "upload_id": session["upload_id"],
+        "filename": session["filename"],
+        "total_size": session["total_size"],
+        "chunk_size": session["chunk_size"],
+        "chunk_count": session["chunk_count"],
+        "received_chunks": received,
+        "missing_chunks": [index for index in range(session["chunk_count"]) if index not in present],
+        "job_id": stream_job_id(session),
+    }
+
+
+# Hand the assembled file over for ingestion and remove the session
+def finalize_session(session: dict, spool_dir: str = None) -> str:
+    missing = status(session)["missing_chunks"]
+    if missing:
+        raise HTTPException(status_code=409, detail=f"Missing chunks: {missing[:20]}")
+    # Renaming the directory claims the session, so concurrent finalize calls start one job
+    directory = _session_dir(session["upload_id"]) + ".finalizing"
+    try:
+        os.rename(_session_dir(session["upload_id"]), directory)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload session not found or not accessible")
+    suffix = os.path.splitext(session["filename"])[1].lower()
+    descriptor, path = tempfile.mkstemp(suffix=suffix, dir=spool_dir)
+    os.close(descriptor)
+    shutil.move(os.path.join(directory, "data"), path)
+    shutil.rmtree(directory, ignore_errors=True)
+    return path
+
+
+def data_path(session: dict) -> str:
+    return os.path.join(_session_dir(session["upload_id"]), "data")
+
+
+# Claim a session for parsing while it uploads. Only streamable formats qualify, once
+# chunk 0 is in; exactly one caller (across workers) gets True and must start job_id.
+def start_stream(session: dict, job_id: str) -> bool:
+    if os.path.splitext(session["filename"])[1].lower() not in STREAMABLE_FORMATS:
+        return False
+    directory = _session_dir(session["upload_id"])
+    if not os.path.exists(os.path.join(directory, "chunks", "0")):
+        return False
+    claim = os.path.join(directory, f"stream.{job_id}")
+    try:
+        with open(claim, "w") as claim_file:
+            claim_file.write(job_id)
+        # link() fails if the name exists, so the claim and its job id appear together
+        os.link(claim, os.path.join(directory, "stream"))
+    except (FileExistsError, FileNotFoundError):
+        return False
+    finally:
+        try:
+            os.remove(claim)
+        except FileNotFoundError:
+            pass
+    return True
+
+
+# Id of the job parsing this session early, if one was started
+def stream_job_id(session: dict):
+    try:
+        with open(os.path.join(_session_dir(session["upload_id"]), "stream")) as stream_file:
+            return stream_file.read()
+    except FileNotFoundError:
+        return None
+
+
+# Finalize a session that is already being parsed: its job may now read to the end
+def finish_stream(session: dict) -> str:
+    missing = status(session)["missing_chunks"]
+    if missing:
+        raise HTTPException(status_code=409, detail=f"Missing chunks: {missing[:20]}")
+    directory = _session_dir(session["upload_id"])
+    open(os.path.join(directory, "finalized"), "w").close()
+    os.utime(os.path.join(directory, "meta.json"))
+    return stream_job_id(session)
+
+
+def is_finalized(session: dict) -> bool:
+    return os.path.exists(os.path.join(_session_dir(session["upload_id"]), "finalized"))
+
+
+def remove_session(session: dict):
+    shutil.rmtree(_session_dir(session["upload_id"]), ignore_errors=True)
+
+
+class SessionStream(io.RawIOBase):
+    """Reads a session's file as far as its chunks have arrived without gaps, waiting
+    for more until the session is finalized. Fails once the session expires."""
+
+    def __init__(self, session: dict):
+        self.session = session
+        self.directory = _session_dir(session["upload_id"])
+        # Unbuffered: a buffered read-ahead would keep the zeros of chunks not yet written
+        self._data = open(os.path.join(self.directory, "data"), "rb", buffering=0)
+        self._position = 0
+        self._contiguous = 0
+
+    def readable(self):
+        return True
+
+    def _available(self) -> int:
+        while self._contiguous < self.session["chunk_count"] and \
+                os.path.exists(os.path.join(self.directory, "chunks", str(self._contiguous))):
+            self._contiguous += 1
+        return min(self._contiguous * self.session["chunk_size"], self.session["total_size"])
+
+    def readinto(self, buffer) -> int:
+        while True:
+            available = self._available()
+            if self._position < available:
+                self._data.seek(self._position)
+                read = self._data.readinto(memoryview(buffer)[:available - self._position])
+                self._position += read
+                return read
+            if available >= self.session["total_size"] and os.path.exists(os.path.join(self.directory, "finalized")):
+                return 0
+            try:
+                idle = time.time() - os.path.getmtime(os.path.join(self.directory, "meta.json"))
+            except OSError:
+                idle = None
+            if idle is None or idle > UPLOAD_SESSION_TTL_SECONDS:
+                raise HTTPException(status_code=410, detail="Upload session expired before it was finalized")
+            time.sleep(UPLOAD_STREAM_POLL_SECONDS)
+
+    def close(self):
+        self._data.close()
+        super().close()
+
+
+def open_stream(session: dict):
+    return io.BufferedReader(SessionStream(session), STREAM_READ_BYTES)
+
+
+def prune_sessions():
+    if not os.path.isdir(UPLOAD_SESSION_DIR):
+        return
+    cutoff = time.time() - UPLOAD_SESSION_TTL_SECONDS
+    for upload_id in os.listdir(UPLOAD_SESSION_DIR):
+        directory = os.path.join(UPLOAD_SESSION_DIR, upload_id)
+        try:
+            expired = os.path.getmtime(os.path.join(directory, "meta.json")) < cutoff
+        except OSError:
+            continue
+        if expired:
+            logger.info(f"Removing expired upload session {upload_id}")
+            shutil.rmtree(directory, ignore_errors=True)
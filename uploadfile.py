@@ -124,21 +124,38 @@
 #         raise HTTPException(status_code=500, detail=str(e))
 # upload_service.py
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, APIRouter, Path
-import pandas as pd
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, APIRouter, Path, Query, Header, Request, Response, status
+from starlette.concurrency import run_in_threadpool
 import numpy as np
-from io import BytesIO
-from sqlalchemy import text
-from sentence_transformers import SentenceTransformer
-from controller import oauth2_scheme
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from controller import authenticate_user
-from database import get_db
+from database import get_async_db, SessionLocal
 from models import TextSet
+from schemas import UploadJobResponse, IngestJobStatus, CreateUploadSession, UploadSessionStatus
+from jobs import IngestJob, job_store
+from embedding_cache import embedding_cache, cache_key
+from search import invalidate_index
+from embedding_matrix import matrix_cache, MatrixStaging
+from embedding_model import ENCODER_ID, get_encoder, get_tokenizer
+from bulk_writer import TextItemWriter
+from incremental import IncrementalSync, content_hash
+from validation import validate_chunk
+from threads import ThreadRootResolver
+from text_set_stats import TextSetStatsTracker
+from readers import spool_upload, iter_row_chunks, UPLOAD_SPOOL_DIR, UPLOAD_FORMATS, GENERIC_CONTENT_TYPE
+import upload_sessions
+from metrics import Histogram
+import cProfile
+import itertools
 import logging
+import time
+from contextlib import contextmanager
 from uuid import uuid4
 from datetime import datetime
 from dateutil import parser  # type: ignore
+import os
 
 # Logging setup
 logging.basicConfig(level=logging.INFO)
@@ -147,15 +164,43 @@ logger = logging.getLogger(__name__)
 # FastAPI router
 route = APIRouter()
 
-# Sentence Transformer model
-model = SentenceTransformer('all-MiniLM-L6-v2')
-tokenizer = model.tokenizer
+# Directory for per-upload cProfile dumps (upload with ?profile=true); profiling is off when unset
+INGEST_PROFILE_DIR = os.getenv("INGEST_PROFILE_DIR") or None
+
+# Tokenize short texts during uploads only to count their tokens. Off by default, since
+# skipping the tokenizer for them is most of segmentation's speed-up: their token_count
+# is then left NULL, total_tokens covers the tokenized texts only, and
+# rebuild_stats.py --count-tokens fills the gaps offline.
+INGEST_COUNT_TOKENS = os.getenv("INGEST_COUNT_TOKENS", "false").lower() == "true"
+
+COUNT_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000)
+BYTE_BUCKETS = (64 * 1024, 1024 ** 2, 16 * 1024 ** 2, 128 * 1024 ** 2, 1024 ** 3)
+
+stage_seconds = Histogram("ingest_stage_seconds", "Time per ingestion stage and chunk")
+upload_rows = Histogram("ingest_upload_rows", "Rows parsed per completed upload", COUNT_BUCKETS)
+upload_segments = Histogram("ingest_upload_segments", "Segments inserted per completed upload", COUNT_BUCKETS)
+upload_bytes = Histogram("ingest_upload_bytes", "File size per completed upload", BYTE_BUCKETS)
+
+# Time one pipeline stage into the stage histogram and the job's own totals
+@contextmanager
+def stage(name, job: IngestJob = None):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage=name)
+        if job:
+            job.add_stage_time(name, elapsed)
 
 # Mandatory columns based on the database table structure
 mandatory_columns = ['creator_id', 'creator_name', 'text_content', 'post_date', 'external_item_id', 'parent_external_item_id']
 
 # Function to parse ISO 8601 date format
 def parse_iso8601_date(date_str):
+    # Spreadsheet cells and typed columnar files may already hold datetimes (NaT is rejected)
+    if isinstance(date_str, datetime):
+        return date_str if date_str == date_str else None
     try:
         return parser.isoparse(date_str)
     except Exception as e:
@@ -164,6 +209,7 @@ def parse_iso8601_date(date_str):
 
 # Function to split long text into segments
 def segment_text(text, max_length=300, overlap=50):
+    tokenizer = get_tokenizer()
     tokens = tokenizer.tokenize(text)
     segments = []
     for i in range(0, len(tokens), max_length - overlap):
@@ -172,93 +218,448 @@ def segment_text(text, max_length=300, overlap=50):
         segments.append(segment)
     return segments
 
-# Upload file endpoint with text_set_id path parameter
-@route.post("/TextSet/{text_set_id}/upload-file/")
-@route.post("/TextSet/{text_set_id}/upload-file/")
+# Number of tokens in each window segment_text cuts from a text of n_tokens tokens
+def window_sizes(n_tokens, max_length=300, overlap=50):
+    return [min(start + max_length, n_tokens) - start for start in range(0, n_tokens, max_length - overlap)]
+
+# Function to split many texts into segments with a single tokenizer call. Windows have
+# the same size and overlap as segment_text, but each segment is sliced from the
+# original string using the fast tokenizer's character offsets. With token_counts=True
+# it returns (segments, counts) with the tokens of each segment; short texts are then
+# tokenized as well, only to be counted, unless count_short is False, which leaves
+# their counts None.
+def segment_texts(texts, max_length=300, overlap=50, token_counts=False, count_short=True):
+    tokenizer = get_tokenizer()
+    if not tokenizer.is_fast:
+        results = [segment_text(text, max_length, overlap) for text in texts]
+        if not token_counts:
+            return results
+        return results, [window_sizes(len(tokenizer.tokenize(text)), max_length, overlap) for text in texts]
+
+    step = max_length - overlap
+    results = [None] * len(texts)
+    counts = [[] for _ in texts]
+    to_tokenize = []
+    to_count = []
+    for i, text in enumerate(texts):
+        # An ASCII token covers at least one character, so short ASCII texts fit in one
+        # window. Other scripts can expand (Hangul decomposes under NFD), so they are tokenized.
+        if len(text) <= step and text.isascii():
+            results[i] = [text] if text.strip() else []
+            if token_counts and results[i]:
+                if count_short:
+                    to_count.append(i)
+                else:
+                    counts[i] = [None]
+        else:
+            to_tokenize.append(i)
+
+    if to_tokenize:
+        encoded = tokenizer(
+            [texts[i] for i in to_tokenize],
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+            verbose=False
+        )
+        for i, offsets in zip(to_tokenize, encoded["offset_mapping"]):
+            text = texts[i]
+            results[i] = [
+                text[offsets[start][0]:offsets[min(start + max_length, len(offsets)) - 1][1]]
+                for start in range(0, len(offsets), step)
+            ]
+            counts[i] = window_sizes(len(offsets), max_length, overlap)
+
+    if to_count:
+        encoded = tokenizer(
+            [texts[i] for i in to_count],
+            add_special_tokens=False,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+            verbose=False
+        )
+        for i, input_ids in zip(to_count, encoded["input_ids"]):
+            counts[i] = [len(input_ids)]
+    return (results, counts) if token_counts else results
+
+# Function to embed many segments at once. Embeddings already in the cache are
+# reused; the rest are deduplicated, ordered by length so each batch pads to a
+# similar size, and sent to the shared encoder. The result rows follow the input order.
+def encode_segments(segments):
+    encoder = get_encoder()
+    embeddings = np.empty((len(segments), encoder.dimension), dtype=np.float32)
+    keys = [cache_key(ENCODER_ID, segment) for segment in segments]
+    cached = embedding_cache.get_many(keys)
+
+    missing = {}
+    for i, key in enumerate(keys):
+        if key in cached:
+            embeddings[i] = cached[key]
+        else:
+            missing.setdefault(key, []).append(i)
+
+    unique = list(missing)
+    unique.sort(key=lambda key: len(segments[missing[key][0]]), reverse=True)
+    encoded = encoder.encode([segments[missing[key][0]] for key in unique])
+    for key, vector in zip(unique, encoded):
+        embeddings[missing[key]] = vector
+    embedding_cache.put_many((key, vector.copy()) for key, vector in zip(unique, encoded))
+    return embeddings
+
+# Function to segment, embed and buffer one chunk of spreadsheet rows
+def ingest_chunk(df, text_set_id, writer: TextItemWriter, job: IngestJob = None, staging: MatrixStaging = None,
+                 sync: IncrementalSync = None, first_row: int = 0, skip_invalid: bool = False,
+                 threads: ThreadRootResolver = None, stats: TextSetStatsTracker = None):
+    with stage("validate", job):
+        valid_rows, rejections = validate_chunk(df, first_row)
+
+    # Rows without text are always skipped; bad dates fail the upload unless skip_invalid is set
+    if rejections:
+        logger.warning(f"{len(rejections)} rows failed validation, first at row {rejections[0]['row']}")
+        if job:
+            job.add_rejections(rejections)
+        if sync:
+            sync.skip_rejected(rejection['external_item_id'] for rejection in rejections)
+        bad_dates = [rejection for rejection in rejections if rejection['column'] == 'post_date']
+        if bad_dates and not skip_invalid:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid date format for 'post_date' in {len(bad_dates)} rows, first at row "
+                       f"{bad_dates[0]['row']}: {bad_dates[0]['value']}. Upload with skip_invalid=true to ingest the valid rows."
+            )
+
+    # In incremental mode only new and changed rows go further
+    hashes = [content_hash(row, post_date) for row, post_date in valid_rows]
+    if sync:
+        with stage("diff", job):
+            keep = sync.filter(valid_rows, hashes)
+        valid_rows = [valid_rows[position] for position in keep]
+        hashes = [hashes[position] for position in keep]
+        if job:
+            job.item_counts = sync.counts()
+
+    roots = threads.resolve(valid_rows) if threads else [None] * len(valid_rows)
+
+    # Process text segments for the whole chunk in one tokenizer call; tokens are
+    # counted only when they are stored or tracked, and short texts only on request
+    with stage("segment", job):
+        texts = [str(row['text_content']) for row, _ in valid_rows]
+        if stats or 'token_count' in writer.columns:
+            segmented, token_counts = segment_texts(texts, token_counts=True, count_short=INGEST_COUNT_TOKENS)
+        else:
+            segmented = segment_texts(texts)
+            token_counts = [[None] * len(segments) for segments in segmented]
+
+    # Collect every segment first so the whole chunk can be embedded in batches
+    pending = []
+    for (row, post_date), row_hash, root, segments, counts in zip(valid_rows, hashes, roots, segmented, token_counts):
+        item = {
+            'creator_id': row['creator_id'],
+            'creator_name': row['creator_name'],
+            'post_date': post_date,
+            'external_item_id': row.get('external_item_id'),
+            'parent_external_item_id': row.get('parent_external_item_id'),
+            'content_hash': row_hash,
+            'thread_root_id': root
+        }
+        for segment_index, (segment, tokens) in enumerate(zip(segments, counts)):
+            pending.append((item, segment, tokens, segment_index))
+
+    # Generate embeddings for all segments
+    with stage("encode", job):
+        embeddings = encode_segments([segment for _, segment, _, _ in pending])
+    if job:
+        job.segments_embedded += len(pending)
+
+    # Store data in the database, in the original row and segment order
+    item_ids = [str(uuid4()) for _ in pending]  # Generate a new UUID for each record
+    with stage("insert", job):
+        for (item, segment, tokens, segment_index), text_item_id, embedding_array in zip(pending, item_ids, embeddings):
+            writer.add({
+                'creator_id': item['creator_id'],
+                'creator_name': item['creator_name'],
+                'text_set_id': text_set_id,
+                'text_item_id': text_item_id,
+                'text_content': segment,
+                'post_date': item['post_date'],
+                'external_item_id': item['external_item_id'],
+                'parent_external_item_id': item['parent_external_item_id'],
+                'content_hash': item['content_hash'],
+                'thread_root_id': item['thread_root_id'],
+                'token_count': tokens,
+                'segment_index': segment_index,
+                'embeddings': embedding_array
+            })
+        writer.flush()
+    if job:
+        job.rows_inserted = writer.inserted
+    if stats:
+        stats.add(
+            [pair for pair, segments in zip(valid_rows, segmented) if segments],
+            len(pending),
+            sum(tokens for _, _, tokens, _ in pending if tokens is not None)
+        )
+    if staging:
+        with stage("stage_matrix", job):
+            staging.append(item_ids, embeddings)
+
+# Function to stream a spooled upload through the pipeline chunk by chunk.
+# Nothing is committed here; the caller commits once every chunk has been written.
+def ingest_file(db: Session, text_set_id, path, job: IngestJob = None, staging: MatrixStaging = None,
+                sync: IncrementalSync = None, skip_invalid: bool = False, stats: TextSetStatsTracker = None,
+                source=None):
+    writer = TextItemWriter(db)
+    # Thread roots are stored once migrations.py has added the column
+    threads = ThreadRootResolver(db, text_set_id) if 'thread_root_id' in writer.columns else None
+    rows = 0
+    chunks = iter_row_chunks(path, source=source)
+    for chunk_number in itertools.count():
+        with stage("read", job):
+            df = next(chunks, None)
+        if df is None:
+            break
+        if chunk_number == 0:
+            # Ensure mandatory columns are present in the file
+            missing_columns = [col for col in mandatory_columns if col not in df.columns]
+            if missing_columns:
+                raise HTTPException(status_code=400, detail=f"Missing mandatory columns: {missing_columns}")
+
+        if job:
+            job.rows_parsed += len(df)
+        ingest_chunk(df, text_set_id, writer, job, staging, sync, rows, skip_invalid, threads, stats)
+        rows += len(df)
+        logger.debug(f"Processed {rows} rows ({writer.inserted} segments) for TextSet {text_set_id}")
+
+    if threads:
+        with stage("thread_roots", job):
+            threads.finish()
+    if sync:
+        with stage("remove_missing", job):
+            sync.finish()
+        if job:
+            job.item_counts = sync.counts()
+    if stats:
+        # Deleted or replaced rows cannot be subtracted from the range and sketch
+        with stage("stats", job):
+            stats.finish(recompute=bool(sync and sync.changed_existing))
+    return writer.inserted
+
+# Background job body: ingest a spooled upload in its own session and commit once.
+# With upload_session, path is the session's file and is read while it still uploads.
+def run_ingest_job(job: IngestJob, text_set_id, path, profile: bool = False,
+                   incremental: bool = False, delete_missing: bool = False, skip_invalid: bool = False,
+                   upload_session: dict = None):
+    # A session is read as it uploads; its spool file has no extension, so the format comes from its filename
+    source = (lambda: upload_sessions.open_stream(upload_session)) if upload_session else None
+    read_path = upload_session["filename"] if upload_session else path
+    db = SessionLocal()
+    staging = matrix_cache.staging(text_set_id)
+    sync = None
+    profiler = cProfile.Profile() if profile else None
+    try:
+        if incremental:
+            sync = IncrementalSync(db, text_set_id, delete_missing)
+        if profiler:
+            profiler.enable()
+        try:
+            stats = TextSetStatsTracker(db, text_set_id)
+            inserted = ingest_file(db, text_set_id, read_path, job, staging, sync, skip_invalid, stats, source)
+            with stage("commit", job):
+                db.commit()  # Commit after processing all records
+        finally:
+            if profiler:
+                profiler.disable()
+                job.profile_path = os.path.join(INGEST_PROFILE_DIR, f"{job.id}.prof")
+                profiler.dump_stats(job.profile_path)
+                logger.info(f"Wrote ingestion profile for job {job.id} to {job.profile_path}")
+        logger.info(f"Inserted {inserted} segments into TextSet {text_set_id}")
+        upload_rows.observe(job.rows_parsed)
+        upload_segments.observe(inserted)
+        upload_bytes.observe(os.path.getsize(path))
+    except Exception:
+        db.rollback()
+        staging.discard()
+        raise
+    else:
+        if sync and sync.changed_existing:
+            # Rows were deleted, so the matrix cannot just be extended; rebuild it on next use
+            staging.discard()
+            matrix_cache.invalidate(text_set_id)
+        else:
+            # Extend the shared embedding matrix with exactly the rows that were committed
+            try:
+                staging.commit()
+            except Exception as e:
+                logger.error(f"Error extending embedding matrix for TextSet {text_set_id}: {e}")
+                matrix_cache.invalidate(text_set_id)
+        invalidate_index(text_set_id)
+    finally:
+        db.close()
+        if not upload_session:
+            os.remove(path)
+        elif upload_sessions.is_finalized(upload_session):
+            upload_sessions.remove_session(upload_session)
+
+def check_extension(filename):
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in UPLOAD_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file extension. Allowed extensions: {', '.join(sorted(UPLOAD_FORMATS))}."
+        )
+    return extension
+
+# Check if the provided text_set_id exists in the TextSet table and belongs to the user
+async def check_text_set_owner(db: AsyncSession, text_set_id, user_id):
+    text_set = await db.scalar(select(TextSet.id).filter_by(id=text_set_id, owner_id=user_id))
+    if not text_set:
+        raise HTTPException(status_code=404, detail="TextSet not found or not accessible")
+
+# Upload file endpoint with text_set_id path parameter. The file is spooled to disk
+# and ingested by a background job; poll the job endpoint below for progress.
+@route.post("/TextSet/{text_set_id}/upload-file/", response_model=UploadJobResponse, status_code=status.HTTP_202_ACCEPTED)
 async def upload_file(
     text_set_id: str = Path(..., description="UUID of the TextSet to associate with the file"),
     file: UploadFile = File(...),
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    profile: bool = Query(False, description="Write a cProfile dump of the ingestion job to INGEST_PROFILE_DIR"),
+    incremental: bool = Query(False, description="Only insert new rows and replace changed ones, matched on external_item_id"),
+    delete_missing: bool = Query(False, description="With incremental, delete items whose external_item_id is not in the file"),
+    skip_invalid: bool = Query(False, description="Ingest the valid rows and report the invalid ones instead of failing"),
+    user_id: str = Depends(authenticate_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    valid_extensions = ['.xls', '.xlsx']
-    file_extension = os.path.splitext(file.filename)[1].lower()
-    if file_extension not in valid_extensions:
-        raise HTTPException(status_code=400, detail="Invalid file extension. Only .xls and .xlsx files are allowed.")
-   
-    if not (file.content_type == "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet" or file.content_type == "application/vnd.ms-excel"):
-        raise HTTPException(status_code=400, detail="Invalid file type. Only Excel files are allowed.")
-    # Verify the user token and get user_id
-    user_id = authenticate_user(token, db)
-
-    # Check if the provided text_set_id exists in the TextSet table
-    text_set = db.query(TextSet).filter_by(id=text_set_id, owner_id=user_id).first()
-    if not text_set:
-        raise HTTPException(status_code=404, detail="TextSet not found or not accessible")
-
+    if profile and not INGEST_PROFILE_DIR:
+        raise HTTPException(status_code=400, detail="Profiling is not enabled on this server.")
+    if delete_missing and not incremental:
+        raise HTTPException(status_code=400, detail="delete_missing requires incremental=true.")
+    extension = check_extension(file.filename)
+    if file.content_type not in UPLOAD_FORMATS[extension] | {GENERIC_CONTENT_TYPE}:
+        raise HTTPException(status_code=400, detail=f"Invalid file type {file.content_type} for a {extension} file.")
+    await check_text_set_owner(db, text_set_id, user_id)
+
+    # Spool the upload to disk so the job can read it back in bounded chunks
     try:
-        contents = await file.read()
-        df = pd.read_excel(BytesIO(contents))
-
-        # Ensure mandatory columns are present in the file
-        missing_columns = [col for col in mandatory_columns if col not in df.columns]
-        if missing_columns:
-            raise HTTPException(status_code=400, detail=f"Missing mandatory columns: {missing_columns}")
-
-        # Process the DataFrame and store data in the database
-        for _, row in df.iterrows():
-            if pd.isnull(row['text_content']):
-                logger.warning("Missing 'text_content' in the row. Skipping...")
-                continue
-
-            # Process text segments
-            text_content = row['text_content']
-            segments = segment_text(text_content)
-
-            # Parse post date
-            post_date = parse_iso8601_date(row['post_date'])
-            if not post_date:
-                raise HTTPException(status_code=400, detail=f"Invalid date format for 'post_date': {row['post_date']}")
-
-            for i, segment in enumerate(segments):
-                # Generate embeddings for the segment
-                embedding = model.encode(segment)
-                embedding_array = np.array(embedding, dtype=np.float32)
-
-                # Set parameters for insertion
-                params = {
-                    'creator_id': row['creator_id'],
-                    'creator_name': row['creator_name'],
-                    'text_set_id': text_set_id,  # Use the path parameter
-                    'text_item_id': str(uuid4()),  # Generate a new UUID for each record
-                    'text_content': segment,
-                    'post_date': post_date,
-                    'external_item_id': row.get('external_item_id'),
-                    'parent_external_item_id': row.get('parent_external_item_id'),
-                    'embeddings': embedding_array.tolist()
-                }
-
-                try:
-                    column_names = ', '.join(params.keys())
-                    placeholders = ', '.join([f":{key}" for key in params.keys()])
-                    insert_query = text(f"""
-                        INSERT INTO TextItem ({column_names})
-                        VALUES ({placeholders})
-                    """)
-
-                    db.execute(insert_query, params)
-                    logger.info(f"Segment {i} for Creator ID {row['creator_id']} inserted successfully.")
-
-                except Exception as e:
-                    db.rollback()
-                    logger.error(f"Error inserting segment {i} for Creator ID {row['creator_id']}: {e}")
-                    raise HTTPException(status_code=500, detail=f"Error inserting segment {i} for Creator ID {row['creator_id']}")
-
-        db.commit()  # Commit after processing all records
-
-        return {"message": "File processed and data inserted successfully"}
-
+        spool_path = await spool_upload(file)
     except Exception as e:
-        db.rollback()
-        logger.error(f"Error processing file: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        logger.error(f"Error receiving file: {e}")
+        raise HTTPException(status_code=500, detail="Error receiving file")
+
+    job = job_store.submit(
+        IngestJob(text_set_id, user_id, file.filename), run_ingest_job,
+        text_set_id, spool_path, profile, incremental, delete_missing, skip_invalid
+    )
+    logger.info(f"Queued ingestion job {job.id} for TextSet {text_set_id}")
+    return {"job_id": job.id, "status": job.status}
+
+# Ingestion job status endpoint
+@route.get("/TextSet/{text_set_id}/jobs/{job_id}", response_model=IngestJobStatus)
+def get_ingest_job(
+    text_set_id: str = Path(..., description="UUID of the TextSet the job writes to"),
+    job_id: str = Path(..., description="Job id returned by the upload endpoint"),
+    user_id: str = Depends(authenticate_user)
+):
+    job = job_store.get(job_id)
+    if not job or job.text_set_id != text_set_id or job.owner_id != str(user_id):
+        raise HTTPException(status_code=404, detail="Job not found or not accessible")
+    return job.snapshot()
+
+# Resumable upload: create a session, PUT numbered chunks with their SHA-256 in
+# X-Chunk-SHA256, check which chunks arrived, then finalize to start the same
+# ingestion job as upload-file. Chunks may be sent in any order and retried.
+# CSV and JSONL sessions start that job with chunk 0 instead, so parsing overlaps
+# the upload; sending chunks in order lets it progress, and finalize lets it finish.
+@route.post("/TextSet/{text_set_id}/uploads", response_model=UploadSessionStatus, status_code=status.HTTP_201_CREATED)
+async def create_upload_session(
+    request: CreateUploadSession,
+    text_set_id: str = Path(..., description="UUID of the TextSet the file will be ingested into"),
+    user_id: str = Depends(authenticate_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    check_extension(request.filename)
+    if request.delete_missing and not request.incremental:
+        raise HTTPException(status_code=400, detail="delete_missing requires incremental=true.")
+    await check_text_set_owner(db, text_set_id, user_id)
+    session = await run_in_threadpool(
+        upload_sessions.create_session, text_set_id, user_id, request.filename, request.total_size,
+        request.chunk_size or upload_sessions.UPLOAD_CHUNK_SIZE,
+        {"incremental": request.incremental, "delete_missing": request.delete_missing, "skip_invalid": request.skip_invalid}
+    )
+    logger.info(f"Created upload session {session['upload_id']} for TextSet {text_set_id}")
+    return await run_in_threadpool(upload_sessions.status, session)
+
+@route.put("/TextSet/{text_set_id}/uploads/{upload_id}/chunks/{index}", status_code=status.HTTP_204_NO_CONTENT)
+async def put_upload_chunk(
+    request: Request,
+    text_set_id: str = Path(...),
+    upload_id: str = Path(...),
+    index: int = Path(..., ge=0),
+    chunk_sha256: str = Header(..., alias="X-Chunk-SHA256"),
+    user_id: str = Depends(authenticate_user)
+):
+    session = await run_in_threadpool(upload_sessions.get_session, upload_id, text_set_id, user_id)
+    too_large = HTTPException(status_code=413, detail=f"Chunks may not exceed {session['chunk_size']} bytes.")
+    declared = request.headers.get("content-length")
+    if declared is not None:
+        if not declared.isdigit():
+            raise HTTPException(status_code=400, detail="Invalid Content-Length header.")
+        if int(declared) > session["chunk_size"]:
+            raise too_large
+    # Chunked requests carry no length, so stop reading as soon as the limit is passed
+    data = bytearray()
+    async for part in request.stream():
+        data.extend(part)
+        if len(data) > session["chunk_size"]:
+            raise too_large
+    data = bytes(data)
+    await run_in_threadpool(upload_sessions.write_chunk, session, index, data, chunk_sha256)
+    if index == 0:
+        await run_in_threadpool(start_session_job, session)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+# Start parsing a CSV or JSONL session as soon as its first chunk is in. The job reads
+# the leading chunks that have arrived and waits for the rest until finalize.
+def start_session_job(session: dict):
+    job = IngestJob(session["text_set_id"], session["owner_id"], session["filename"])
+    if not upload_sessions.start_stream(session, job.id):
+        return
+    options = session["options"]
+    job_store.submit(
+        job, run_ingest_job, session["text_set_id"], upload_sessions.data_path(session), False,
+        options.get("incremental", False), options.get("delete_missing", False), options.get("skip_invalid", False),
+        session
+    )
+    logger.info(f"Started ingestion job {job.id} while upload session {session['upload_id']} is still uploading")
+
+@route.get("/TextSet/{text_set_id}/uploads/{upload_id}", response_model=UploadSessionStatus)
+def get_upload_session(
+    text_set_id: str = Path(...),
+    upload_id: str = Path(...),
+    user_id: str = Depends(authenticate_user)
+):
+    return upload_sessions.status(upload_sessions.get_session(upload_id, text_set_id, user_id))
+
+@route.post("/TextSet/{text_set_id}/uploads/{upload_id}/finalize", response_model=UploadJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def finalize_upload_session(
+    text_set_id: str = Path(...),
+    upload_id: str = Path(...),
+    user_id: str = Depends(authenticate_user)
+):
+    session = upload_sessions.get_session(upload_id, text_set_id, user_id)
+    if upload_sessions.stream_job_id(session):
+        job_id = upload_sessions.finish_stream(session)
+        job = job_store.get(job_id)
+        # A job that ended before finalize failed; the session is no longer needed
+        if job and job.finished_at:
+            upload_sessions.remove_session(session)
+        return {"job_id": job_id, "status": job.status if job else "running"}
+
+    spool_path = upload_sessions.finalize_session(session, UPLOAD_SPOOL_DIR)
+    options = session["options"]
+    job = job_store.submit(
+        IngestJob(text_set_id, user_id, session["filename"]), run_ingest_job,
+        text_set_id, spool_path, False, options.get("incremental", False), options.get("delete_missing", False),
+        options.get("skip_invalid", False)
+    )
+    logger.info(f"Queued ingestion job {job.id} for upload session {upload_id}")
+    return {"job_id": job.id, "status": job.status}
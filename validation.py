@@ -0,0 +1,76 @@
+# validation.py
+#
+# Vectorized validation of one chunk of uploaded rows. Null checks, date parsing and
+# id coercion run once per column instead of once per row, and every rejected row
+# is reported with its row number instead of aborting on the first bad value.
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Rejections kept per job for the status endpoint; the count covers all of them
+MAX_REPORTED_REJECTIONS = int(os.getenv("MAX_REPORTED_REJECTIONS", "1000"))
+
+# Columns read as identifiers: Excel's 123.0 becomes "123", blanks become NULL
+ID_COLUMNS = ['creator_id', 'external_item_id', 'parent_external_item_id']
+
+
+def coerce_ids(series):
+    import pandas as pd
+
+    result = series.astype(object)
+    present = series.notna()
+    rest = present
+    if pd.api.types.is_float_dtype(series):
+        integral = present & (series % 1 == 0)
+        result[integral] = series[integral].astype("int64").astype(str)
+        rest = present & ~integral
+    result[rest] = series[rest].astype(str).str.strip()
+    # where() with an object dtype keeps a real None; assigning None can leave NaN behind
+    return result.where(present & (result != ""), None)
+
+
+def parse_dates(series):
+    import pandas as pd
+
+    # utc=True lets one column mix offsets; values without an offset are taken as UTC
+    return pd.to_datetime(series, errors="coerce", utc=True, format="ISO8601")
+
+
+def validate_chunk(df, first_row: int = 0):
+    """Validate a chunk; returns (rows, rejections).
+
+    rows is a list of (row dict, post_date) for the valid rows, in file order.
+    rejections is a list of dicts with the row number in the file (the header is
+    row 1), the column, the reason, the offending value and the row's external_item_id.
+    """
+    import pandas as pd
+
+    df = df.copy()
+    for column in ID_COLUMNS:
+        if column in df.columns:
+            df[column] = coerce_ids(df[column])
+
+    text = df['text_content']
+    missing_text = text.isna() | (text.astype(str).str.strip() == "")
+    post_dates = parse_dates(df['post_date'])
+    bad_date = post_dates.isna() & ~missing_text
+
+    external_ids = df['external_item_id'] if 'external_item_id' in df.columns else None
+    rejections = []
+    for mask, column, reason in ((missing_text, 'text_content', "missing"), (bad_date, 'post_date', "invalid date")):
+        for position in mask.to_numpy().nonzero()[0]:
+            value = df[column].iloc[position]
+            rejections.append({
+                "row": first_row + int(position) + 2,
+                "column": column,
+                "reason": reason,
+                "value": None if pd.isnull(value) else str(value)[:200],
+                "external_item_id": None if external_ids is None else external_ids.iloc[position],
+            })
+    rejections.sort(key=lambda rejection: rejection["row"])
+
+    valid = ~(missing_text | bad_date)
+    records = df[valid].to_dict('records')
+    dates = post_dates[valid].dt.to_pydatetime()
+    return list(zip(records, dates)), rejections